@@ -16,9 +16,33 @@ class I2cLcd(LcdApi):
     
     #Implements a HD44780 character LCD connected via PCF8574 on I2C
 
-    def __init__(self, i2c, i2c_addr, num_lines, num_columns):
+    def __init__(self, i2c, i2c_addr, num_lines, num_columns, busy_flag=False, e2_mask=0):
+        # busy_flag=True: wait on the LCD's busy flag (read through the RW
+        # line) instead of fixed delays. Backpacks with RW tied to GND, or
+        # that can't be read, are detected and fall back to the delays.
+        # e2_mask: on a 40x4 module (two controllers) the PCF8574 pin wired
+        # to the second controller's E, e.g. MASK_RW with RW tied to GND at
+        # the module. The busy flag isn't used then. Ignored on smaller ones.
+        if num_lines * num_columns > 80:
+            if not e2_mask:
+                raise ValueError("40x4 LCD needs e2_mask")
+            busy_flag = False
+        else:
+            e2_mask = 0
+        self.e_chips = (MASK_E, e2_mask)
+        self.e_mask = MASK_E | e2_mask   # until the first move_to(): both
         self.i2c = i2c
         self.i2c_addr = i2c_addr
+        self.transactions = 0   # I2C writes so far, for profiling
+        self.busy_flag = False
+        self.busy_polls = 0     # busy flag reads so far, for profiling
+        self.backlight = False
+        # E strobes for one row, built in place by hal_write_bytes(), with a
+        # view of each length so sending a run doesn't allocate a slice
+        self.strobes = bytearray(4 * min(num_columns, 40))
+        mv = memoryview(self.strobes)
+        self.strobe_views = [mv[:4 * n] for n in range(len(self.strobes) // 4 + 1)]
+        self.one = bytearray(1)   # single-byte writes, reused
         self.i2c.writeto(self.i2c_addr, bytes([0]))
         utime.sleep_ms(20)   # Allow LCD time to powerup
         # Send reset 3 times
@@ -30,19 +54,23 @@ class I2cLcd(LcdApi):
         utime.sleep_ms(1)
         # Put LCD into 4-bit mode
         self.hal_write_init_nibble(self.LCD_FUNCTION)
-        utime.sleep_ms(1)
+        # The busy flag can't be read before this point, so the waits above
+        # stay timed. From here on it can: a flag that never clears means
+        # RW isn't wired (we read back our own pins) and we keep the delays.
+        if not (busy_flag and self.probe_busy_flag()):
+            utime.sleep_ms(1)
         LcdApi.__init__(self, num_lines, num_columns)
         cmd = self.LCD_FUNCTION
         if num_lines > 1:
             cmd |= self.LCD_FUNCTION_2LINES
-        self.hal_write_command(cmd)
+        self.command_all(cmd)
         gc.collect()
 
     def hal_write_init_nibble(self, nibble):
         # Writes an initialization nibble to the LCD.
         # This particular function is only used during initialization.
         byte = ((nibble >> 4) & 0x0f) << SHIFT_DATA
-        self.i2c.writeto(self.i2c_addr, bytes([byte | MASK_E]))
+        self.i2c.writeto(self.i2c_addr, bytes([byte | self.e_mask]))
         self.i2c.writeto(self.i2c_addr, bytes([byte]))
         gc.collect()
         
@@ -56,32 +84,113 @@ class I2cLcd(LcdApi):
         self.i2c.writeto(self.i2c_addr, bytes([0]))
         gc.collect()
         
+    def hal_write_byte(self, byte):
+        # One PCF8574 write from the reused buffer: nothing to allocate
+        self.one[0] = byte
+        self.i2c.writeto(self.i2c_addr, self.one)
+
+    def hal_select(self, chip):
+        # Which controller's E the next writes strobe (40x4 modules)
+        self.e_mask = self.e_chips[0] | self.e_chips[1] if chip < 0 else self.e_chips[chip]
+
     def hal_write_command(self, cmd):
         # Write a command to the LCD. Data is latched on the falling edge of E.
         byte = ((self.backlight << SHIFT_BACKLIGHT) |
                 (((cmd >> 4) & 0x0f) << SHIFT_DATA))
-        self.i2c.writeto(self.i2c_addr, bytes([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytes([byte]))
+        self.hal_write_byte(byte | self.e_mask)
+        self.hal_write_byte(byte)
         byte = ((self.backlight << SHIFT_BACKLIGHT) |
                 ((cmd & 0x0f) << SHIFT_DATA))
-        self.i2c.writeto(self.i2c_addr, bytes([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytes([byte]))
+        self.hal_write_byte(byte | self.e_mask)
+        self.hal_write_byte(byte)
+        self.transactions += 4
         if cmd <= 3:
             # The home and clear commands require a worst case delay of 4.1 msec
-            utime.sleep_ms(5)
-        gc.collect()
+            # (1.52 typical), so here the busy flag saves the most
+            if not (self.busy_flag and self.hal_wait_ready(5000)):
+                utime.sleep_ms(5)
+
+    def hal_write_bytes(self, data, start=0, end=None):
+        # Writes data[start:end] as a single I2C transaction. The PCF8574
+        # updates its pins on every byte it receives, so all four nibble
+        # strobes per character can go in one write; at 100 kHz each byte
+        # takes ~90 usec, well over the 41 usec the LCD needs per character.
+        # At most one row (len(self.strobes) // 4 characters) per call.
+        # Allocates nothing, so unlike the single-byte paths it doesn't
+        # collect afterwards.
+        if end is None:
+            end = len(data)
+        buf = self.strobes
+        ctrl = MASK_RS | (self.backlight << SHIFT_BACKLIGHT)
+        e = self.e_mask
+        i = 0
+        for k in range(start, end):
+            data_byte = data[k]
+            hi = ctrl | (data_byte & 0xf0)
+            lo = ctrl | ((data_byte & 0x0f) << SHIFT_DATA)
+            buf[i] = hi | e
+            buf[i + 1] = hi
+            buf[i + 2] = lo | e
+            buf[i + 3] = lo
+            i += 4
+        self.i2c.writeto(self.i2c_addr, self.strobe_views[i >> 2])
+        self.transactions += 1
+
+    def hal_read_busy(self):
+        # Reads the busy flag. RW high and the data pins written 1 (released,
+        # so the LCD can drive them); BF is D7 of the high nibble. The low
+        # nibble (rest of the address counter) still has to be clocked out.
+        byte = (self.backlight << SHIFT_BACKLIGHT) | MASK_RW | 0xf0
+        self.hal_write_byte(byte | MASK_E)
+        self.i2c.readfrom_into(self.i2c_addr, self.one)
+        busy = self.one[0] & 0x80
+        self.hal_write_byte(byte)
+        self.hal_write_byte(byte | MASK_E)
+        self.hal_write_byte(byte)
+        self.transactions += 5
+        self.busy_polls += 1
+        return busy
+
+    def hal_wait_ready(self, timeout_us):
+        # Polls the busy flag. False if it didn't clear within timeout_us or
+        # the backpack can't be read; the busy flag is then not trusted again.
+        start = utime.ticks_us()
+        try:
+            while self.hal_read_busy():
+                if utime.ticks_diff(utime.ticks_us(), start) > timeout_us:
+                    self.busy_flag = False
+                    return False
+        except OSError:
+            self.busy_flag = False
+            return False
+        return True
+
+    def probe_busy_flag(self):
+        # Only called right after a short command, so a working flag is
+        # clear within a couple of polls. With RW tied to GND the poll
+        # pulses write stray "set DDRAM address" commands instead; harmless
+        # here, as init clears the display next.
+        self.busy_flag = True
+        return self.hal_wait_ready(2000)
+
+    def hal_sleep_us(self, usecs):
+        # With the busy flag in use, the short waits (37-41 usec commands,
+        # e.g. between CGRAM bytes) are dropped: clocking the next byte out
+        # over I2C takes longer than that on its own.
+        if not self.busy_flag or usecs > 100:
+            utime.sleep_us(usecs)
 
     def hal_write_data(self, data):
         # Write data to the LCD. Data is latched on the falling edge of E.
         byte = (MASK_RS |
                 (self.backlight << SHIFT_BACKLIGHT) |
                 (((data >> 4) & 0x0f) << SHIFT_DATA))
-        self.i2c.writeto(self.i2c_addr, bytes([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytes([byte]))
+        self.hal_write_byte(byte | self.e_mask)
+        self.hal_write_byte(byte)
         byte = (MASK_RS |
                 (self.backlight << SHIFT_BACKLIGHT) |
-                ((data & 0x0f) << SHIFT_DATA))      
-        self.i2c.writeto(self.i2c_addr, bytes([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytes([byte]))
-        gc.collect()
+                ((data & 0x0f) << SHIFT_DATA))
+        self.hal_write_byte(byte | self.e_mask)
+        self.hal_write_byte(byte)
+        self.transactions += 4
 
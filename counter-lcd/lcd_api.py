@@ -47,6 +47,11 @@ class LcdApi:
     LCD_RW_WRITE = 0
     LCD_RW_READ = 1
 
+    # write_row() alignment
+    ALIGN_LEFT = 0
+    ALIGN_RIGHT = 1
+    ALIGN_CENTER = 2
+
     def __init__(self, num_lines, num_columns):
         self.num_lines = num_lines
         if self.num_lines > 4:
@@ -58,10 +63,24 @@ class LcdApi:
         self.cursor_y = 0
         self.implied_newline = False
         self.backlight = True
+        self.row_buf = bytearray(self.num_columns)   # scratch for write_row()
+        self.charset = None   # an lcd_charset.Charset maps text to the ROM; else Latin-1
+        # DDRAM address of the first cell of each row, so move_to() is one
+        # lookup. One controller drives at most 80 cells: rows 2 and 3 of a
+        # 4-line module continue rows 0 and 1 (0x00, 0x40, +num_columns).
+        # Past 80 cells (40x4) the module has two controllers, each with
+        # two rows of its own and an enable line of its own (row_chip).
+        cols = self.num_columns
+        if self.num_lines * cols > 80:
+            self.row_base = (0x00, 0x40, 0x00, 0x40)
+            self.row_chip = (0, 0, 1, 1)
+        else:
+            self.row_base = (0x00, 0x40, cols, 0x40 + cols)[:self.num_lines]
+            self.row_chip = None
         self.display_off()
         self.backlight_on()
         self.clear()
-        self.hal_write_command(self.LCD_ENTRY_MODE | self.LCD_ENTRY_INC)
+        self.command_all(self.LCD_ENTRY_MODE | self.LCD_ENTRY_INC)
         self.hide_cursor()
         self.display_on()
 
@@ -69,37 +88,37 @@ class LcdApi:
         """Clears the LCD display and moves the cursor to the top left
         corner.
         """
-        self.hal_write_command(self.LCD_CLR)
-        self.hal_write_command(self.LCD_HOME)
         self.cursor_x = 0
         self.cursor_y = 0
+        self.command_all(self.LCD_CLR)
+        self.command_all(self.LCD_HOME)
 
     def show_cursor(self):
         """Causes the cursor to be made visible."""
-        self.hal_write_command(self.LCD_ON_CTRL | self.LCD_ON_DISPLAY |
-                               self.LCD_ON_CURSOR)
+        self.command_all(self.LCD_ON_CTRL | self.LCD_ON_DISPLAY |
+                         self.LCD_ON_CURSOR)
 
     def hide_cursor(self):
         """Causes the cursor to be hidden."""
-        self.hal_write_command(self.LCD_ON_CTRL | self.LCD_ON_DISPLAY)
+        self.command_all(self.LCD_ON_CTRL | self.LCD_ON_DISPLAY)
 
     def blink_cursor_on(self):
         """Turns on the cursor, and makes it blink."""
-        self.hal_write_command(self.LCD_ON_CTRL | self.LCD_ON_DISPLAY |
-                               self.LCD_ON_CURSOR | self.LCD_ON_BLINK)
+        self.command_all(self.LCD_ON_CTRL | self.LCD_ON_DISPLAY |
+                         self.LCD_ON_CURSOR | self.LCD_ON_BLINK)
 
     def blink_cursor_off(self):
         """Turns on the cursor, and makes it no blink (i.e. be solid)."""
-        self.hal_write_command(self.LCD_ON_CTRL | self.LCD_ON_DISPLAY |
-                               self.LCD_ON_CURSOR)
+        self.command_all(self.LCD_ON_CTRL | self.LCD_ON_DISPLAY |
+                         self.LCD_ON_CURSOR)
 
     def display_on(self):
         """Turns on (i.e. unblanks) the LCD."""
-        self.hal_write_command(self.LCD_ON_CTRL | self.LCD_ON_DISPLAY)
+        self.command_all(self.LCD_ON_CTRL | self.LCD_ON_DISPLAY)
 
     def display_off(self):
         """Turns off (i.e. blanks) the LCD."""
-        self.hal_write_command(self.LCD_ON_CTRL)
+        self.command_all(self.LCD_ON_CTRL)
 
     def backlight_on(self):
         """Turns the backlight on.
@@ -125,12 +144,21 @@ class LcdApi:
         """
         self.cursor_x = cursor_x
         self.cursor_y = cursor_y
-        addr = cursor_x & 0x3f
-        if cursor_y & 1:
-            addr += 0x40    # Lines 1 & 3 add 0x40
-        if cursor_y & 2:    # Lines 2 & 3 add number of columns
-            addr += self.num_columns
-        self.hal_write_command(self.LCD_DDRAM | addr)
+        if self.row_chip is not None:
+            self.hal_select(self.row_chip[cursor_y])
+        self.hal_write_command(self.LCD_DDRAM | (self.row_base[cursor_y] + cursor_x))
+
+    def command_all(self, cmd):
+        """Sends a command that concerns the whole display (display control,
+        clear). A two-controller module gets it on both controllers, and the
+        one under the cursor is selected again.
+        """
+        if self.row_chip is None:
+            self.hal_write_command(cmd)
+            return
+        self.hal_select(-1)
+        self.hal_write_command(cmd)
+        self.hal_select(self.row_chip[self.cursor_y])
 
     def putchar(self, char):
         """Writes the indicated character to the LCD at the current cursor
@@ -144,7 +172,7 @@ class LcdApi:
             else:
                 self.cursor_x = self.num_columns
         else:
-            self.hal_write_data(ord(char))
+            self.hal_write_data(self.charset.code(char) if self.charset else ord(char) & 0xFF)
             self.cursor_x += 1
         if self.cursor_x >= self.num_columns:
             self.cursor_x = 0
@@ -161,11 +189,61 @@ class LcdApi:
         for char in string:
             self.putchar(char)
 
+    def write_cells(self, col, row, data, start=0, end=None):
+        """Writes raw character codes (bytes, bytearray or memoryview) at
+        (col, row) as one block: the cursor is addressed once and the HAL
+        gets the whole run. start/end pick a run out of a larger buffer
+        without slicing it (a slice is a new object on the heap). Codes past
+        the end of the row are dropped; the cursor is left after the last
+        cell written, without wrapping.
+        """
+        if end is None:
+            end = len(data)
+        n = min(end - start, self.num_columns - col)
+        if n <= 0 or row < 0 or row >= self.num_lines:
+            return
+        self.move_to(col, row)
+        self.hal_write_bytes(data, start, start + n)
+        self.cursor_x = col + n
+
+    def write_row(self, row, text, col=0, width=None, align=ALIGN_LEFT):
+        """Writes text at (col, row) padded with spaces (or truncated) to
+        exactly width cells, default up to the end of the row, so old text
+        is always erased. align places shorter text left, right or centred
+        in the field. str goes through self.charset when there is one
+        (else each character is sent as its code point), so chr(0) through
+        chr(7) select CGRAM; bytes are copied as raw codes.
+        """
+        if width is None or width > self.num_columns - col:
+            width = self.num_columns - col
+        if width <= 0:
+            return
+        buf = self.row_buf
+        n = min(len(text), width)
+        start = 0
+        if align == self.ALIGN_RIGHT:
+            start = width - n
+        elif align == self.ALIGN_CENTER:
+            start = (width - n) // 2
+        for i in range(width):
+            buf[i] = 0x20
+        if not isinstance(text, str):
+            for i in range(n):
+                buf[start + i] = text[i]
+        elif self.charset:
+            self.charset.encode_into(text, buf, start, n)
+        else:
+            for i in range(n):
+                buf[start + i] = ord(text[i]) & 0xFF
+        self.write_cells(col, row, buf, 0, width)
+
     def custom_char(self, location, charmap):
         """Write a character to one of the 8 CGRAM locations, available
         as chr(0) through chr(7).
         """
         location &= 0x7
+        if self.row_chip is not None:
+            self.hal_select(-1)   # both controllers of a 40x4 need the glyph
         self.hal_write_command(self.LCD_CGRAM | (location << 3))
         self.hal_sleep_us(40)
         for i in range(8):
@@ -187,6 +265,14 @@ class LcdApi:
         """
         pass
 
+    def hal_select(self, chip):
+        """Selects which controller of a two-controller (40x4) module the
+        following writes go to: 0, 1, or -1 for both at once.
+
+        A derived HAL class for such a module will implement this function.
+        """
+        pass
+
     def hal_write_command(self, cmd):
         """Write a command to the LCD.
 
@@ -203,6 +289,17 @@ class LcdApi:
         """
         raise NotImplementedError
 
+    def hal_write_bytes(self, data, start=0, end=None):
+        """Write the data bytes data[start:end] to the LCD.
+
+        A derived HAL class can override this to send the whole run in one
+        transfer; by default it is one hal_write_data() per byte.
+        """
+        if end is None:
+            end = len(data)
+        for i in range(start, end):
+            self.hal_write_data(data[i])
+
     def hal_sleep_us(self, usecs):
         """Sleep for some time (given in microseconds)."""
         time.sleep_us(usecs)
@@ -31,6 +31,10 @@ def _write(text):
         lcd.write(text)
 
 def _print_at(col, row, text, pad_to=None):
+    if hasattr(lcd, "write_row"):
+        # one addressed block, padded in place
+        lcd.write_row(row, text, col, pad_to if pad_to is not None else len(text))
+        return
     if pad_to is not None:
         text = (text + " " * pad_to)[:pad_to]
     _cursor(col, row)
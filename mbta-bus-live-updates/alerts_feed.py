@@ -0,0 +1,104 @@
+"""MBTA service alerts for the configured routes/stops.
+
+Polled on its own (slower) schedule with conditional requests: the server's
+Last-Modified / ETag are sent back, so an unchanged alert set costs a 304
+with no body. Active alerts are cached by id; `version` changes whenever
+the set does, so the ticker knows when to restart. Requests go through the
+shared MbtaClient at background priority: when the rate budget is short
+the poll is simply retried a little later.
+"""
+
+import json
+import time
+
+from mbta_client import BACKGROUND
+
+RETRY_MS = 10_000    # next try after the client deferred a poll
+
+
+def alerts_path(routes, stops):
+    """The query AlertsFeed polls: alerts in effect now for these routes and
+    stops, with only the fields the ticker uses.
+    """
+    return ("/alerts"
+            "?filter[route]=" + ",".join(routes) +
+            "&filter[stop]=" + ",".join(stops) +
+            "&filter[datetime]=NOW"
+            "&fields[alert]=header,severity,lifecycle")
+
+
+def _header(headers, name):
+    for k in headers:
+        if k.lower() == name:
+            return headers[k]
+    return None
+
+
+class AlertsFeed:
+
+    def __init__(self, client, routes, stops, interval_s=120):
+        self.client = client
+        self.path = alerts_path(routes, stops)
+        self.interval_ms = interval_s * 1000
+        self.alerts = {}          # id -> (severity, header)
+        self.version = 0
+        self.last_modified = None
+        self.etag = None
+        self.next_poll = time.ticks_ms()
+        self.polls = 0
+        self.not_modified = 0
+        self.errors = 0
+
+    def due(self):
+        return time.ticks_diff(time.ticks_ms(), self.next_poll) >= 0
+
+    def poll(self):
+        """Fetches alerts if due. Returns True if the active set changed."""
+        if not self.due():
+            return False
+        self.next_poll = time.ticks_add(time.ticks_ms(), self.interval_ms)
+        headers = {}
+        if self.last_modified:
+            headers["if-modified-since"] = self.last_modified
+        if self.etag:
+            headers["if-none-match"] = self.etag
+        try:
+            r = self.client.get(self.path, headers, BACKGROUND)
+            if r is None:
+                self.next_poll = time.ticks_add(time.ticks_ms(), RETRY_MS)
+                return False
+            self.polls += 1
+            try:
+                if r.status_code == 304:
+                    self.not_modified += 1
+                    return False
+                if r.status_code != 200:
+                    self.errors += 1
+                    return False
+                self.last_modified = _header(r.headers, "last-modified")
+                self.etag = _header(r.headers, "etag")
+                data = json.loads(r.content)
+            finally:
+                r.close()
+        except Exception:
+            self.errors += 1
+            return False
+        return self._update(data.get("data", []))
+
+    def _update(self, items):
+        alerts = {}
+        for item in items:
+            attr = item.get("attributes", {})
+            header = attr.get("header")
+            if header:
+                alerts[item.get("id")] = (attr.get("severity") or 0, header)
+        if alerts == self.alerts:
+            return False
+        self.alerts = alerts
+        self.version += 1
+        return True
+
+    def headline(self, sep="  ***  "):
+        """All active alert headers, most severe first ("" if none)."""
+        items = sorted(self.alerts.values(), key=lambda a: -a[0])
+        return sep.join(h for _, h in items)
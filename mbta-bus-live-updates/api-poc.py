@@ -1,26 +1,307 @@
-import requests
+"""Load and latency profiler for the MBTA predictions API.
+
+Runs on a PC. Simulates a fleet of displays: each of --devices polls every
+target every --interval seconds (staggered, like boards booted at random
+times), for --duration seconds. Requests go out on a pool of --connections
+keep-alive connections, one per worker thread. At the end it prints, per
+target and overall:
+
+- latency: histogram, p50 / p95 / p99 / max (time on the connection), and
+  how late requests went out when the pool was saturated
+- payload: bytes on the wire and decoded, per 200
+- 304 ratio (conditional requests with If-None-Match / If-Modified-Since),
+  429s, other HTTP errors and network errors
+- achieved request rate, and the lowest x-ratelimit-remaining seen
+
+Use it to size polling intervals against the rate limit and the number of
+boards one API key (or hub) can serve.
+
+    python api-poc.py                                   # in-process stand-in
+    python api-poc.py 116,5733,1 Blue,place-aport,0 --devices 20 --interval 5 --duration 120
+    python api-poc.py --api-base https://api-v3.mbta.com --api-key KEY --gzip --alerts
+    python api-poc.py --once                            # one fetch from api-v3.mbta.com, print next/then
+"""
+
+import argparse
 import datetime
-from pprint import pprint
+import gzip
+import heapq
+import http.client
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [HERE, os.path.join(HERE, "emulator")]
+
+from alerts_feed import alerts_path  # noqa: E402  (the boards' own query)
 
 # -------- MBTA CONFIG --------
-ROUTE_ID = "116"
-STOP_ID  = "5733"           # fill this in
-API_KEY  = ""           # if you have one
+API_BASE = "https://api-v3.mbta.com"
+API_KEY = ""           # if you have one
+DEFAULT_TARGETS = ("116,5733,1", "Blue,place-aport,0")
+
+BUCKETS_MS = (10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+# ------------ Targets ------------
+
+def predictions_path(route, stop, direction, limit):
+    return ("/predictions"
+            f"?filter[route]={route}&filter[stop]={stop}&filter[direction_id]={direction}"
+            f"&sort=departure_time&page[limit]={limit}&fields[prediction]=departure_time")
+
+
+def parse_target(s):
+    parts = s.split(",")
+    if len(parts) != 3:
+        raise argparse.ArgumentTypeError(f"expected route,stop,direction: {s!r}")
+    return tuple(parts)
+
+
+# ------------ Connection pool ------------
+
+class Pool:
+    """One keep-alive connection per worker thread, opened on first use and
+    reopened after errors (or when the server closes it).
+    """
+
+    def __init__(self, base, timeout):
+        u = urlsplit(base)
+        self.https = u.scheme == "https"
+        self.host = u.netloc
+        self.prefix = u.path.rstrip("/")
+        self.timeout = timeout
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.opened = 0
+
+    def _conn(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None or conn.sock is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = cls(self.host, timeout=self.timeout)
+            conn.connect()
+            with self.lock:
+                self.opened += 1
+            self.local.conn = conn
+        return conn
+
+    def get(self, path, headers):
+        """Returns (status, headers, raw body)."""
+        conn = self._conn()
+        try:
+            conn.request("GET", self.prefix + path, headers=headers)
+            r = conn.getresponse()
+            body = r.read()
+        except Exception:
+            conn.close()
+            self.local.conn = None
+            raise
+        if r.will_close:
+            conn.close()
+        return r.status, r.headers, body
+
+
+# ------------ Stats ------------
+
+class Stats:
+
+    def __init__(self):
+        self.lat_ms = []
+        self.late_ms = []
+        self.wire = []       # bytes on the wire, 200s only
+        self.decoded = []
+        self.status = {}
+        self.net_errors = 0
+        self.exceptions = 0  # anything else fetch() raised: a bug, or a reply it can't read
+        self.last_exception = None
+        self.remaining = None
+
+    def add(self, res):
+        if "exception" in res:
+            self.exceptions += 1
+            self.last_exception = res["exception"]
+            return
+        self.late_ms.append(res["late_ms"])
+        if "error" in res:
+            self.net_errors += 1
+            return
+        self.lat_ms.append(res["lat_ms"])
+        self.status[res["status"]] = self.status.get(res["status"], 0) + 1
+        if res["status"] == 200:
+            self.wire.append(res["wire"])
+            self.decoded.append(res["decoded"])
+        rem = res["remaining"]
+        if rem is not None and (self.remaining is None or rem < self.remaining):
+            self.remaining = rem
+
+    def count(self):
+        return len(self.late_ms) + self.exceptions
+
+    def errors(self):
+        return sum(n for s, n in self.status.items() if s >= 400 and s != 429)
+
 
-# -------- MBTA ENDPOINT --------
-URL = (
-    "https://api-v3.mbta.com/predictions"
-    f"?filter[route]={ROUTE_ID}"
-    f"&filter[stop]={STOP_ID}"
-    "&sort=departure_time"
-    "&page[limit]=4"
-    "&fields[prediction]=departure_time"
-)
+def pct(v, p):
+    return v[min(len(v) - 1, int(len(v) * p))]
 
-headers = {"accept": "application/json"}
-if API_KEY:
-    headers["x-api-key"] = API_KEY
 
+def histogram(lat_ms, width=40):
+    counts = [0] * (len(BUCKETS_MS) + 1)
+    for ms in lat_ms:
+        i = 0
+        while i < len(BUCKETS_MS) and ms >= BUCKETS_MS[i]:
+            i += 1
+        counts[i] += 1
+    used = [i for i, n in enumerate(counts) if n]
+    peak = max(counts)
+    lines = []
+    for i in range(used[0], used[-1] + 1):
+        lo = BUCKETS_MS[i - 1] if i else 0
+        hi = str(BUCKETS_MS[i]) if i < len(BUCKETS_MS) else ""
+        lines.append(f"  {lo:>5}-{hi:<5}ms {counts[i]:6d} {'#' * round(counts[i] * width / peak)}")
+    return lines
+
+
+def report(name, st, span_s):
+    n = st.count()
+    if not n:
+        print(f"{name}: no requests")
+        return
+    s200 = st.status.get(200, 0)
+    s304 = st.status.get(304, 0)
+    s429 = st.status.get(429, 0)
+    print(f"{name}")
+    print(f"  requests  {n}  ({n / span_s:.2f}/s, {n * 60 / span_s:.0f}/min)")
+    print(f"  status    200: {s200}  304: {s304}  429: {s429}  other HTTP errors: {st.errors()}  "
+          f"network errors: {st.net_errors}  exceptions: {st.exceptions}  "
+          f"({100 * (n - s200 - s304) / n:.1f}% failed)")
+    if st.last_exception:
+        print(f"  last exception: {st.last_exception}")
+    if s200 + s304:
+        print(f"  304 ratio {100 * s304 / (s200 + s304):.1f}% of answered requests")
+    if st.wire:
+        print(f"  payload   wire {statistics.mean(st.wire):.0f} B avg / {max(st.wire)} B max, "
+              f"decoded {statistics.mean(st.decoded):.0f} B avg")
+    if st.lat_ms:
+        v = sorted(st.lat_ms)
+        print(f"  latency   p50 {statistics.median(v):.1f}ms  p95 {pct(v, 0.95):.1f}ms  "
+              f"p99 {pct(v, 0.99):.1f}ms  max {v[-1]:.1f}ms")
+        for line in histogram(v):
+            print(line)
+    late = sorted(st.late_ms)
+    if late:
+        print(f"  sent late p50 {statistics.median(late):.1f}ms  p95 {pct(late, 0.95):.1f}ms  "
+              f"max {late[-1]:.1f}ms  (waiting for a free connection)")
+    if st.remaining is not None:
+        print(f"  lowest x-ratelimit-remaining seen: {st.remaining}")
+
+
+# ------------ Load run ------------
+
+def fetch(pool, path, headers, due, validators):
+    """One request; returns a result dict for Stats.add()."""
+    start = time.perf_counter()
+    res = {"late_ms": max(0.0, (start - due) * 1000)}
+    h = dict(headers)
+    h.update(validators)
+    try:
+        status, rh, body = pool.get(path, h)
+    except (OSError, http.client.HTTPException) as e:
+        res["error"] = repr(e)
+        return res
+    res["lat_ms"] = (time.perf_counter() - start) * 1000
+    res["status"] = status
+    res["wire"] = len(body)
+    res["decoded"] = len(body)
+    if status == 200:
+        if rh.get("Content-Encoding") == "gzip":
+            res["decoded"] = len(gzip.decompress(body))
+        v = {}
+        if rh.get("ETag"):
+            v["If-None-Match"] = rh["ETag"]
+        if rh.get("Last-Modified"):
+            v["If-Modified-Since"] = rh["Last-Modified"]
+        res["validators"] = v
+    rem = rh.get("x-ratelimit-remaining")
+    res["remaining"] = int(rem) if rem and rem.isdigit() else None
+    return res
+
+
+def run_load(args, base, targets):
+    headers = {"accept": "application/json"}
+    if args.api_key:
+        headers["x-api-key"] = args.api_key
+    if args.gzip:
+        headers["accept-encoding"] = "gzip"
+
+    pool = Pool(base, args.timeout)
+    stats = {name: Stats() for name, _ in targets}
+    # Conditional-request validators, per device and target (each board keeps its own)
+    validators = {}
+    lock = threading.Lock()
+
+    def done(key, name, fut):
+        try:
+            res = fut.result()
+        except Exception as e:
+            res = {"exception": repr(e)}
+        with lock:
+            stats[name].add(res)
+            if not args.no_conditional and "validators" in res:
+                validators[key] = res["validators"]
+
+    rng = random.Random(args.seed)
+    t0 = time.perf_counter()
+    end = t0 + args.duration
+    queue = []
+    for dev in range(args.devices):
+        offset = rng.uniform(0, args.interval)
+        for i in range(len(targets)):
+            heapq.heappush(queue, (t0 + offset, dev, i))
+
+    print(f"{args.devices} device(s) x {len(targets)} target(s) every {args.interval:g}s "
+          f"for {args.duration:g}s on {args.connections} connection(s) -> {base}")
+    with ThreadPoolExecutor(args.connections) as ex:
+        while queue and queue[0][0] < end:
+            due, dev, i = heapq.heappop(queue)
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            name, path = targets[i]
+            key = (dev, i)
+            with lock:
+                v = validators.get(key, {})
+            fut = ex.submit(fetch, pool, path, headers, due, v)
+            fut.add_done_callback(lambda f, key=key, name=name: done(key, name, f))
+            heapq.heappush(queue, (due + args.interval, dev, i))
+    # Rates are over the scheduled window; the last replies may land after it
+    span = args.duration
+    print(f"ran {time.perf_counter() - t0:.1f}s, {pool.opened} connection(s) opened\n")
+    total = Stats()
+    for name, st in stats.items():
+        report(name, st, span)
+        for k in ("lat_ms", "late_ms", "wire", "decoded"):
+            getattr(total, k).extend(getattr(st, k))
+        for s, n in st.status.items():
+            total.status[s] = total.status.get(s, 0) + n
+        total.net_errors += st.net_errors
+        total.exceptions += st.exceptions
+        total.last_exception = st.last_exception or total.last_exception
+        if st.remaining is not None:
+            total.remaining = st.remaining if total.remaining is None else min(total.remaining, st.remaining)
+        print()
+    if len(stats) > 1:
+        report("all targets", total, span)
+
+
+# ------------ Single fetch (the original proof of concept) ------------
 
 def minutes_until(iso_str):
     """Convert MBTA ISO timestamp to minutes from now."""
@@ -31,47 +312,74 @@ def minutes_until(iso_str):
     return int(delta.total_seconds() / 60)
 
 
-def main():
-    print("Calling MBTA API...")
-    r = requests.get(URL, headers=headers)
-    
-    print(f"HTTP {r.status_code}")
-    if r.status_code != 200:
+def once(args, base, path):
+    import json
+    headers = {"accept": "application/json"}
+    if args.api_key:
+        headers["x-api-key"] = args.api_key
+    print(f"Calling {base}...")
+    status, _, body = Pool(base, args.timeout).get(path, headers)
+    print(f"HTTP {status}")
+    if status != 200:
         print("Error:")
-        print(r.text)
+        print(body.decode(errors="replace"))
         return
-
-    data = r.json()
-
-    # Pretty-print raw response (optional)
-    print("\n--- Raw Data (first 2 entries) ---")
-    pprint(data.get("data", [])[:2])
-
-    # Extract departure times
-    print("\n--- Parsed Results ---")
     predictions = []
-    for item in data.get("data", []):
+    for item in json.loads(body).get("data", []):
         attr = item.get("attributes", {})
         t = attr.get("departure_time") or attr.get("arrival_time")
         if t:
             predictions.append(t)
-
     if not predictions:
         print("No predictions found.")
         return
-
-    # Show minutes until arrivals
     for i, iso in enumerate(predictions[:2]):
-        mins = minutes_until(iso)
         label = "Next" if i == 0 else "Then"
-        print(f"{label}: {mins} min (timestamp {iso})")
+        print(f"{label}: {minutes_until(iso)} min (timestamp {iso})")
+    print(f"\nSuccess! {base} is working.")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Profile MBTA API load and latency for a fleet of displays")
+    ap.add_argument("targets", nargs="*", type=parse_target,
+                    help="route,stop,direction (default: %s)" % " ".join(DEFAULT_TARGETS))
+    ap.add_argument("--api-base", help="default: start emulator/mbta_standin.py in-process "
+                                       "(with --once: %s)" % API_BASE)
+    ap.add_argument("--api-key", default=API_KEY)
+    ap.add_argument("--devices", type=int, default=1, help="boards polling every target")
+    ap.add_argument("--interval", type=float, default=5, help="seconds between polls per board")
+    ap.add_argument("--duration", type=float, default=30, help="seconds to run")
+    ap.add_argument("--connections", type=int, default=8, help="connection pool size (worker threads)")
+    ap.add_argument("--limit", type=int, default=4, help="page[limit] (payload size)")
+    ap.add_argument("--gzip", action="store_true", help="send Accept-Encoding: gzip")
+    ap.add_argument("--alerts", action="store_true",
+                    help="also poll /alerts for the targets, with the query the boards send")
+    ap.add_argument("--no-conditional", action="store_true",
+                    help="don't send If-None-Match / If-Modified-Since")
+    ap.add_argument("--timeout", type=float, default=10, help="socket timeout, seconds")
+    ap.add_argument("--seed", type=int, default=1, help="for the start-up stagger")
+    ap.add_argument("--once", action="store_true",
+                    help="fetch the first target once from the real API and print it")
+    args = ap.parse_args()
+
+    base = args.api_base
+    if base is None and args.once:
+        base = API_BASE   # "is the API working" means the real one
+    if base is None:
+        import mbta_standin
+        base = mbta_standin.serve()
+
+    targets = [(",".join(t), predictions_path(*t, args.limit))
+               for t in (args.targets or [parse_target(s) for s in DEFAULT_TARGETS])]
+    if args.once:
+        once(args, base, targets[0][1])
+        return
+    if args.alerts:
+        routes = sorted({t[0].split(",")[0] for t in targets})
+        stops = sorted({t[0].split(",")[1] for t in targets})
+        targets.append(("alerts " + ",".join(routes), alerts_path(routes, stops)))
+    run_load(args, base, targets)
 
-    print("\nSuccess! API is working.")
 
 if __name__ == "__main__":
     main()
-
-# import requests
-# print(requests.get(
-#   "https://api-v3.mbta.com/predictions?filter[route]=Blue&filter[stop]=place-aport&filter[direction_id]=1"
-# ).json())
\ No newline at end of file
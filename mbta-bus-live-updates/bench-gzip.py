@@ -0,0 +1,116 @@
+"""Plain JSON vs gzip + streaming field scan for the predictions fetch.
+
+Runs on a PC. Fetches the same predictions both ways, the way the device
+does: plain = read the whole body + json.loads (the old fetch_predictions()
+path), gzip = Accept-Encoding: gzip, inflate the body in 256-byte steps and
+pick departure_time out with stream_json.find_strings(). Reports body bytes
+on the wire and the end-to-end fetch time, plus the air time those bytes
+would take on a slow link.
+
+    python bench-gzip.py                          # against an in-process stand-in
+    python bench-gzip.py --api-base https://api-v3.mbta.com --limit 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [HERE, os.path.join(HERE, "emulator")]
+
+import deflate                      # noqa: E402  (emulator/deflate.py on a PC)
+from stream_json import find_strings  # noqa: E402
+
+API_KEY = ""           # if you have one
+
+
+class Counted:
+    """Wraps the response so we can see what actually came off the wire."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.nbytes = 0
+
+    def read(self, n=-1):
+        data = self.raw.read(n)
+        self.nbytes += len(data)
+        return data
+
+
+def get(url, gzip):
+    headers = {"accept": "application/json"}
+    if API_KEY:
+        headers["x-api-key"] = API_KEY
+    if gzip:
+        headers["accept-encoding"] = "gzip"
+    return urllib.request.urlopen(urllib.request.Request(url, headers=headers))
+
+
+def fetch_plain(url):
+    t0 = time.perf_counter()
+    with get(url, False) as r:
+        body = r.read()
+    data = json.loads(body)
+    times = []
+    for item in data.get("data", []):
+        attr = item.get("attributes", {})
+        t = attr.get("departure_time") or attr.get("arrival_time")
+        if t:
+            times.append(t)
+    return times, len(body), time.perf_counter() - t0
+
+
+def fetch_gzip(url):
+    t0 = time.perf_counter()
+    with get(url, True) as r:
+        wire = Counted(r)
+        if r.headers.get("Content-Encoding") == "gzip":
+            times = find_strings(deflate.DeflateIO(wire, deflate.GZIP), "departure_time")
+        else:
+            times = find_strings(wire, "departure_time")
+        wire.read()       # drain, so the byte count is the full body
+    return times, wire.nbytes, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark gzip + streaming parse")
+    ap.add_argument("--api-base", help="default: start emulator/mbta_standin.py in-process")
+    ap.add_argument("--route", default="116")
+    ap.add_argument("--stop", default="5733")
+    ap.add_argument("--limit", type=int, default=4, help="page[limit] (payload size)")
+    ap.add_argument("-n", type=int, default=50, help="requests per mode")
+    ap.add_argument("--link-kbps", type=float, default=250,
+                    help="effective link rate for the air-time estimate")
+    args = ap.parse_args()
+
+    base = args.api_base
+    if base is None:
+        import mbta_standin
+        base = mbta_standin.serve()
+    url = (base + "/predictions"
+           f"?filter[route]={args.route}&filter[stop]={args.stop}"
+           f"&sort=departure_time&page[limit]={args.limit}&fields[prediction]=departure_time")
+
+    results = {}
+    for name, fetch in (("plain", fetch_plain), ("gzip", fetch_gzip)):
+        runs = [fetch(url) for _ in range(args.n)]
+        results[name] = runs
+    if results["plain"][-1][0][:4] != results["gzip"][-1][0][:4]:
+        print("warning: the two paths disagree:", results["plain"][-1][0], results["gzip"][-1][0])
+
+    print(f"{args.n} x {url}")
+    print(f"{'':6} {'wire B':>8} {'fetch p50':>10} {'p95':>8} {'air @%gkbps' % args.link_kbps:>14}")
+    for name, runs in results.items():
+        wire = runs[-1][1]
+        ms = sorted(r[2] * 1000 for r in runs)
+        air = wire * 8 / args.link_kbps
+        print(f"{name:6} {wire:8d} {statistics.median(ms):9.2f}ms "
+              f"{ms[int(len(ms) * 0.95) - 1]:6.2f}ms {air:12.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
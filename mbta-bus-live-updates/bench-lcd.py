@@ -0,0 +1,115 @@
+"""Fixed delays vs busy-flag polling in the HD44780 driver.
+
+Runs on a PC against the emulator's PCF8574 + HD44780 model (which keeps
+the controller busy for its datasheet execution times and counts writes
+that arrive while it is busy). For each driver mode it reports how long
+the CPU is blocked in LCD calls - I2C transfers plus waits - for the
+things the device actually does: init, the CGRAM uploads, a clear + full
+redraw (what the archive scripts do every refresh) and a typical
+framebuffer diff (a minute tick).
+
+    python bench-lcd.py
+    python bench-lcd.py --freq 400000 -n 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(HERE, "emulator")]
+
+os.environ.setdefault("EMU_QUIET", "1")
+import run                          # noqa: E402  (path + MicroPython time on the virtual clock)
+run.patch_time()
+run.patch_gc()
+
+import time                         # noqa: E402
+import emu                          # noqa: E402
+import machine                      # noqa: E402
+from emu import clock               # noqa: E402
+from i2c_lcd import I2cLcd          # noqa: E402
+from lcd_frame import LcdFrame      # noqa: E402
+
+MODES = (
+    ("timed", False, True),
+    ("busy flag", True, True),
+    ("busy, RW=GND", True, False),   # backpack can't be read: must fall back
+)
+
+GLYPH = [0x04, 0x0E, 0x0E, 0x0E, 0x1F, 0x00, 0x04, 0x00]
+
+
+class Meter:
+    """Virtual time spent inside the block, and how much of it was waits."""
+
+    def __init__(self):
+        self.slept = 0
+        real = clock.sleep_us
+
+        def sleep_us(us, until=None):
+            self.slept += max(0, int(us))
+            return real(us, until)
+
+        time.sleep_us = sleep_us
+        time.sleep_ms = lambda ms: sleep_us(ms * 1000)
+
+    def run(self, fn):
+        self.slept = 0
+        t0 = clock.now_us()
+        fn()
+        return clock.now_us() - t0, self.slept
+
+
+def one_pass(busy_flag, rw_wired, freq, meter):
+    machine.I2C.devices.clear()
+    emu.LCD_RW = rw_wired
+    i2c = machine.I2C(1, freq=freq)
+    out = {}
+    box = []
+    out["init"] = meter.run(lambda: box.append(I2cLcd(i2c, 0x27, 4, 20, busy_flag=busy_flag)))
+    lcd = box[0]
+    out["5 glyphs"] = meter.run(lambda: [lcd.custom_char(i, GLYPH) for i in range(5)])
+    frame = LcdFrame(lcd, 4, 20)
+    for row in range(4):
+        frame.put(0, row, "116 Maverick   %2d min" % (row + 3), 20)
+
+    def redraw():
+        lcd.clear()
+        frame.invalidate()
+        frame.flush()
+    out["clear+redraw"] = meter.run(redraw)
+
+    def tick():
+        frame.put(15, 0, " 2", 2)
+        frame.put(15, 1, " 5", 2)
+        frame.flush()
+    out["diff frame"] = meter.run(tick)
+    return out, lcd, i2c.lcd
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark LCD busy-flag polling")
+    ap.add_argument("--freq", type=int, default=100_000, help="I2C clock (the app uses 100 kHz)")
+    ap.add_argument("-n", type=int, default=10, help="passes per mode")
+    args = ap.parse_args()
+
+    meter = Meter()
+    print(f"I2C at {args.freq // 1000} kHz, median of {args.n} passes, virtual ms")
+    print(f"{'':14} {'stage':14} {'blocked':>8} {'waits':>8}")
+    for name, busy_flag, rw_wired in MODES:
+        passes = []
+        for _ in range(args.n):
+            out, lcd, dev = one_pass(busy_flag, rw_wired, args.freq, meter)
+            passes.append(out)
+        for stage in passes[0]:
+            blocked = statistics.median(p[stage][0] for p in passes) / 1000
+            waits = statistics.median(p[stage][1] for p in passes) / 1000
+            print(f"{name:14} {stage:14} {blocked:8.2f} {waits:8.2f}")
+        print(f"{name:14} -> busy flag {'in use' if lcd.busy_flag else 'off'}, "
+              f"{lcd.busy_polls} polls, {dev.overruns} writes while busy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Frame times for a departure board of several LCDs, with and without
+the bus scheduler.
+
+Runs on the Pico (MicroPython; LCDs found on I2C0 GP4/GP5 and I2C1
+GP26/GP27) or on a PC against the emulator, with four LCDs: 0x27 and 0x26
+on each bus. Every display shows three departures and a scrolling
+ticker; the ticker steps every third frame and the departures all change
+at once every 60 frames, the way a board turns over on the minute.
+
+"each flush" sends every display's changes in full, one after the other,
+so the worst frame grows with the number of displays. "scheduler" sends
+them through lcd_bus.BusScheduler with --budget-ms of bus time per frame:
+the worst frame stays near the budget, and "lag" (the most frames in a row
+one display still had changes waiting) shows what that costs.
+
+    mpremote run bench-multi-lcd.py    # machine_i2c_lcd.py, lcd_frame.py, lcd_bus.py on the board
+    python bench-multi-lcd.py -n 600 --budget-ms 15
+"""
+
+import sys
+import time
+
+MICROPYTHON = sys.implementation.name == "micropython"
+
+if not MICROPYTHON:
+    import argparse
+    import os
+    HERE = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:0] = [os.path.join(HERE, "emulator")]
+    os.environ.setdefault("EMU_QUIET", "1")
+    os.environ.setdefault("EMU_LCDS", "0:0x26,1:0x26")
+    import run                      # noqa: E402  (path + MicroPython time on the virtual clock)
+    run.patch_time()
+    run.patch_gc()
+    run.patch_modules()
+
+from machine import I2C, Pin        # noqa: E402
+from machine_i2c_lcd import I2cLcd  # noqa: E402
+from lcd_frame import LcdFrame      # noqa: E402
+from lcd_bus import BusScheduler, find_lcds  # noqa: E402
+
+ROUTES = (b"116", b"117", b"Blue", b"SL3", b"111", b"Red", b"112", b"114")
+DESTS = (b"Wonderland", b"Maverick", b"Bowdoin", b"Chelsea", b"Haymarket",
+         b"Alewife", b"Wellington", b"Mystic Mall")
+TICKER = b"Route 116: detour via Chelsea St   Blue Line: expect delays   "
+
+
+def draw(frames, i):
+    minute = i // 60
+    for d, frame in enumerate(frames):
+        if i % 60 == 0:
+            for row in range(3):
+                k = (d * 3 + row + minute) % len(ROUTES)
+                frame.put(0, row, ROUTES[k], 5)
+                frame.put(5, row, DESTS[k], 11)
+                frame.put(16, row, b"", 4)
+                frame.put_num(16, row, (k * 7 + row * 3 + minute * 5) % 40, 2)
+                frame.put(18, row, b"m", 2)
+        if i % 3 == 0:
+            frame.put_ring(0, 3, TICKER, i // 3 + d * 11, 20)
+
+
+def run_mode(frames, sched, n):
+    lag = [0] * len(frames)
+    worst_lag = 0
+    total = worst = 0
+    for i in range(n):
+        draw(frames, i)
+        t0 = time.ticks_us()
+        if sched is None:
+            for f in frames:
+                f.flush()
+        else:
+            sched.flush()
+        us = time.ticks_diff(time.ticks_us(), t0)
+        total += us
+        worst = max(worst, us)
+        for d, f in enumerate(frames):
+            lag[d] = lag[d] + 1 if f.is_dirty() else 0
+            worst_lag = max(worst_lag, lag[d])
+    for f in frames:                # settle before the next mode
+        f.flush()
+    return total / n, worst, worst_lag
+
+
+def main(n=300, budget_ms=20):
+    if MICROPYTHON:
+        buses = (I2C(0, sda=Pin(4), scl=Pin(5), freq=400_000),
+                 I2C(1, sda=Pin(26), scl=Pin(27), freq=400_000))
+    else:
+        buses = (I2C(0, freq=400_000), I2C(1, freq=400_000))
+    lcds = []
+    for i2c in buses:
+        for addr in find_lcds(i2c):
+            lcds.append(I2cLcd(i2c, addr, 4, 20))
+    if not lcds:
+        print("no LCDs found")
+        return
+    print("%d LCDs, %d frames per run%s" % (len(lcds), n, "" if MICROPYTHON else " (emulator: virtual time)"))
+    print("%-9s %-12s %10s %10s %5s" % ("displays", "", "ms/frame", "worst ms", "lag"))
+    for count in range(1, len(lcds) + 1):
+        for mode in ("each flush", "scheduler"):
+            frames = [LcdFrame(lcd, 4, 20) for lcd in lcds[:count]]
+            for f in frames:
+                f.flush()           # clear the glass to a known state
+            sched = None
+            if mode == "scheduler":
+                sched = BusScheduler(budget_ms * 1000)
+                for f in frames:
+                    sched.add(f)
+            mean, worst, lag = run_mode(frames, sched, n)
+            print("%-9d %-12s %10.2f %10.2f %5d" % (count, mode, mean / 1000, worst / 1000, lag))
+
+
+if MICROPYTHON:
+    main()
+elif __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark several LCDs with and without the bus scheduler")
+    ap.add_argument("-n", type=int, default=300, help="frames per run")
+    ap.add_argument("--budget-ms", type=float, default=20, help="scheduler I2C budget per frame")
+    args = ap.parse_args()
+    main(args.n, args.budget_ms)
@@ -0,0 +1,148 @@
+"""Heap allocations and time per redraw on the render path.
+
+Runs on the Pico (MicroPython, LCD on I2C1 GP26/GP27) or on a PC against
+the emulator's LCD model. Each stage redraws one part of the main screen
+the way its widget does and flushes, over and over; the "f-string" stage
+is the same status line built the old way, for comparison.
+
+On the Pico the collector is disabled during each stage and gc.mem_alloc()
+read before and after, so "alloc B/frame" is exact: the byte-template
+stages must show 0, and if one doesn't the script says which and exits
+with status 1 (CHECK), so it can gate a change to the render path.
+CPython has no equivalent counter, so on a PC only the times and I2C
+transactions (virtual, from the LCD model) are shown, and --check refuses
+to run rather than pass without checking anything.
+
+    mpremote run bench-render.py    # machine_i2c_lcd.py, lcd_frame.py, bigdigits.py on the board
+    python bench-render.py -n 200
+"""
+
+import gc
+import sys
+import time
+
+MICROPYTHON = sys.implementation.name == "micropython"
+
+if not MICROPYTHON:
+    import argparse
+    import os
+    HERE = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:0] = [os.path.join(HERE, "emulator")]
+    os.environ.setdefault("EMU_QUIET", "1")
+    import run                      # noqa: E402  (path + MicroPython time on the virtual clock)
+    run.patch_time()
+    run.patch_gc()
+    run.patch_modules()
+
+from machine import I2C, Pin        # noqa: E402
+from machine_i2c_lcd import I2cLcd  # noqa: E402
+from lcd_frame import LcdFrame      # noqa: E402
+import bigdigits                    # noqa: E402
+
+CHECK = True    # on the board: exit 1 if a stage that must not allocate does
+
+UPDATED = b"Updated: 00:00:00"
+TICKER = b"Route 116: detour via Chelsea St   "
+
+
+def stage_clock(frame, i):
+    # StatusWidget, "Updated: hh:mm:ss" a second later each frame
+    secs = 8 * 3600 + i
+    frame.put(0, 3, UPDATED, 20)
+    frame.put_num(9, 3, secs // 3600, 2, 0x30)
+    frame.put_num(12, 3, secs // 60 % 60, 2, 0x30)
+    frame.put_num(15, 3, secs % 60, 2, 0x30)
+
+
+def stage_clock_fstring(frame, i):
+    # The same line as it used to be drawn
+    hh, mm, ss = time.localtime(8 * 3600 + i)[3:6]
+    frame.put(0, 3, f"Updated: {hh:02d}:{mm:02d}:{ss:02d}", 20)
+
+
+def stage_countdown(frame, i):
+    # ArrivalWidget with BIG_DIGITS: both halves count down
+    for col in (0, 10):
+        bigdigits.draw_number(frame, col, 1, 30 - i % 30)
+        frame.put(col + 7, 1, b"min", 3)
+        frame.put(col + 7, 2, b"", 3)
+        frame.put_num(col + 7, 2, 42 - i % 30)
+
+
+def stage_small(frame, i):
+    # ArrivalWidget without BIG_DIGITS: "12 min" / "Arriving"
+    for row in (1, 2):
+        m = (i + row) % 15
+        frame.put(0, row, b"", 10)
+        if m <= 0:
+            frame.put(0, row, b"Arriving")
+        else:
+            frame.put(frame.put_num(0, row, m), row, b" min")
+
+
+def stage_ticker(frame, i):
+    # StatusWidget marquee, one cell per frame
+    frame.put_ring(0, 3, TICKER, i, 20)
+
+
+# name, draw, must not allocate
+STAGES = (
+    ("clock", stage_clock, True),
+    ("clock f-string", stage_clock_fstring, False),
+    ("big countdown", stage_countdown, True),
+    ("small countdown", stage_small, True),
+    ("ticker", stage_ticker, True),
+)
+
+
+def run_stage(lcd, frame, draw, n):
+    for i in range(2):
+        draw(frame, i)              # warm up: first-call allocations aside
+        frame.flush()
+    n0 = lcd.transactions
+    gc.collect()
+    gc.disable()
+    a0 = gc.mem_alloc() if MICROPYTHON else 0
+    t0 = time.ticks_us()
+    for i in range(2, n + 2):
+        draw(frame, i)
+        frame.flush()
+    us = time.ticks_diff(time.ticks_us(), t0)
+    alloc = gc.mem_alloc() - a0 if MICROPYTHON else None
+    gc.enable()
+    return us / n, (lcd.transactions - n0) / n, None if alloc is None else alloc / n
+
+
+def main(n=100, check=False):
+    if MICROPYTHON:
+        i2c = I2C(1, sda=Pin(26), scl=Pin(27), freq=100000)
+    else:
+        i2c = I2C(1, freq=100000)
+    lcd = I2cLcd(i2c, 0x27, 4, 20)
+    bigdigits.load_glyphs(lcd)
+    frame = LcdFrame(lcd, 4, 20)
+    print("%d frames per stage%s" % (n, "" if MICROPYTHON else " (emulator: virtual time)"))
+    print("%-16s %10s %8s %15s" % ("", "ms/frame", "I2C/fr", "alloc B/frame"))
+    failed = []
+    for name, draw, no_alloc in STAGES:
+        us, i2c_n, alloc = run_stage(lcd, frame, draw, n)
+        print("%-16s %10.2f %8.1f %15s" % (name, us / 1000, i2c_n,
+                                          "-" if alloc is None else "%.1f" % alloc))
+        if no_alloc and alloc:
+            failed.append(name)
+    if check and failed:
+        print("FAIL: allocates per frame:", ", ".join(failed))
+        sys.exit(1)
+
+
+if MICROPYTHON:
+    main(check=CHECK)
+elif __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark allocations on the render path")
+    ap.add_argument("-n", type=int, default=100, help="frames per stage")
+    ap.add_argument("--check", action="store_true",
+                    help="fail on allocations (needs gc.mem_alloc(): MicroPython only)")
+    args = ap.parse_args()
+    if args.check:
+        ap.error("--check needs MicroPython's gc.mem_alloc(); run it on the board")
+    main(args.n)
@@ -0,0 +1,109 @@
+"""Big 2-row digits for the countdown.
+
+Each digit is 3 cells wide and 2 rows tall, built from the ROM full block
+(0xFF), a space, and three custom CGRAM segments: an upper bar, a lower bar,
+and both bars together. That only takes 3 of the 8 CGRAM slots, so the
+bell/speaker icons in slots 0 and 1 stay where they are.
+"""
+
+# CGRAM slots used by the segments (0 and 1 are taken by the icons)
+SEG_UPPER = 2
+SEG_LOWER = 3
+SEG_BOTH  = 4
+
+FULL  = 0xFF   # ROM full block
+BLANK = 0x20
+
+DIGIT_WIDTH = 3
+
+# Upper bar
+upper_seg = bytearray([
+    0x1F,
+    0x1F,
+    0x1F,
+    0x00,
+    0x00,
+    0x00,
+    0x00,
+    0x00
+])
+
+# Lower bar
+lower_seg = bytearray([
+    0x00,
+    0x00,
+    0x00,
+    0x00,
+    0x00,
+    0x1F,
+    0x1F,
+    0x1F
+])
+
+# Upper + lower bar
+both_seg = bytearray([
+    0x1F,
+    0x1F,
+    0x1F,
+    0x00,
+    0x00,
+    0x1F,
+    0x1F,
+    0x1F
+])
+
+_U, _L, _B, _F, _S = SEG_UPPER, SEG_LOWER, SEG_BOTH, FULL, BLANK
+
+# (top row, bottom row) for "0".."9", then "-" and blank
+_GLYPHS = (
+    (bytes((_F, _U, _F)), bytes((_F, _L, _F))),   # 0
+    (bytes((_U, _F, _S)), bytes((_L, _F, _L))),   # 1
+    (bytes((_B, _B, _F)), bytes((_F, _L, _L))),   # 2
+    (bytes((_U, _B, _F)), bytes((_L, _L, _F))),   # 3
+    (bytes((_F, _L, _F)), bytes((_S, _S, _F))),   # 4
+    (bytes((_F, _B, _B)), bytes((_L, _L, _F))),   # 5
+    (bytes((_F, _B, _B)), bytes((_F, _L, _F))),   # 6
+    (bytes((_U, _U, _F)), bytes((_S, _S, _F))),   # 7
+    (bytes((_F, _B, _F)), bytes((_F, _L, _F))),   # 8
+    (bytes((_F, _B, _F)), bytes((_L, _L, _F))),   # 9
+    (bytes((_L, _L, _L)), bytes((_S, _S, _S))),   # -
+    (bytes((_S, _S, _S)), bytes((_S, _S, _S))),   # blank
+)
+DASH = 10
+NONE = 11
+
+
+def load_glyphs(lcd):
+    """Uploads the segment glyphs to CGRAM. Call once after the LCD is set up
+    (and again if the LCD gets re-initialised).
+    """
+    lcd.custom_char(SEG_UPPER, upper_seg)
+    lcd.custom_char(SEG_LOWER, lower_seg)
+    lcd.custom_char(SEG_BOTH, both_seg)
+
+
+def draw_digit(frame, col, row, d):
+    """Draws glyph d (0-9, DASH or NONE) with its top-left cell at (col, row)."""
+    top, bottom = _GLYPHS[d]
+    for i in range(DIGIT_WIDTH):
+        frame.put_byte(col + i, row, top[i])
+        frame.put_byte(col + i, row + 1, bottom[i])
+
+
+def draw_number(frame, col, row, mins):
+    """Draws a 2-digit minute count (7 cells wide incl. the gap).
+
+    None shows "--", anything <= 0 shows "0" and anything past 99 is
+    clamped to 99. A leading zero is left blank.
+    """
+    if mins is None:
+        tens, ones = DASH, DASH
+    else:
+        mins = max(0, min(99, mins))
+        tens, ones = mins // 10, mins % 10
+        if tens == 0:
+            tens = NONE
+    draw_digit(frame, col, row, tens)
+    frame.put_byte(col + DIGIT_WIDTH, row, BLANK)
+    frame.put_byte(col + DIGIT_WIDTH, row + 1, BLANK)
+    draw_digit(frame, col + DIGIT_WIDTH + 1, row, ones)
@@ -0,0 +1,125 @@
+"""Build the on-flash route index used by the vehicle-position ETA fallback.
+
+Runs on a PC (CPython + requests), not on the Pico. Pulls one service day of
+schedules for a route/direction and works out, for every stop before our
+stop, the typical (median) time from leaving that stop to reaching ours and
+the typical time of the segment leading into it. The result is a small JSON
+file to copy to the Pico next to main.py:
+
+    python build-route-index.py --route 116 --direction 1 --stop 5733
+    -> route_index.json
+
+Use --api-base http://127.0.0.1:8080 to build against emulator/mbta_standin.py.
+"""
+
+import argparse
+import datetime
+import json
+from collections import defaultdict
+
+import requests
+
+API_BASE = "https://api-v3.mbta.com"
+API_KEY = ""           # if you have one
+
+
+def fetch_schedules(base, route, direction, date):
+    headers = {"accept": "application/json"}
+    if API_KEY:
+        headers["x-api-key"] = API_KEY
+    r = requests.get(
+        base + "/schedules",
+        params={
+            "filter[route]": route,
+            "filter[direction_id]": direction,
+            "filter[date]": date,
+            "fields[schedule]": "arrival_time,departure_time,stop_sequence",
+        },
+        headers=headers,
+    )
+    r.raise_for_status()
+    return r.json().get("data", [])
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def build_index(schedules, stop):
+    """{stop_id: [secs_to_target, secs_of_segment_into_stop]} over all trips
+    that serve stop, using the median across trips.
+    """
+    trips = defaultdict(list)
+    for s in schedules:
+        attr = s["attributes"]
+        t = attr.get("arrival_time") or attr.get("departure_time")
+        dep = attr.get("departure_time") or t
+        if not t:
+            continue
+        rel = s["relationships"]
+        trips[rel["trip"]["data"]["id"]].append((
+            attr["stop_sequence"],
+            rel["stop"]["data"]["id"],
+            datetime.datetime.fromisoformat(t),
+            datetime.datetime.fromisoformat(dep),
+        ))
+
+    to_target = defaultdict(list)
+    segment = defaultdict(list)
+    for calls in trips.values():
+        calls.sort()
+        target = next((c for c in calls if c[1] == stop), None)
+        if target is None:
+            continue                       # this trip pattern skips our stop
+        prev_dep = None
+        for seq, stop_id, arr, dep in calls:
+            if seq > target[0]:
+                break
+            to_target[stop_id].append(int((target[2] - dep).total_seconds()))
+            if prev_dep is not None:
+                segment[stop_id].append(int((arr - prev_dep).total_seconds()))
+            prev_dep = dep
+
+    index = {}
+    for stop_id, secs in to_target.items():
+        seg = segment.get(stop_id)
+        index[stop_id] = [max(0, median(secs)), median(seg) if seg else 0]
+    return index, len(trips)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build route_index.json for the ETA fallback")
+    ap.add_argument("--route", default="116")
+    ap.add_argument("--direction", default="1")
+    ap.add_argument("--stop", default="5733")
+    ap.add_argument("--date", default=datetime.date.today().isoformat(),
+                    help="service day to sample (YYYY-MM-DD, default today)")
+    ap.add_argument("--api-base", default=API_BASE)
+    ap.add_argument("--out", default="route_index.json")
+    args = ap.parse_args()
+
+    print(f"Fetching schedules for route {args.route} dir {args.direction} on {args.date}...")
+    schedules = fetch_schedules(args.api_base, args.route, args.direction, args.date)
+    index, ntrips = build_index(schedules, args.stop)
+    if not index:
+        print(f"No trips on {args.date} stop at {args.stop}; nothing written.")
+        return
+
+    out = {
+        "route": args.route,
+        "direction": int(args.direction),
+        "stop": args.stop,
+        "date": args.date,
+        "stops": index,
+    }
+    with open(args.out, "w") as f:
+        json.dump(out, f, separators=(",", ":"))
+
+    print(f"{ntrips} trips, {len(index)} stops up to {args.stop} -> {args.out}")
+    for stop_id, (secs, seg) in sorted(index.items(), key=lambda kv: -kv[1][0]):
+        print(f"  {stop_id:>12}  {secs // 60:3d} min {secs % 60:02d} s   (segment {seg} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Compile stop/route metadata into a frozen lookup module for the Pico.
+
+Runs on a PC (CPython + requests). Pulls /routes and /stops for the routes
+and stops the display uses and writes stop_meta.py: plain constants with
+bytes labels that are already truncated to the LCD width and mapped to the
+HD44780 character ROM (lcd_charset.py, A00 unless --rom A02 to match LCD_ROM
+on the device). Copy it next to main.py (or freeze it into the firmware) and
+the display gets stop names, direction names and route colours without a
+single request at runtime.
+
+    python build-stop-meta.py --route 116 --route Blue --stop 5733 --stop place-aport
+    -> stop_meta.py
+"""
+
+import argparse
+import datetime
+import unicodedata
+
+import requests
+
+from lcd_charset import Charset
+
+API_BASE = "https://api-v3.mbta.com"
+API_KEY = ""           # if you have one
+
+LCD_COLUMNS = 20
+SHORT_WIDTH = 4        # route label in the header row
+
+charset = Charset("A00")   # replaced by --rom
+
+ABBREVIATIONS = (
+    (" Street", " St"), (" Avenue", " Ave"), (" Square", " Sq"),
+    (" Station", " Sta"), (" opposite ", " opp "), (" Road", " Rd"),
+)
+
+
+def to_lcd(text, width):
+    """Transliterates text to HD44780 bytes, truncated to width."""
+    for long, short in ABBREVIATIONS:
+        text = text.replace(long, short)
+    # The device's table covers Latin-1 and common punctuation; past that,
+    # keep the base letter of accented characters (ő -> o) here on the PC
+    text = "".join(ch if charset.has(ch) else
+                   unicodedata.normalize("NFKD", ch).encode("ascii", "ignore").decode() or "?"
+                   for ch in text)
+    return charset.encode(text[:width])
+
+
+def api_get(base, path, params=None):
+    headers = {"accept": "application/json"}
+    if API_KEY:
+        headers["x-api-key"] = API_KEY
+    r = requests.get(base + path, params=params, headers=headers)
+    r.raise_for_status()
+    return r.json()["data"]
+
+
+def route_entry(attr):
+    names = attr.get("direction_names") or ["", ""]
+    dests = attr.get("direction_destinations") or ["", ""]
+    short = attr.get("short_name") or attr.get("long_name", "").split()[0]
+    return (
+        to_lcd(short, SHORT_WIDTH),
+        to_lcd(attr.get("long_name") or short, LCD_COLUMNS),
+        int(attr.get("color") or "000000", 16),
+        tuple(to_lcd(n or "", LCD_COLUMNS) for n in names),
+        tuple(to_lcd(d or "", LCD_COLUMNS) for d in dests),
+    )
+
+
+def write_module(path, routes, stops, source):
+    lines = [
+        f"# Generated by build-stop-meta.py from {source} on {datetime.date.today()}.",
+        "# Do not edit; re-run the tool instead. Labels are bytes in the HD44780",
+        f"# {charset.rom} character set, already cut to the LCD width.",
+        "",
+        f"LCD_COLUMNS = {LCD_COLUMNS}",
+        "",
+        "# route id -> (short, long, colour 0xRRGGBB, direction names, destinations)",
+        "ROUTES = {",
+    ]
+    for rid, (short, long, color, names, dests) in routes.items():
+        lines.append(f"    {rid!r}: ({short!r}, {long!r}, 0x{color:06X},")
+        lines.append(f"        {names!r},")
+        lines.append(f"        {dests!r}),")
+    lines += ["}", "", "# stop id -> name", "STOPS = {"]
+    for sid, name in stops.items():
+        lines.append(f"    {sid!r}: {name!r},")
+    lines += ["}", ""]
+    with open(path, "w") as f:
+        f.write("\n".join(lines))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate stop_meta.py for the display")
+    ap.add_argument("--route", action="append", default=[], help="route id (repeatable)")
+    ap.add_argument("--stop", action="append", default=[], help="stop id (repeatable)")
+    ap.add_argument("--api-base", default=API_BASE)
+    ap.add_argument("--rom", default="A00", choices=("A00", "A02"), help="LCD character ROM")
+    ap.add_argument("--out", default="stop_meta.py")
+    args = ap.parse_args()
+    global charset
+    charset = Charset(args.rom)
+    route_ids = args.route or ["116", "Blue"]
+    stop_ids = args.stop or ["5733", "place-aport"]
+
+    routes = {}
+    for item in api_get(args.api_base, "/routes", {"filter[id]": ",".join(route_ids)}):
+        routes[item["id"]] = route_entry(item["attributes"])
+    stops = {}
+    for item in api_get(args.api_base, "/stops", {"filter[id]": ",".join(stop_ids),
+                                                   "fields[stop]": "name"}):
+        stops[item["id"]] = to_lcd(item["attributes"]["name"], LCD_COLUMNS)
+
+    missing = [r for r in route_ids if r not in routes] + [s for s in stop_ids if s not in stops]
+    if missing:
+        print("Not found:", ", ".join(missing))
+
+    write_module(args.out, routes, stops, args.api_base)
+    print(f"{len(routes)} routes, {len(stops)} stops -> {args.out}")
+    for rid, (short, long, color, names, dests) in routes.items():
+        print(f"  {rid:>8}  {short.decode('latin-1'):4}  #{color:06X}  {dests[0].decode('latin-1')} / {dests[1].decode('latin-1')}")
+    for sid, name in stops.items():
+        print(f"  {sid:>12}  {name.decode('latin-1')}")
+
+
+if __name__ == "__main__":
+    main()
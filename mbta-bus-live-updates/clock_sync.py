@@ -0,0 +1,142 @@
+"""Clock sync manager.
+
+Keeps the RTC usable for countdowns:
+  * NTP is retried with exponential backoff until it works, then repeated
+    every resync_s.
+  * Each resync measures how far the RTC wandered since the last one, and
+    now() corrects for that drift in between syncs. NTP time here is whole
+    seconds, so one 6 h interval can't tell drift from rounding (+-46 ppm);
+    the error is summed over consecutive syncs and only used once they span
+    DRIFT_MIN_SPAN_S.
+  * If NTP is blocked, the Date header of the MBTA responses we already
+    fetch sets the clock (to the second) with no extra round trip.
+"""
+
+import time
+import machine
+import ntptime
+
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun",
+           "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+MIN_VALID_YEAR = 2024
+DRIFT_MIN_SPAN_S = 48 * 3600   # +-1 s of rounding is then +-6 ppm per end
+
+
+def _set_rtc(secs):
+    t = time.gmtime(int(secs))
+    # RTC wants (year, month, mday, weekday, hours, minutes, seconds, subseconds)
+    machine.RTC().datetime((t[0], t[1], t[2], t[6], t[3], t[4], t[5], 0))
+
+
+def parse_http_date(value):
+    """'Wed, 19 Oct 2026 14:02:11 GMT' -> UTC seconds, or None."""
+    try:
+        _, d, mon, y, hms, _ = value.split()
+        hh, mm, ss = hms.split(":")
+        return time.mktime((int(y), _MONTHS.index(mon) + 1, int(d),
+                            int(hh), int(mm), int(ss), 0, 0))
+    except (ValueError, AttributeError):
+        return None
+
+
+class ClockSync:
+
+    def __init__(self, resync_s=6 * 3600, retry_min_ms=2_000, retry_max_ms=300_000):
+        self.resync_s = resync_s
+        self.retry_min_ms = retry_min_ms
+        self.retry_max_ms = retry_max_ms
+        self.retry_ms = retry_min_ms
+        self.next_try = time.ticks_ms()
+        self.source = None        # "ntp" / "http" once the clock was set ("flash": a guess)
+        self.synced_at = None     # UTC seconds when the RTC was last set
+        self.drift = 0.0          # RTC error in s per s, RTC fast = positive
+        self.drift_err = 0        # RTC error summed over consecutive NTP syncs ...
+        self.drift_span = 0       # ... and the RTC seconds they covered
+        self.ntp_ok = 0
+        self.ntp_fail = 0
+
+    def valid(self):
+        return self.source is not None or time.localtime()[0] >= MIN_VALID_YEAR
+
+    def trusted(self):
+        """valid() and set by NTP or a Date header this boot. A "flash"
+        clock can be hours behind: fine for a countdown, not for deciding
+        it's night.
+        """
+        return self.source == "ntp" or self.source == "http"
+
+    def assumed(self):
+        """True while the clock is only assume()d: the time of a saved
+        fetch, not now, so no use for counting down to anything.
+        """
+        return self.source == "flash"
+
+    def now(self):
+        """UTC seconds, corrected for the estimated RTC drift."""
+        t = time.time()
+        if self.synced_at is not None and self.drift:
+            t -= (t - self.synced_at) * self.drift
+        return t
+
+    def due(self):
+        if time.ticks_diff(time.ticks_ms(), self.next_try) < 0:
+            return False
+        if self.source != "ntp":
+            return True
+        return time.time() - self.synced_at >= self.resync_s
+
+    def poll(self, online=True):
+        """Tries NTP if it's time to. Blocks for at most ntptime.timeout."""
+        if not online or not self.due():
+            return False
+        try:
+            ntp = ntptime.time()
+        except Exception:
+            self.ntp_fail += 1
+            self.next_try = time.ticks_add(time.ticks_ms(), self.retry_ms)
+            self.retry_ms = min(self.retry_ms * 2, self.retry_max_ms)
+            return False
+        rtc = time.time()
+        if self.source == "ntp" and rtc - self.synced_at > 60:
+            self.drift_err += rtc - ntp
+            self.drift_span += rtc - self.synced_at
+            if self.drift_span >= DRIFT_MIN_SPAN_S:
+                self.drift = self.drift_err / self.drift_span
+        _set_rtc(ntp)
+        self.synced_at = ntp
+        self.source = "ntp"
+        self.ntp_ok += 1
+        self.retry_ms = self.retry_min_ms
+        self.next_try = time.ticks_ms()
+        return True
+
+    def assume(self, secs):
+        """Sets a provisional clock (e.g. the time saved on flash before a
+        reset) when the RTC has nothing better. NTP or a Date header
+        replaces it as soon as either answers.
+        """
+        if self.valid():
+            return False
+        _set_rtc(secs)
+        self.synced_at = secs
+        self.source = "flash"
+        return True
+
+    def from_headers(self, headers):
+        """Sets the clock from an HTTP Date header while NTP hasn't worked
+        (or has been failing for longer than two resync periods).
+        """
+        if self.source == "ntp" and time.time() - self.synced_at < 2 * self.resync_s:
+            return False
+        for k in headers:
+            if k.lower() == "date":
+                secs = parse_http_date(headers[k])
+                if secs is None:
+                    return False
+                if abs(secs - time.time()) >= 2 or self.source is None:
+                    _set_rtc(secs)
+                    self.synced_at = secs
+                self.source = "http"
+                return True
+        return False
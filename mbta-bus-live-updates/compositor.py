@@ -0,0 +1,113 @@
+"""Widget compositor with a frame-rate limited flush.
+
+Every region of the screen is a Widget. Changing a widget's state only marks
+it dirty; nothing touches the LCD until Compositor.tick() decides a frame is
+due. Then all dirty widgets are drawn into the LcdFrame and flushed in one
+go, so no matter how many places update state in a cycle the LCD sees at
+most one (diffed) flush per frame interval.
+
+With several LCDs the compositors only draw() and a BusScheduler
+(lcd_bus.py) sends their frames within one I2C budget.
+"""
+
+import time
+
+
+class Widget:
+    """A screen region. Subclasses implement draw(frame) and call
+    mark_dirty() whenever their state changes.
+    """
+
+    def __init__(self):
+        self.dirty = True
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def draw(self, frame):
+        raise NotImplementedError
+
+
+class Compositor:
+
+    def __init__(self, frame, frame_ms=100):
+        self.frame = frame
+        self.frame_ms = frame_ms
+        self.widgets = []
+        self.modal = None            # full-screen widget (error, wifi...)
+        self.modal_changed = False
+        self.last_flush = time.ticks_add(time.ticks_ms(), -frame_ms)
+        self.flushes = 0
+
+    def add(self, widget):
+        self.widgets.append(widget)
+        return widget
+
+    def invalidate(self):
+        """Marks every widget dirty, e.g. after the LCD was cleared."""
+        for w in self.widgets:
+            w.dirty = True
+        if self.modal is not None:
+            self.modal.dirty = True
+
+    def show_modal(self, widget):
+        """Replaces the normal widgets with one full-screen widget until
+        hide_modal() is called.
+        """
+        if widget is not self.modal:
+            self.modal = widget
+            self.modal_changed = True
+        widget.dirty = True
+
+    def hide_modal(self):
+        if self.modal is not None:
+            self.modal = None
+            self.modal_changed = True
+            self.invalidate()
+
+    def is_dirty(self):
+        if self.modal_changed:
+            return True
+        if self.modal is not None:
+            return self.modal.dirty
+        for w in self.widgets:
+            if w.dirty:
+                return True
+        return False
+
+    def tick(self):
+        """Flushes if something is dirty and the frame interval has passed.
+        Returns True if a flush happened.
+        """
+        if not self.is_dirty():
+            return False
+        if time.ticks_diff(time.ticks_ms(), self.last_flush) < self.frame_ms:
+            return False
+        self.flush()
+        return True
+
+    def flush(self):
+        """Draws dirty widgets and flushes immediately, ignoring the frame
+        interval. Use before blocking work (buzzer, sleep) or backlight off.
+        """
+        self.draw()
+        self.frame.flush()
+        self.last_flush = time.ticks_ms()
+        self.flushes += 1
+        return True
+
+    def draw(self):
+        """Draws dirty widgets into the frame without sending anything."""
+        frame = self.frame
+        if self.modal_changed:
+            frame.clear()
+            self.modal_changed = False
+        if self.modal is not None:
+            if self.modal.dirty:
+                self.modal.draw(frame)
+                self.modal.dirty = False
+        else:
+            for w in self.widgets:
+                if w.dirty:
+                    w.draw(frame)
+                    w.dirty = False
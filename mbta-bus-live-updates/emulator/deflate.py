@@ -0,0 +1,42 @@
+"""Emulated MicroPython `deflate` module (decompression only), on zlib."""
+
+import zlib
+
+AUTO = 0
+RAW = 1
+ZLIB = 2
+GZIP = 3
+
+_WBITS = {AUTO: 47, RAW: -15, ZLIB: 15, GZIP: 31}
+
+
+class DeflateIO:
+
+    def __init__(self, stream, format=AUTO, wbits=0, close=False):
+        self.stream = stream
+        self.close_stream = close
+        self.d = zlib.decompressobj(_WBITS[format])
+        self.pending = b""
+
+    def read(self, n=-1):
+        while n < 0 or len(self.pending) < n:
+            if self.d.eof:
+                break
+            data = self.stream.read(256)
+            if not data:
+                self.pending += self.d.flush()
+                break
+            self.pending += self.d.decompress(data)
+        if n < 0:
+            n = len(self.pending)
+        out, self.pending = self.pending[:n], self.pending[n:]
+        return out
+
+    def readinto(self, buf):
+        data = self.read(len(buf))
+        buf[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if self.close_stream:
+            self.stream.close()
@@ -0,0 +1,222 @@
+"""Shared state for the Linux emulator: virtual clock, settings and logging.
+
+The emulated machine/network/ntptime/urequests modules all read the clock
+from here, so the device script sees one consistent notion of time that can
+run faster than real time (EMU_SPEED) and start at any date (EMU_START).
+
+Settings come from environment variables so the device script itself needs
+no changes to run under the emulator:
+
+    EMU_SPEED       virtual seconds per real second (default 1)
+    EMU_START       virtual UTC start, "YYYY-MM-DDTHH:MM:SS" (default: now)
+    EMU_RTC_UNSET   1 = the RTC boots at 2021-01-01 like a fresh Pico
+    EMU_RTC_PPM     RTC drift in parts per million (positive = fast)
+    EMU_NTP_FAIL    1 = NTP never answers
+    EMU_BUTTON      comma separated virtual seconds at which the button is
+                    pressed (each press is held for 300 ms)
+    EMU_WIFI_MS     association time in ms (default 1500)
+    EMU_NET_MS      network round trip per HTTP request / NTP query (default 150)
+    EMU_WIFI_DOWN   AP outages as virtual second ranges, e.g. "600-660,900-960"
+    EMU_NET_HANG    virtual second ranges in which HTTP requests get no reply
+                    (a half-open connection): each one blocks until its socket
+                    timeout, or without one until the range ends
+    EMU_NET_TRICKLE virtual second ranges in which HTTP reply bodies trickle in,
+                    16 bytes a second: never slow enough for a socket timeout
+    EMU_SCREEN      1 = print the LCD contents whenever they change
+    EMU_STANDIN     1 = serve the MBTA API from mbta_standin.py on the
+                    virtual clock instead of calling api-v3.mbta.com
+    EMU_QUIET       1 = don't log hardware transitions
+    EMU_HTTP_PORT   where device servers on port 80 listen (default 8081)
+    EMU_LCD_RW      0 = the backpack's RW pin is tied to GND (no busy flag reads)
+    EMU_LCD_SIZE    LCD geometry as columns x lines, "16x2", "20x4" (default) or
+                    "40x4" (two controllers, the second one's E on the RW pin)
+    EMU_LCDS        more LCD backpacks as bus:address, e.g. "1:0x26,0:0x27"
+                    (each bus that gets used always has one at 0x27)
+    EMU_CONFIG      override script settings, e.g. "DUAL_CORE=True" (run.py)
+    EMU_RECORD      append every MBTA API response (virtual time, URL, headers,
+                    body) to this JSONL file
+    EMU_REPLAY      answer MBTA API calls from such a file instead: each request
+                    gets the latest response recorded for its URL (see replay.py)
+"""
+
+import calendar
+import os
+import sys
+import threading
+import time as _time
+
+_real_sleep = _time.sleep
+_real_monotonic = _time.monotonic
+_real_gmtime = _time.gmtime
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _parse_start(value):
+    if not value:
+        return _time.time()
+    return calendar.timegm(_time.strptime(value, "%Y-%m-%dT%H:%M:%S"))
+
+
+SPEED = _env_float("EMU_SPEED", 1) or 1
+QUIET = os.environ.get("EMU_QUIET") == "1"
+SCREEN = os.environ.get("EMU_SCREEN") == "1"
+WIFI_MS = int(_env_float("EMU_WIFI_MS", 1500))
+NET_MS = int(_env_float("EMU_NET_MS", 150))
+BUTTON_PRESSES = [float(t) for t in os.environ.get("EMU_BUTTON", "").split(",") if t.strip()]
+PRESS_MS = 300
+HTTP_PORT = int(_env_float("EMU_HTTP_PORT", 8081))
+LCD_RW = os.environ.get("EMU_LCD_RW") != "0"
+_cols, _lines = os.environ.get("EMU_LCD_SIZE", "20x4").lower().split("x")
+LCD_SIZE = (int(_lines), int(_cols))
+LCDS = [tuple(int(x, 0) for x in s.split(":")) for s in os.environ.get("EMU_LCDS", "").split(",") if s.strip()]
+WIFI_DOWN = [tuple(float(x) for x in r.split("-")) for r in os.environ.get("EMU_WIFI_DOWN", "").split(",") if r.strip()]
+NET_HANG = [tuple(float(x) for x in r.split("-")) for r in os.environ.get("EMU_NET_HANG", "").split(",") if r.strip()]
+NET_TRICKLE = [tuple(float(x) for x in r.split("-")) for r in os.environ.get("EMU_NET_TRICKLE", "").split(",") if r.strip()]
+
+
+class WatchdogReset(BaseException):
+    """The machine.WDT ran out; run.py restarts the script like a reboot."""
+
+
+class Clock:
+    """Virtual clock in microseconds since the emulator started.
+
+    Sleeps are scaled by SPEED; real time spent computing in between is
+    added 1:1, so a long lightsleep passes in an instant while the cost of
+    the code itself stays visible. Safe to use from both "cores" (threads):
+    their sleeps overlap in virtual time just as they do in real time.
+    """
+
+    def __init__(self, start, speed, rtc_unset=False, ppm=0.0):
+        self.epoch = start
+        self.speed = speed
+        self.us = 0
+        self.ppm = ppm
+        # Device RTC = world time + offset + drift
+        self.rtc_offset = (calendar.timegm((2021, 1, 1, 0, 0, 0)) - start) if rtc_unset else 0
+        self.rtc_set_us = 0
+        self._real = _real_monotonic()
+        self.idle_hooks = []
+        self.wdt_deadline = None   # virtual us the watchdog bites at, once armed
+        self.lock = threading.Lock()
+
+    def _catch_up(self):
+        # Caller holds self.lock
+        now = _real_monotonic()
+        self.us += int((now - self._real) * 1_000_000)
+        self._real = now
+
+    def now_us(self):
+        with self.lock:
+            self._catch_up()
+            return self.us
+
+    def world(self):
+        """True UTC time (what NTP and the API servers see)."""
+        return self.epoch + self.now_us() / 1_000_000
+
+    def time(self):
+        """The device's RTC."""
+        us = self.now_us()
+        drift = (us - self.rtc_set_us) * self.ppm / 1e12
+        return self.epoch + us / 1_000_000 + self.rtc_offset + drift
+
+    def set_rtc(self, secs):
+        self.rtc_set_us = self.now_us()
+        self.rtc_offset = secs - self.world()
+
+    def advance_us(self, us):
+        """Accounts for time the device spends busy (e.g. on the I2C bus)."""
+        with self.lock:
+            self.us += int(us)
+
+    def sleep_us(self, us, until=None):
+        """Advances virtual time by us. If until(t_us) returns a time inside
+        the sleep, stops there instead. Returns True if cut short.
+        """
+        main = threading.current_thread() is threading.main_thread()
+        if main:
+            # Idle = the UI core sleeps; core 1 sleeping says nothing about
+            # whether the LCD is mid-update
+            for hook in self.idle_hooks:
+                hook()
+        with self.lock:
+            self._catch_up()
+            end = self.us + max(0, int(us))
+        stop = until(self.us, end) if until else None
+        cut = stop is not None and stop < end
+        if cut:
+            end = stop
+        # A watchdog left unfed bites in the middle of whatever blocks core 0
+        bite = main and self.wdt_deadline is not None and self.wdt_deadline < end
+        if bite:
+            end = max(self.us, self.wdt_deadline)
+        _real_sleep(max(0, end - self.us) / 1_000_000 / self.speed)
+        with self.lock:
+            # The other thread may have moved the clock on meanwhile
+            self._catch_up()
+            self.us = max(self.us, end)
+        if bite:
+            raise WatchdogReset()
+        return cut
+
+
+clock = Clock(_parse_start(os.environ.get("EMU_START")), SPEED,
+              os.environ.get("EMU_RTC_UNSET") == "1", _env_float("EMU_RTC_PPM", 0))
+
+
+def log(*args):
+    if not QUIET:
+        ts = _time.strftime("%H:%M:%S", _real_gmtime(clock.world()))
+        print(f"[emu {ts}]", *args, file=sys.stderr)
+
+
+def button_down(t_us):
+    """True if the scripted button is held at virtual time t_us."""
+    t = t_us / 1_000_000
+    for p in BUTTON_PRESSES:
+        if p <= t < p + PRESS_MS / 1000:
+            return True
+    return False
+
+
+def net_hang_end(t_us):
+    """End (virtual us) of the EMU_NET_HANG range t_us is in, or None."""
+    t = t_us / 1_000_000
+    for start, end in NET_HANG:
+        if start <= t < end:
+            return int(end * 1_000_000)
+    return None
+
+
+def net_trickle(t_us):
+    """True if reply bodies trickle in at virtual time t_us."""
+    t = t_us / 1_000_000
+    for start, end in NET_TRICKLE:
+        if start <= t < end:
+            return True
+    return False
+
+
+def ap_down(t_us):
+    """True if the access point is out at virtual time t_us."""
+    t = t_us / 1_000_000
+    for start, end in WIFI_DOWN:
+        if start <= t < end:
+            return True
+    return False
+
+
+def next_press(start_us, end_us):
+    """Virtual time of the first scripted press in [start_us, end_us)."""
+    for p in BUTTON_PRESSES:
+        p_us = int(p * 1_000_000)
+        if start_us < p_us <= end_us:
+            return p_us
+    return None
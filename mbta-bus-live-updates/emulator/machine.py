@@ -0,0 +1,374 @@
+"""Emulated `machine` module: Pin, I2C (PCF8574 + HD44780 model),
+lightsleep and WDT, enough to run the display scripts on Linux.
+"""
+
+import calendar
+import time
+
+import emu
+from emu import clock, log
+
+
+# ------------ PINS ------------
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    button_pins = []
+
+    def __init__(self, pin, mode=-1, pull=-1, value=None):
+        self.pin = pin
+        self.mode = mode
+        self.pull = pull
+        self._value = 0 if value is None else value
+        self.handler = None
+        if mode == Pin.IN and pull == Pin.PULL_UP:
+            # An input with a pull-up is a button to GND in these projects
+            Pin.button_pins.append(self)
+
+    def value(self, v=None):
+        if v is None:
+            if self in Pin.button_pins:
+                return 0 if emu.button_down(clock.now_us()) else 1
+            return self._value
+        if v != self._value and self.mode == Pin.OUT:
+            log(f"GP{self.pin} -> {v}")
+        self._value = v
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING, **kwargs):
+        self.handler = handler
+
+
+def _fire_button_irqs():
+    for p in Pin.button_pins:
+        if p.handler:
+            p.handler(p)
+
+
+# ------------ SLEEP ------------
+def lightsleep(ms=None):
+    log(f"lightsleep({ms})")
+    if ms is None:
+        ms = 24 * 3600 * 1000
+    if clock.sleep_us(ms * 1000, until=emu.next_press):
+        log("woken by button")
+        _fire_button_irqs()
+    else:
+        log("woken by timer")
+
+
+# ------------ WATCHDOG ------------
+PWRON_RESET = 1
+WDT_RESET = 3
+_reset_cause = PWRON_RESET   # run.py sets WDT_RESET when it restarts the script
+
+
+def reset_cause():
+    return _reset_cause
+
+
+class WDT:
+    """Bites (emu.WatchdogReset) once core 0 blocks past the timeout
+    without a feed(); it can't be stopped, as on the RP2040.
+    """
+
+    def __init__(self, id=0, timeout=5000):
+        self.timeout_us = timeout * 1000
+        log(f"watchdog armed, {timeout} ms")
+        self.feed()
+
+    def feed(self):
+        clock.wdt_deadline = clock.now_us() + self.timeout_us
+
+
+def deepsleep(ms=None):
+    log(f"deepsleep({ms})")
+    raise SystemExit
+
+
+def reset():
+    log("reset()")
+    raise SystemExit
+
+
+def freq(hz=None):
+    return 150_000_000
+
+
+class RTC:
+
+    def datetime(self, t=None):
+        if t is None:
+            lt = time.gmtime(int(clock.time()))
+            return (lt[0], lt[1], lt[2], lt[6], lt[3], lt[4], lt[5], 0)
+        clock.set_rtc(calendar.timegm((t[0], t[1], t[2], t[4], t[5], t[6])))
+        log("rtc set %04d-%02d-%02d %02d:%02d:%02d" % (t[0], t[1], t[2], t[4], t[5], t[6]))
+
+
+# ------------ I2C ------------
+class HD44780:
+    """Models the LCD controller behind a PCF8574 backpack: latches nibbles
+    on the falling edge of E and keeps DDRAM/CGRAM contents. Instructions
+    keep it busy for their datasheet execution time; the busy flag can be
+    read back through RW (unless EMU_LCD_RW=0), and anything latched while
+    busy is counted in `overruns`, as a real controller would drop it.
+    """
+
+    MASK_RS = 0x01
+    MASK_RW = 0x02
+    MASK_E = 0x04
+    MASK_BL = 0x08
+
+    EXEC_US = 37          # most instructions
+    EXEC_DATA_US = 41     # DDRAM/CGRAM write
+    EXEC_HOME_US = 1520   # clear, home
+
+    def __init__(self, lines=4, columns=20, mask_e=MASK_E):
+        self.lines = lines
+        self.columns = columns
+        self.mask_e = mask_e         # the PCF8574 pin driving this controller's E
+        self.ddram = bytearray(b" " * 128)
+        self.cgram = bytearray(64)
+        self.addr = 0
+        self.cg_mode = False
+        self.four_bit = False
+        self.pending = None          # high nibble waiting for its partner
+        self.last = 0
+        self.backlight = False
+        self.display_on = False
+        self.changed = False
+        self.shown = None
+        self.rw_wired = emu.LCD_RW
+        self.read_low = False        # next read pulse returns the low nibble
+        self.busy_until = 0
+        self.overruns = 0
+
+    def busy(self):
+        return clock.now_us() < self.busy_until
+
+    def _reading(self, byte):
+        return self.rw_wired and byte & self.MASK_RW
+
+    def write(self, byte):
+        if (self.last & self.mask_e) and not (byte & self.mask_e):
+            if self._reading(self.last):
+                self.read_low = not self.read_low
+            else:
+                self._latch(self.last)
+        bl = bool(byte & self.MASK_BL)
+        if bl != self.backlight:
+            self.backlight = bl
+            log("backlight", "on" if bl else "off")
+        self.last = byte
+
+    def read(self):
+        """PCF8574 port read: pins written 0 read 0, pins written 1 float
+        high unless the LCD drives them (RW and E high).
+        """
+        byte = self.last
+        if self._reading(byte) and byte & self.mask_e:
+            if self.read_low:
+                nibble = self.addr & 0x0F
+            else:
+                nibble = (0x08 if self.busy() else 0) | ((self.addr >> 4) & 0x07)
+            byte &= 0x0F | (nibble << 4)
+        return byte
+
+    def _latch(self, byte):
+        nibble = byte >> 4
+        rs = byte & self.MASK_RS
+        if self.four_bit and self.busy():
+            self.overruns += 1
+            if self.overruns == 1:
+                log("lcd written while busy")
+        if not self.four_bit:
+            self._command(nibble << 4)
+            return
+        if self.pending is None:
+            self.pending = nibble
+            return
+        value = (self.pending << 4) | nibble
+        self.pending = None
+        if rs:
+            self._data(value)
+        else:
+            self._command(value)
+
+    def _command(self, cmd):
+        long = cmd in (0x01, 0x02, 0x03)
+        self.busy_until = clock.now_us() + (self.EXEC_HOME_US if long else self.EXEC_US)
+        if cmd & 0x80:
+            self.addr = cmd & 0x7F
+            self.cg_mode = False
+        elif cmd & 0x40:
+            self.addr = cmd & 0x3F
+            self.cg_mode = True
+        elif cmd & 0x20:
+            self.four_bit = not (cmd & 0x10)
+        elif cmd & 0x08:
+            self.display_on = bool(cmd & 0x04)
+            self.changed = True
+        elif cmd == 0x01:
+            self.ddram[:] = b" " * 128
+            self.addr = 0
+            self.cg_mode = False
+            self.changed = True
+        elif cmd & 0x02:
+            self.addr = 0
+            self.cg_mode = False
+
+    def _data(self, value):
+        self.busy_until = clock.now_us() + self.EXEC_DATA_US
+        if self.cg_mode:
+            self.cgram[self.addr & 0x3F] = value
+            self.addr = (self.addr + 1) & 0x3F
+        else:
+            if self.ddram[self.addr] != value:
+                self.ddram[self.addr] = value
+                self.changed = True
+            self.addr = (self.addr + 1) & 0x7F
+
+    def row_text(self, row):
+        base = (0x00, 0x40, self.columns, 0x40 + self.columns)[row]
+        out = []
+        for b in self.ddram[base:base + self.columns]:
+            if b < 8:
+                out.append(str(b))       # CGRAM glyph
+            elif b == 0xFF:
+                out.append("#")
+            elif 0x20 <= b < 0x7F:
+                out.append(chr(b))
+            else:
+                out.append("?")
+        return "".join(out)
+
+    def screen(self):
+        return [self.row_text(r) for r in range(self.lines)]
+
+
+class DualHD44780:
+    """A 40x4 module: two 40x2 controllers on one backpack, the second one's
+    E on P1 (RW, tied to GND at the module, so no busy flag).
+    """
+
+    def __init__(self, lines=4, columns=40):
+        self.lines = lines
+        self.columns = columns
+        self.chips = (HD44780(2, columns), HD44780(2, columns, HD44780.MASK_RW))
+        for chip in self.chips:
+            chip.rw_wired = False
+        self.shown = None
+
+    def write(self, byte):
+        for chip in self.chips:
+            chip.write(byte)
+
+    def read(self):
+        return self.chips[0].last
+
+    @property
+    def backlight(self):
+        return self.chips[0].backlight
+
+    @property
+    def changed(self):
+        return self.chips[0].changed or self.chips[1].changed
+
+    @changed.setter
+    def changed(self, value):
+        for chip in self.chips:
+            chip.changed = value
+
+    @property
+    def overruns(self):
+        return self.chips[0].overruns + self.chips[1].overruns
+
+    def screen(self):
+        return self.chips[0].screen() + self.chips[1].screen()
+
+
+def _new_lcd():
+    lines, columns = emu.LCD_SIZE
+    if lines * columns > 80:
+        return DualHD44780(lines, columns)
+    return HD44780(lines, columns)
+
+
+class I2C:
+    """I2C bus with a PCF8574 LCD backpack at 0x27, plus any more that
+    EMU_LCDS puts on it.
+    """
+
+    devices = {}
+
+    def __init__(self, id, scl=None, sda=None, freq=400_000):
+        self.id = id
+        self.freq = freq
+        self.transactions = 0
+        self.bytes = 0
+        self.lcd = I2C.devices.setdefault((id, 0x27), _new_lcd())
+        for bus, addr in emu.LCDS:
+            if bus == id:
+                I2C.devices.setdefault((bus, addr), _new_lcd())
+        clock.idle_hooks.append(self._print_screen)
+
+    def scan(self):
+        return sorted(a for (bus, a) in I2C.devices if bus == self.id)
+
+    def writeto(self, addr, buf, stop=True):
+        self.transactions += 1
+        self.bytes += len(buf)
+        dev = I2C.devices.get((self.id, addr))
+        if dev is None:
+            raise OSError(19)     # ENODEV, same as the real port
+        # ~10 bits per byte + address on the wire; the pins change as each
+        # byte arrives, so multi-byte writes strobe E at the bus rate
+        byte_us = 10 * 1_000_000 // self.freq
+        clock.advance_us(byte_us)
+        for b in buf:
+            clock.advance_us(byte_us)
+            dev.write(b)
+        return len(buf)
+
+    def readfrom(self, addr, nbytes, stop=True):
+        self.transactions += 1
+        self.bytes += nbytes
+        dev = I2C.devices.get((self.id, addr))
+        if dev is None:
+            raise OSError(19)
+        clock.advance_us((nbytes + 1) * 10 * 1_000_000 // self.freq)
+        return bytes(dev.read() for _ in range(nbytes))
+
+    def readfrom_into(self, addr, buf, stop=True):
+        buf[:] = self.readfrom(addr, len(buf), stop)
+
+    def _print_screen(self):
+        if not emu.SCREEN:
+            return
+        several = len(I2C.devices) > 1
+        for (bus, addr), dev in sorted(I2C.devices.items()):
+            if bus == self.id and dev.changed:
+                self._print_lcd(dev, " %d:0x%02x" % (bus, addr) if several else "")
+
+    def _print_lcd(self, dev, name):
+        dev.changed = False
+        rows = dev.screen()
+        if rows == dev.shown:
+            return
+        dev.shown = rows
+        border = "+" + "-" * dev.columns + "+"
+        log("LCD" + name + ("" if dev.backlight else " (backlight off)"))
+        print(border)
+        for r in rows:
+            print("|" + r + "|")
+        print(border)
@@ -0,0 +1,269 @@
+"""Local stand-in for the MBTA v3 API.
+
+Serves /predictions, /alerts, /vehicles, /schedules, /routes and /stops with a synthetic
+timetable so the device script (under the emulator) and the PC tools can run
+without network access or an API key. Every route runs at a fixed headway
+along a straight line of stops; there is no service between 01:00 and 05:00
+local time. /alerts honours If-None-Match and If-Modified-Since like the
+real API, and JSON is gzipped for clients that send Accept-Encoding: gzip.
+STANDIN_NO_PREDICTIONS=116 makes /predictions come back empty for
+that route (vehicles keep running), to exercise the ETA fallback.
+STANDIN_RATE_LIMIT=20 enforces that many requests per clock minute like
+the real API: x-ratelimit-* headers on every reply, 429 past the limit.
+
+    python emulator/mbta_standin.py [--port 8080]
+    MBTA_API_BASE=http://127.0.0.1:8080 python emulator/run.py
+
+Under the emulator (EMU_STANDIN=1) it runs in-process on the virtual clock.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+TZ_OFFSET_SECONDS = -5 * 3600
+
+HEADWAY_MIN = {"116": 12, "Blue": 6}
+DEFAULT_HEADWAY_MIN = 10
+NO_SERVICE = (1, 5)    # local hours [start, end)
+RATE_LIMIT = int(os.environ.get("STANDIN_RATE_LIMIT", "0"))   # per minute; 0 = none
+
+# Each route is a line of stops with the display's stop 9th from the start
+TARGET_STOPS = {"116": "5733", "Blue": "place-aport"}
+STOPS_BEFORE = 8
+STOPS_AFTER = 3
+SEGMENT_S = 90
+
+ROUTES = {
+    "116": {"short_name": "116", "long_name": "Wonderland Station - Maverick Station",
+            "color": "FFC72C", "direction_names": ["Outbound", "Inbound"],
+            "direction_destinations": ["Wonderland Station", "Maverick Station"]},
+    "Blue": {"short_name": "", "long_name": "Blue Line", "color": "003DA5",
+             "direction_names": ["West", "East"],
+             "direction_destinations": ["Bowdoin", "Wonderland"]},
+}
+STOP_NAMES = {"5733": "Meridian St @ Maverick Sq – Inbound", "place-aport": "Airport"}
+
+ALERTS = [
+    {"type": "alert", "id": "600001",
+     "attributes": {"header": "Route 116 detoured around Maverick Sq due to construction",
+                    "severity": 5, "lifecycle": "ONGOING"},
+     "routes": ("116",)},
+    {"type": "alert", "id": "600002",
+     "attributes": {"header": "Blue Line: expect delays of up to 10 minutes due to a disabled train",
+                    "severity": 7, "lifecycle": "NEW"},
+     "routes": ("Blue",)},
+]
+ALERTS_MODIFIED = "Mon, 13 Oct 2025 09:00:00 GMT"
+ALERTS_ETAG = 'W/"alerts-1"'
+
+
+def _iso_local(t_utc):
+    lt = time.gmtime(int(t_utc) + TZ_OFFSET_SECONDS)
+    return "%04d-%02d-%02dT%02d:%02d:%02d-05:00" % tuple(lt[:6])
+
+
+def route_stops(route):
+    target = TARGET_STOPS.get(route, route + "-target")
+    return ([f"{route}-{i:02d}" for i in range(1, STOPS_BEFORE + 1)] + [target] +
+            [f"{route}-{i:02d}" for i in range(STOPS_BEFORE + 2, STOPS_BEFORE + 2 + STOPS_AFTER)])
+
+
+def departures(route, now, count):
+    """Next count departure times (UTC seconds) for route after now."""
+    headway = HEADWAY_MIN.get(route, DEFAULT_HEADWAY_MIN) * 60
+    phase = sum(map(ord, route)) * 37 % headway
+    t = now - (now - phase) % headway + headway
+    out = []
+    while len(out) < count and t < now + 6 * 3600:
+        hour = time.gmtime(int(t) + TZ_OFFSET_SECONDS)[3]
+        if not NO_SERVICE[0] <= hour < NO_SERVICE[1]:
+            out.append(t)
+        t += headway
+    return out
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    clock = time.time
+    window = [0, 0]       # rate limit: [window start, requests in it]
+    throttled = 0         # 429s sent
+    lock = threading.Lock()
+    limit_headers = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _over_limit(self):
+        # Fixed one-minute windows, like the real API
+        if not RATE_LIMIT:
+            return False
+        now = self.clock()
+        start = int(now - now % 60)
+        with Handler.lock:
+            if self.window[0] != start:
+                self.window[:] = [start, 0]
+            self.window[1] += 1
+            used = self.window[1]
+            if used > RATE_LIMIT:
+                Handler.throttled += 1
+        self.limit_headers = {"x-ratelimit-limit": RATE_LIMIT,
+                              "x-ratelimit-remaining": max(0, RATE_LIMIT - used),
+                              "x-ratelimit-reset": start + 60}
+        return used > RATE_LIMIT
+
+    def end_headers(self):
+        for k, v in (self.limit_headers or {}).items():
+            self.send_header(k, str(v))
+        super().end_headers()
+
+    def _send_json(self, obj, status=200):
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/vnd.api+json")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if self._over_limit():
+            self._send_json({"errors": [{"status": "429", "code": "rate_limited"}]}, 429)
+            return
+        if url.path == "/predictions":
+            self._predictions(q)
+        elif url.path == "/alerts":
+            self._alerts(q)
+        elif url.path == "/vehicles":
+            self._vehicles(q)
+        elif url.path == "/schedules":
+            self._schedules(q)
+        elif url.path == "/routes":
+            ids = q.get("filter[id]", ",".join(ROUTES)).split(",")
+            self._send_json({"data": [{"type": "route", "id": r, "attributes": ROUTES[r]}
+                                      for r in ids if r in ROUTES]})
+        elif url.path == "/stops":
+            ids = q.get("filter[id]", "").split(",")
+            self._send_json({"data": [{"type": "stop", "id": i,
+                                       "attributes": {"name": STOP_NAMES.get(i, "Stop " + i)}}
+                                      for i in ids if i]})
+        else:
+            self._send_json({"errors": [{"status": "404", "code": "not_found"}]}, 404)
+
+    def _predictions(self, q):
+        route = q.get("filter[route]", "")
+        stop = q.get("filter[stop]", "")
+        limit = int(q.get("page[limit]", 4))
+        now = self.clock()
+        data = []
+        if route in os.environ.get("STANDIN_NO_PREDICTIONS", "").split(","):
+            limit = 0
+        for i, t in enumerate(departures(route, now, limit)):
+            data.append({
+                "type": "prediction",
+                "id": f"prediction-{route}-{stop}-{int(t)}",
+                "attributes": {"departure_time": _iso_local(t),
+                               "arrival_time": _iso_local(t - 30)},
+            })
+        self._send_json({"data": data, "jsonapi": {"version": "1.0"}})
+
+    def _alerts(self, q):
+        if (self.headers.get("If-None-Match") == ALERTS_ETAG
+                or self.headers.get("If-Modified-Since") == ALERTS_MODIFIED):
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        routes = q.get("filter[route]", "").split(",")
+        data = [{k: a[k] for k in ("type", "id", "attributes")}
+                for a in ALERTS if set(a["routes"]) & set(routes)]
+        body = json.dumps({"data": data}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.api+json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Last-Modified", ALERTS_MODIFIED)
+        self.send_header("ETag", ALERTS_ETAG)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _trips(self, route, start, count):
+        """(trip id, [(stop id, seq, time at stop)]) for trips whose time at
+        the target stop is after start.
+        """
+        stops = route_stops(route)
+        for t in departures(route, start, count):
+            at = [(stop, i + 1, t + (i - STOPS_BEFORE) * SEGMENT_S) for i, stop in enumerate(stops)]
+            yield f"{route}-trip-{int(t)}", at
+
+    def _vehicles(self, q):
+        route = q.get("filter[route]", "")
+        now = self.clock()
+        data = []
+        span = (len(route_stops(route)) - 1) * SEGMENT_S
+        for trip, at in self._trips(route, now - span, 8):
+            if not at[0][2] - SEGMENT_S < now < at[-1][2]:
+                continue      # not on the road yet / finished
+            stop, seq, t = next(a for a in at if a[2] > now)
+            status = "INCOMING_AT" if t - now < 30 else "IN_TRANSIT_TO"
+            data.append({
+                "type": "vehicle", "id": "y" + trip[-6:],
+                "attributes": {"current_status": status, "current_stop_sequence": seq,
+                               "direction_id": int(q.get("filter[direction_id]", 0)),
+                               "updated_at": _iso_local(now)},
+                "relationships": {"stop": {"data": {"type": "stop", "id": stop}},
+                                  "trip": {"data": {"type": "trip", "id": trip}}},
+            })
+        self._send_json({"data": data})
+
+    def _schedules(self, q):
+        route = q.get("filter[route]", "")
+        data = []
+        for trip, at in self._trips(route, self.clock(), int(q.get("page[limit]", 20))):
+            for stop, seq, t in at:
+                data.append({
+                    "type": "schedule", "id": f"schedule-{trip}-{stop}-{seq}",
+                    "attributes": {"arrival_time": _iso_local(t), "departure_time": _iso_local(t),
+                                   "stop_sequence": seq},
+                    "relationships": {"stop": {"data": {"type": "stop", "id": stop}},
+                                      "trip": {"data": {"type": "trip", "id": trip}}},
+                })
+        self._send_json({"data": data})
+
+    def date_time_string(self, timestamp=None):
+        return super().date_time_string(self.clock() if timestamp is None else timestamp)
+
+
+def serve(port=0, clock=None):
+    """Starts the stand-in on a daemon thread. Returns the base URL."""
+    handler = type("StandinHandler", (Handler,), {})
+    if clock is not None:
+        handler.clock = staticmethod(clock)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--port", type=int, default=8080)
+    args = ap.parse_args()
+    handler = type("StandinHandler", (Handler,), {})
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), handler)
+    print(f"MBTA stand-in on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
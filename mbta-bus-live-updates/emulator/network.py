@@ -0,0 +1,91 @@
+"""Emulated `network` module: a station WLAN that associates after
+EMU_WIFI_MS of virtual time (a third of that with a cached BSSID), drops
+out during EMU_WIFI_DOWN and logs every power/link transition.
+"""
+
+import emu
+from emu import clock, log
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_WRONG_PASSWORD = -3
+STAT_NO_AP_FOUND = -2
+STAT_CONNECT_FAIL = -1
+STAT_GOT_IP = 3
+
+
+class WLAN:
+    _instances = {}
+
+    def __new__(cls, interface=STA_IF):
+        # Like the real port, WLAN(STA_IF) always returns the same object
+        if interface not in cls._instances:
+            obj = super().__new__(cls)
+            obj._active = False
+            obj._connect_at = None
+            obj._ssid = "emulated-ap"
+            obj._config = {"rssi": -58, "channel": 6,
+                           "bssid": b"\x02\x00\x00\x00\x00\x01",
+                           "mac": b"\x28\xcd\xc1\x00\x00\x01"}
+            cls._instances[interface] = obj
+        return cls._instances[interface]
+
+    def active(self, state=None):
+        if state is None:
+            return self._active
+        if bool(state) != self._active:
+            log("wlan active", bool(state))
+        self._active = bool(state)
+        if not self._active:
+            self._connect_at = None
+
+    def connect(self, ssid=None, key=None, *, bssid=None, **kwargs):
+        if not self._active:
+            raise OSError("wifi not active")
+        if ssid is not None:
+            self._ssid = ssid
+        ms = emu.WIFI_MS // 3 if bssid else emu.WIFI_MS
+        log(f"wlan connect ssid={ssid!r}" + (" (cached bssid)" if bssid else ""))
+        self._connect_at = clock.now_us() + ms * 1000
+
+    def disconnect(self):
+        if self._connect_at is not None:
+            log("wlan disconnect")
+        self._connect_at = None
+
+    def status(self, param=None):
+        if param == "rssi":
+            return self._config["rssi"]
+        if not self._active or self._connect_at is None:
+            return STAT_IDLE
+        if emu.ap_down(clock.now_us()):
+            if self._connect_at <= clock.now_us():
+                log("wlan link lost")
+            self._connect_at = clock.now_us() + 10 ** 12   # needs a new connect()
+            return STAT_NO_AP_FOUND
+        if clock.now_us() < self._connect_at:
+            return STAT_CONNECTING
+        return STAT_GOT_IP
+
+    def isconnected(self):
+        return self.status() == STAT_GOT_IP
+
+    def ifconfig(self, *args):
+        if self.isconnected():
+            return ("192.168.1.77", "255.255.255.0", "192.168.1.1", "192.168.1.1")
+        return ("0.0.0.0", "0.0.0.0", "0.0.0.0", "0.0.0.0")
+
+    def config(self, *args, **kwargs):
+        if args:
+            return self._config[args[0]]
+        self._config.update(kwargs)
+
+    def scan(self):
+        c = self._config
+        if not self._active:
+            raise OSError("wifi not active")
+        clock.sleep_us(1_200_000)   # a full scan takes a while
+        return [(self._ssid.encode(), c["bssid"], c["channel"], c["rssi"], 3, False)]
@@ -0,0 +1,23 @@
+"""Emulated `ntptime`: answers with the emulator's world time while the
+radio is up (EMU_NTP_FAIL=1 makes it always time out).
+"""
+
+import os
+
+import network
+from emu import NET_MS, clock, log
+
+host = "pool.ntp.org"
+timeout = 1
+
+
+def time():
+    if os.environ.get("EMU_NTP_FAIL") == "1" or not network.WLAN(network.STA_IF).isconnected():
+        raise OSError(110)   # ETIMEDOUT
+    clock.sleep_us(NET_MS * 1000)
+    return int(clock.world())
+
+
+def settime():
+    clock.set_rtc(time())
+    log("ntp settime ok")
@@ -0,0 +1,222 @@
+"""Replay a recorded stretch of MBTA responses through the device script.
+
+Record once (real API, real time; or the stand-in at any speed):
+
+    EMU_RECORD=day.jsonl python emulator/run.py
+
+then replay it as fast as the host allows, as often as you like:
+
+    python emulator/replay.py day.jsonl
+    python emulator/replay.py day.jsonl --rule 116,5733,1,3,0 --rule Blue,place-aport,0,2,7
+    python emulator/replay.py day.jsonl --hours 4 --config "DUAL_CORE=True"
+
+The script runs unchanged on the virtual clock, starting at the first
+recorded response. Every API call gets the latest response recorded for its
+URL by that virtual time (urequests.py, EMU_REPLAY). The alert rules are
+replaced by repeating versions of --rule (default: the 116 button alert),
+so they fire for every departure. At the end it reports:
+
+- alert latency: each alert the device fires against an oracle that sees every
+  recorded response the instant it was recorded and checks the rule
+  continuously (the same rule semantics as leave_alerts.py), plus alerts
+  the device missed or gave when the oracle wouldn't have
+- display staleness: sampled every virtual second while the backlight is
+  on, how old the recorded response behind the shown predictions is
+"""
+
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+
+TZ_OFFSET_SECONDS = -5 * 3600
+HOLD_S = 60           # leave_alerts.HOLD_MS
+NIGHT = (23, 6)       # the device sleeps then: no alerts expected
+MATCH_S = 180         # an alert this long after the oracle's still counts
+
+
+def iso_utc(iso):
+    return datetime.datetime.fromisoformat(iso).timestamp()
+
+
+def departures(rec):
+    data = json.loads(rec["body"]).get("data", [])
+    out = []
+    for item in data:
+        attr = item.get("attributes", {})
+        t = attr.get("departure_time") or attr.get("arrival_time")
+        if t:
+            out.append(iso_utc(t))
+    return sorted(out)
+
+
+def at_night(t):
+    h = int((t + TZ_OFFSET_SECONDS) // 3600) % 24
+    return h >= NIGHT[0] or h < NIGHT[1]
+
+
+def predictions_url(by_url, route, stop, direction):
+    for url in by_url:
+        if (url.startswith("/predictions?") and f"filter[route]={route}&" in url + "&"
+                and f"filter[stop]={stop}&" in url + "&"
+                and f"filter[direction_id]={direction}" in url):
+            return url
+    return None
+
+
+def oracle(recs, threshold_min, walk_min, end):
+    """(fire time, departure) for a repeating rule evaluated continuously
+    against the recorded timeline.
+    """
+    lead = (threshold_min + 1) * 60
+    walk = walk_min * 60
+    fires = []
+    hold = None
+    for k, rec in enumerate(recs):
+        t_next = recs[k + 1]["t"] if k + 1 < len(recs) else end
+        cur = rec["t"]
+        for d in departures(rec):
+            if d - walk < cur:
+                continue              # gone, or can't be made any more
+            tau = max(cur, d - walk - lead)
+            if tau >= t_next:
+                break                 # newer predictions by then
+            if hold is None or d > hold:
+                if not at_night(tau):
+                    fires.append((tau, d))
+                hold = d + HOLD_S
+            # d stays the first catchable departure (and blocks the rule)
+            # until it can't be made
+            cur = d - walk
+    return fires
+
+
+def match(device, expected):
+    """Pairs device alert times with oracle fire times in order. Returns
+    (latencies, missed, spurious).
+    """
+    latencies, missed = [], 0
+    i = 0
+    for tau, _ in expected:
+        while i < len(device) and device[i] < tau - 5:
+            i += 1                    # before anything was due
+        if i < len(device) and device[i] - tau <= MATCH_S:
+            latencies.append(device[i] - tau)
+            i += 1
+        else:
+            missed += 1
+    return latencies, missed, len(device) - len(latencies)
+
+
+def dist(values):
+    if not values:
+        return "n/a"
+    v = sorted(values)
+    return (f"p50 {statistics.median(v):6.1f}s  p95 {v[max(0, int(len(v) * 0.95) - 1)]:6.1f}s  "
+            f"max {v[-1]:6.1f}s  (n={len(v)})")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay an EMU_RECORD file through the device script")
+    ap.add_argument("recording")
+    ap.add_argument("--rule", action="append",
+                    help="route,stop,direction,threshold_min,walk_min (repeatable; default 116,5733,1,3,0)")
+    ap.add_argument("--hours", type=float, help="stop after this much virtual time")
+    ap.add_argument("--speed", type=float, default=100_000, help="EMU_SPEED (default: as fast as possible)")
+    ap.add_argument("--config", default="", help="extra EMU_CONFIG overrides")
+    ap.add_argument("--script", default=os.path.join(APP_DIR, "mbta-bus-pred-with-alerts.py"))
+    args = ap.parse_args()
+
+    with open(args.recording) as f:
+        times = [json.loads(line)["t"] for line in f if line.strip()]
+    start = int(min(times)) - 5
+    end = max(times) if args.hours is None else min(max(times), start + args.hours * 3600)
+    rules = [r.split(",") for r in (args.rule or ["116,5733,1,3,0"])]
+    rules = [(r[0], r[1], r[2], int(r[3]), int(r[4])) for r in rules]
+
+    # No flash copy either: a preds_*.bin left in the working directory
+    # would otherwise decide what the first seconds look like
+    overrides = "ALERT_RULES=(%s,),STATUS_PORT=0,PERSIST_EVERY_S=0" % ",".join(
+        "(%r, %r, %r, %d, %d, True, None)" % r for r in rules)
+    if args.config:
+        overrides += "," + args.config
+    os.environ.update({
+        "EMU_REPLAY": args.recording,
+        "EMU_START": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(start)),
+        "EMU_SPEED": str(args.speed),
+        "EMU_CONFIG": overrides,
+    })
+    os.environ.setdefault("EMU_QUIET", "1")
+    sys.argv = [os.path.join(HERE, "run.py"), args.script]
+
+    sys.path.insert(0, HERE)
+    import run                      # noqa: E402  (reads the EMU_* settings on import)
+    import machine
+    import urequests
+    import leave_alerts
+    from emu import clock
+
+    # Which rule fired when (the buzzer and status line follow in the same tick)
+    fired = {r[:3]: [] for r in rules}
+    tick = leave_alerts.AlertEngine.tick
+
+    def traced_tick(engine):
+        rule = tick(engine)
+        if rule is not None:
+            fired[(rule.route, rule.stop, rule.direction)].append(clock.world())
+        return rule
+
+    leave_alerts.AlertEngine.tick = traced_tick
+
+    # Once a virtual second: age of the shown predictions; stop at the end
+    urls = [predictions_url(urequests.recording.by_url, *r[:3]) for r in rules]
+    ages = []
+    state = {"next": start, "served": {}}
+
+    def sample():
+        now = clock.world()
+        if now >= end:
+            raise KeyboardInterrupt
+        if now < state["next"]:
+            return
+        state["next"] = now + 1
+        served = urequests.recording.served
+        while served:
+            _, url, rec_t = served.pop(0)
+            state["served"][url] = rec_t
+        if not any(dev.backlight for dev in machine.I2C.devices.values()):
+            return                    # night: nothing on show
+        for url in urls:
+            if url in state["served"]:
+                ages.append(now - state["served"][url])
+
+    clock.idle_hooks.append(sample)
+
+    t0 = time.monotonic()
+    run.main(sys.argv)
+    wall = time.monotonic() - t0
+
+    span = end - start
+    print(f"replayed {span / 3600:.1f} h of {args.recording} in {wall:.0f} s "
+          f"({span / wall:.0f}x real time)")
+    for rule, url in zip(rules, urls):
+        if url is None:
+            print(f"rule {rule}: no recorded predictions for it")
+            continue
+        expected = oracle(urequests.recording.by_url[url], rule[3], rule[4], end)
+        expected = [e for e in expected if e[0] < end]
+        lat, missed, spurious = match(fired[rule[:3]], expected)
+        print(f"rule {','.join(map(str, rule))}: {len(expected)} due, {len(lat)} given, "
+              f"{missed} missed, {spurious} extra")
+        print(f"  alert latency     {dist(lat)}")
+    print(f"display staleness   {dist(ages)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Run a device script on Linux under the emulator.
+
+    python emulator/run.py [script.py]          (default: mbta-bus-pred-with-alerts.py)
+
+    EMU_SCREEN=1 EMU_SPEED=600 EMU_START=2025-11-14T03:50:00 \\
+        python emulator/run.py                  # watch night mode at 10 min/s
+
+    EMU_CONFIG="DUAL_CORE=True,BIG_DIGITS=False" python emulator/run.py
+                                                # override config constants
+
+The emulated machine/network/ntptime/urequests modules are put first on the
+path, `time` grows the MicroPython extras (sleep_ms, ticks_*) on top of the
+virtual clock in emu.py, and the LCD driver from counter-lcd/ is importable
+as machine_i2c_lcd. See emu.py for the EMU_* settings.
+"""
+
+import ast
+import calendar
+import gc
+import os
+import runpy
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+LCD_DIR = os.path.join(os.path.dirname(APP_DIR), "counter-lcd")
+
+sys.path[:0] = [HERE, APP_DIR, LCD_DIR]
+
+import emu  # noqa: E402
+from emu import clock  # noqa: E402
+
+
+# ------------ MICROPYTHON TIME ------------
+TICKS_PERIOD = 1 << 30
+
+
+def _localtime(secs=None):
+    # No timezones on the device: localtime == gmtime, 8-tuple
+    if secs is None:
+        secs = clock.time()
+    return tuple(emu._real_gmtime(int(secs)))[:8]
+
+
+def _mktime(t):
+    return calendar.timegm(tuple(t[:6]) + (0, 0, 0))
+
+
+def patch_time():
+    time.time = clock.time
+    time.time_ns = lambda: int(clock.time() * 1_000_000_000)
+    time.localtime = _localtime
+    time.gmtime = _localtime
+    time.mktime = _mktime
+    time.sleep = lambda s: clock.sleep_us(s * 1_000_000)
+    time.sleep_ms = lambda ms: clock.sleep_us(ms * 1000)
+    time.sleep_us = clock.sleep_us
+    time.ticks_ms = lambda: (clock.now_us() // 1000) % TICKS_PERIOD
+    time.ticks_us = lambda: clock.now_us() % TICKS_PERIOD
+    time.ticks_cpu = time.ticks_us
+    time.ticks_add = lambda t, delta: (t + delta) % TICKS_PERIOD
+    time.ticks_diff = lambda a, b: ((a - b + TICKS_PERIOD // 2) % TICKS_PERIOD) - TICKS_PERIOD // 2
+    sys.modules["utime"] = time
+
+
+def patch_asyncio():
+    # asyncio.sleep() on the virtual clock, so EMU_SPEED still applies;
+    # other tasks (the status server) run at each sleep
+    import asyncio
+    real_sleep = asyncio.sleep
+
+    async def sleep(s, *args):
+        clock.sleep_us(s * 1_000_000)
+        await real_sleep(0)
+
+    asyncio.sleep = sleep
+    asyncio.sleep_ms = lambda ms: sleep(ms / 1000)
+
+    # Device servers listen on port 80; move them somewhere unprivileged
+    real_start_server = asyncio.start_server
+
+    async def start_server(cb, host, port, *args, **kwargs):
+        if port == 80:
+            port = emu.HTTP_PORT
+        emu.log(f"http server on {host}:{port}")
+        return await real_start_server(cb, host, port, *args, **kwargs)
+
+    asyncio.start_server = start_server
+
+
+def patch_gc():
+    # Rough numbers for a Pico W heap; only used for display/telemetry
+    gc.mem_free = lambda: 160_000
+    gc.mem_alloc = lambda: 32_000
+    gc.threshold = lambda *a: -1
+    # The LCD driver collects after every byte; on CPython's heap that costs
+    # milliseconds of real time (more with a second thread) for nothing
+    gc.collect = lambda: 0
+
+
+def patch_modules():
+    import i2c_lcd
+    sys.modules["machine_i2c_lcd"] = i2c_lcd
+    sys.modules.setdefault("micropython", type(sys)("micropython"))
+    sys.modules["micropython"].const = lambda x: x
+    sys.modules["uasyncio"] = __import__("asyncio")
+
+
+def split_overrides(overrides):
+    # "A=1,B=(1, 2)" -> [("A", "1"), ("B", "(1, 2)")]: commas inside
+    # brackets or quotes belong to the value
+    items, depth, quote, start = [], 0, None, 0
+    for i, c in enumerate(overrides + ","):
+        if quote:
+            quote = None if c == quote else quote
+        elif c in "\"'":
+            quote = c
+        elif c in "([{":
+            depth += 1
+        elif c in ")]}":
+            depth -= 1
+        elif c == "," and depth == 0:
+            name, _, value = overrides[start:i].partition("=")
+            if name.strip():
+                items.append((name.strip(), value.strip()))
+            start = i + 1
+    return items
+
+
+def run_with_config(script, overrides):
+    # Replaces top-level NAME = ... assignments of the script (however many
+    # lines they span), then runs it
+    with open(script) as f:
+        lines = f.read().split("\n")
+    spans = {}
+    for node in ast.parse("\n".join(lines)).body:
+        if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name):
+            spans.setdefault(node.targets[0].id, (node.lineno, node.end_lineno))
+    edits = []
+    for name, value in split_overrides(overrides):
+        if name not in spans:
+            raise SystemExit(f"EMU_CONFIG: no setting {name!r} in {script}")
+        edits.append(spans[name] + (f"{name} = {value}",))
+    for first, last, line in sorted(edits, reverse=True):
+        lines[first - 1:last] = [line]
+    src = "\n".join(lines)
+    exec(compile(src, script, "exec"), {"__name__": "__main__", "__file__": script})
+
+
+def main(argv):
+    script = argv[1] if len(argv) > 1 else os.path.join(APP_DIR, "mbta-bus-pred-with-alerts.py")
+    patch_time()
+    patch_asyncio()
+    patch_gc()
+    patch_modules()
+    if os.environ.get("EMU_STANDIN") == "1":
+        import mbta_standin
+        os.environ["MBTA_API_BASE"] = mbta_standin.serve(clock=clock.world)
+    emu.log(f"running {os.path.basename(script)} at {emu.SPEED:g}x")
+    while True:
+        try:
+            if os.environ.get("EMU_CONFIG"):
+                run_with_config(script, os.environ["EMU_CONFIG"])
+            else:
+                runpy.run_path(script, run_name="__main__")
+        except KeyboardInterrupt:
+            emu.log("stopped")
+        except emu.WatchdogReset:
+            # Like the board: reboot and run the script from the top
+            print("[emu] watchdog reset", file=sys.stderr)
+            import machine
+            machine._reset_cause = machine.WDT_RESET
+            clock.wdt_deadline = None
+            continue
+        break
+
+
+if __name__ == "__main__":
+    main(sys.argv)
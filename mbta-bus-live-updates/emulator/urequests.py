@@ -0,0 +1,184 @@
+"""Emulated `urequests` on top of urllib.
+
+Requests fail with OSError while the emulated WLAN is down. If
+MBTA_API_BASE is set (e.g. http://127.0.0.1:8080 for mbta_standin.py),
+calls to https://api-v3.mbta.com are sent there instead. EMU_RECORD
+appends every MBTA response to a JSONL file; EMU_REPLAY answers MBTA
+calls from one (see replay.py).
+"""
+
+import bisect
+import email.utils
+import errno
+import gzip
+import io
+import json as _json
+import os
+import urllib.error
+import urllib.request
+
+import emu
+import network
+from emu import NET_MS, clock
+
+MBTA_HOST = "https://api-v3.mbta.com"
+
+
+class Trickle(io.RawIOBase):
+    """A reply body that comes in 16 bytes a second (EMU_NET_TRICKLE)."""
+
+    def __init__(self, body):
+        self.body = io.BytesIO(body)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        clock.sleep_us(1_000_000)
+        data = self.body.read(min(len(buf), 16))
+        buf[:len(data)] = data
+        return len(data)
+
+
+class Response:
+
+    def __init__(self, status_code, reason, headers, body):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.body = body                  # as sent (not decompressed)
+        self.raw = Trickle(body) if emu.net_trickle(clock.now_us()) else io.BytesIO(body)
+        self._content = None
+
+    @property
+    def content(self):
+        # Read off raw on first use, as urequests does
+        if self._content is None:
+            self._content = self.raw.read()
+        return self._content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return _json.loads(self.content)
+
+    def close(self):
+        pass
+
+
+# ------------ RECORD / REPLAY ------------
+RECORD = os.environ.get("EMU_RECORD")
+REPLAY = os.environ.get("EMU_REPLAY")
+
+
+def _header(headers, name):
+    for k, v in (headers or {}).items():
+        if k.lower() == name:
+            return v
+    return None
+
+
+def record(path, resp):
+    # One line per response, body stored inflated so replay can serve it
+    # either way. 304s aren't kept: the 200 before them still stands
+    body = resp.body
+    headers = {k: v for k, v in resp.headers.items()
+               if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")}
+    if _header(resp.headers, "content-encoding") == "gzip":
+        body = gzip.decompress(body)
+    line = {"t": round(clock.world(), 3), "url": path, "status": resp.status_code,
+            "headers": headers, "body": body.decode("utf-8")}
+    with open(RECORD, "a") as f:
+        f.write(_json.dumps(line) + "\n")
+
+
+class Recording:
+    """Responses from an EMU_RECORD file, by URL in time order."""
+
+    def __init__(self, path):
+        self.by_url = {}
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    rec = _json.loads(line)
+                    self.by_url.setdefault(rec["url"], []).append(rec)
+        for recs in self.by_url.values():
+            recs.sort(key=lambda r: r["t"])
+        self.times = {url: [r["t"] for r in recs] for url, recs in self.by_url.items()}
+        self.served = []      # (virtual time, url, recorded time) per request
+
+    def lookup(self, url, now):
+        # Latest response recorded for this URL by now (else the first one)
+        recs = self.by_url.get(url)
+        if not recs:
+            return None
+        i = bisect.bisect_right(self.times[url], now) - 1
+        return recs[max(i, 0)]
+
+    def respond(self, url, headers):
+        now = clock.world()
+        rec = self.lookup(url, now)
+        if rec is None:
+            return Response(404, "Not Found", {}, b'{"errors":[{"code":"not_recorded"}]}')
+        self.served.append((now, url, rec["t"]))
+        out = dict(rec["headers"])
+        out["Date"] = email.utils.formatdate(now, usegmt=True)
+        etag = _header(rec["headers"], "etag")
+        if etag and _header(headers, "if-none-match") == etag:
+            return Response(304, "Not Modified", out, b"")
+        body = rec["body"].encode("utf-8")
+        if "gzip" in (_header(headers, "accept-encoding") or ""):
+            body = gzip.compress(body)
+            out["Content-Encoding"] = "gzip"
+        out["Content-Length"] = str(len(body))
+        return Response(rec["status"], "OK", out, body)
+
+
+recording = Recording(REPLAY) if REPLAY else None
+
+
+def request(method, url, data=None, json=None, headers=None, timeout=None):
+    if not network.WLAN(network.STA_IF).isconnected():
+        raise OSError(-2)    # getaddrinfo fails without a link
+    hang_end = emu.net_hang_end(clock.now_us())
+    if hang_end is not None:
+        # Connected, but nothing comes back: wait out the socket timeout
+        wait = hang_end - clock.now_us()
+        if timeout is not None and timeout * 1_000_000 < wait:
+            clock.sleep_us(timeout * 1_000_000)
+            raise OSError(errno.ETIMEDOUT)
+        clock.sleep_us(wait)
+        raise OSError(errno.ECONNRESET)
+    if recording is not None and url.startswith(MBTA_HOST):
+        clock.sleep_us(NET_MS * 1000)
+        return recording.respond(url[len(MBTA_HOST):], headers)
+    path = url[len(MBTA_HOST):] if url.startswith(MBTA_HOST) else None
+    base = os.environ.get("MBTA_API_BASE")
+    if base and url.startswith(MBTA_HOST):
+        url = base.rstrip("/") + url[len(MBTA_HOST):]
+    if json is not None:
+        data = _json.dumps(json).encode()
+    elif isinstance(data, str):
+        data = data.encode()
+    req = urllib.request.Request(url, data=data, method=method, headers=headers or {})
+    clock.sleep_us(NET_MS * 1000)    # the link's round trip; the stand-in itself is local
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as r:
+            resp = Response(r.status, r.reason, dict(r.headers), r.read())
+    except urllib.error.HTTPError as e:
+        resp = Response(e.code, e.reason, dict(e.headers), e.read())
+    except urllib.error.URLError as e:
+        raise OSError(str(e.reason))
+    if RECORD and path is not None and method == "GET" and resp.status_code != 304:
+        record(path, resp)
+    return resp
+
+
+def get(url, **kw):
+    return request("GET", url, **kw)
+
+
+def post(url, **kw):
+    return request("POST", url, **kw)
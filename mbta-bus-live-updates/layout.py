@@ -0,0 +1,30 @@
+"""Where the parts of the main screen go, for the panel's size.
+
+The board is two halves side by side (bus, Blue Line), each with a header
+and its arrivals, and a status line across the bottom. Layout derives the
+rows and columns from num_lines/num_columns once at start-up, so the same
+configuration draws on any of these modules:
+
+  16x2   header, next arrival (no following arrival, no status line)
+  20x4   header, next + following arrival (or big digits), status line
+  40x4   the same with 20-column halves and a 40-column status line
+
+Big digits need two rows and 10 columns per half (7 for the digits, 3 for
+"min" and the following arrival), so they are dropped on smaller panels.
+"""
+
+
+class Layout:
+
+    def __init__(self, num_lines, num_columns, big_digits=True):
+        self.num_lines = num_lines
+        self.num_columns = num_columns
+        half = num_columns // 2
+        self.half = half                     # width of each half
+        self.halves = (0, half)              # first column of the bus / Blue half
+        self.header = half - 1               # one cell short so headers don't run together
+        self.header_row = 0
+        self.next_row = 1 if num_lines > 1 else None
+        self.then_row = 2 if num_lines > 3 else None
+        self.status_row = num_lines - 1 if num_lines > 2 else None
+        self.big_digits = big_digits and self.then_row is not None and half >= 10
@@ -0,0 +1,90 @@
+"""Several LCDs on one or both I2C buses, sharing one I2C budget per frame.
+
+Each LCD keeps its own LcdFrame (and usually its own Compositor, which only
+draws). Once per frame BusScheduler.flush() sends their changed cells a few
+at a time, taking the displays in turn, until nothing is dirty or the
+frame's budget of bus time is spent; what is left goes out next frame, and
+the display that goes first rotates so none of them is always last.
+
+The I2C writes block, so both controllers share the one budget: it is time
+the main loop spends on the bus, whichever bus it is. A frame costs at most
+the budget (plus one chunk) however many displays there are, instead of
+growing with the number of displays when they all change at once, e.g. a
+4-display departure board ticking over on the minute.
+
+    i2c0 = I2C(0, sda=Pin(4), scl=Pin(5), freq=400_000)
+    i2c1 = I2C(1, sda=Pin(26), scl=Pin(27), freq=400_000)
+    bus = BusScheduler(budget_us=20_000)
+    for i2c in (i2c0, i2c1):
+        for addr in find_lcds(i2c):
+            bus.add(LcdFrame(I2cLcd(i2c, addr, 4, 20), 4, 20))
+"""
+
+import time
+
+
+def find_lcds(i2c):
+    """Addresses on the bus that can be PCF8574 (0x20-0x27) or PCF8574A
+    (0x38-0x3F) LCD backpacks.
+    """
+    return [a for a in i2c.scan() if 0x20 <= a <= 0x27 or 0x38 <= a <= 0x3F]
+
+
+class BusScheduler:
+
+    def __init__(self, budget_us=20_000, chunk=20):
+        self.frames = []
+        self.budget_us = budget_us   # bus time per flush()
+        self.chunk = chunk           # cells per turn: a 20-column row, ~2.5 ms at 400 kHz
+        self.turn = 0                # the display that goes first
+        self.flushes = 0
+        self.behind = 0              # flushes that ran out of budget
+        self.last_us = 0             # time the last flush() took
+        self.worst_us = 0
+
+    def add(self, frame):
+        self.frames.append(frame)
+        return frame
+
+    def is_dirty(self):
+        for f in self.frames:
+            if f.is_dirty():
+                return True
+        return False
+
+    def flush(self):
+        """Sends changed cells from every frame, chunk cells per display in
+        turn, until none is dirty or the budget is spent. Returns the
+        number of cells written.
+        """
+        frames = self.frames
+        n = len(frames)
+        if n == 0:
+            return 0
+        t0 = time.ticks_us()
+        written = 0
+        k = self.turn
+        clean = 0                    # displays in a row with nothing to send
+        while clean < n:
+            f = frames[k]
+            k = (k + 1) % n
+            if not f.is_dirty():
+                clean += 1
+                continue
+            clean = 0
+            written += f.flush(self.chunk)
+            if time.ticks_diff(time.ticks_us(), t0) >= self.budget_us:
+                if self.is_dirty():
+                    self.behind += 1
+                break
+        self.turn = (self.turn + 1) % n
+        self.last_us = time.ticks_diff(time.ticks_us(), t0)
+        if self.last_us > self.worst_us:
+            self.worst_us = self.last_us
+        self.flushes += 1
+        return written
+
+    def summary(self):
+        return {"displays": len(self.frames), "budget_us": self.budget_us,
+                "flushes": self.flushes, "behind": self.behind,
+                "last_us": self.last_us, "worst_us": self.worst_us}
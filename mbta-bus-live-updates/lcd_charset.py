@@ -0,0 +1,154 @@
+"""Unicode -> HD44780 character codes.
+
+The HD44780 isn't ASCII past 0x7D and isn't Unicode at all: alert headers
+with curly quotes and dashes, accented stop names or a "→" come out as
+garbage (or, past U+00FF, don't fit in a byte). A Charset holds a lookup
+table for one character ROM, built once when it's created:
+
+  A00  Japanese ROM, the common one. 0x5C is a yen sign and 0x7E/0x7F are
+       arrows; the upper half is katakana plus a few Greek letters and
+       ä ö ü ñ, so other accents are dropped (é -> e)
+  A02  European ROM. ASCII is complete and 0xA0..0xFF follow Latin-1, so
+       accented Latin letters show as themselves
+
+Code points below 256 index a 256-byte table; the few above it (quotes,
+dashes, arrows, Greek) come from a dict, and anything else becomes "?".
+encode_into() maps a whole string in one pass straight into a buffer (the
+framebuffer, for LcdFrame.put()), so there's no per-character branching on
+what kind of character it is. chr(0)..chr(7) still select CGRAM.
+
+Characters neither ROM has can be drawn as CGRAM glyphs: load_glyphs()
+uploads the ones in GLYPHS to free slots and points the table at them.
+"""
+
+UNKNOWN = 0x3F   # "?"
+
+# U+00C0..U+00FF with the accents dropped
+_FOLD = ("AAAAAAAC" "EEEE" "IIII" "DNOOOOOx"
+         "OUUUUYPs" "aaaaaaac" "eeee" "iiii" "dnooooo/" "ouuuuypy")
+
+# Both ROMs: typographic punctuation down to what the glass can show
+_COMMON = {
+    0x00A0: 0x20,                  # no-break space
+    0x00AB: 0x3C, 0x00BB: 0x3E,    # « »
+    0x2018: 0x27, 0x2019: 0x27, 0x201A: 0x27, 0x2032: 0x27,   # ‘ ’ ‚ ′
+    0x201C: 0x22, 0x201D: 0x22, 0x201E: 0x22, 0x2033: 0x22,   # “ ” „ ″
+    0x2010: 0x2D, 0x2011: 0x2D, 0x2012: 0x2D, 0x2013: 0x2D,   # hyphens, –
+    0x2014: 0x2D, 0x2212: 0x2D,    # — and minus
+    0x2026: 0x2E,                  # … (one cell)
+    0x2022: 0x2A, 0x00B7: 0x2A,    # • · (A00 overrides with its dot)
+    0x2192: 0x3E, 0x2190: 0x3C,    # → ← (A00 overrides with its arrows)
+    0x2588: 0xFF,                  # █ full block
+}
+
+# Code points in the A00 ROM that aren't ASCII, and ASCII it lacks
+_A00 = {
+    0x5C: 0x2F, 0x7E: 0x2D,        # \ and ~ aren't there (yen, arrow)
+    0x00A5: 0x5C,                  # ¥
+    0x2192: 0x7E, 0x2190: 0x7F,    # → ←
+    0x00B7: 0xA5, 0x2022: 0xA5, 0x30FB: 0xA5,   # middle dot
+    0x00B0: 0xDF,                  # °
+    0x03B1: 0xE0, 0x00E4: 0xE1, 0x00DF: 0xE2, 0x03B2: 0xE2,   # α ä ß β
+    0x03B5: 0xE3, 0x00B5: 0xE4, 0x03BC: 0xE4, 0x03C3: 0xE5,   # ε µ μ σ
+    0x03C1: 0xE6, 0x221A: 0xE8, 0x00A2: 0xEC, 0x00F1: 0xEE,   # ρ √ ¢ ñ
+    0x00F6: 0xEF, 0x03B8: 0xF2, 0x221E: 0xF3, 0x03A9: 0xF4,   # ö θ ∞ Ω
+    0x00FC: 0xF5, 0x03A3: 0xF6, 0x03C0: 0xF7, 0x00F7: 0xFD,   # ü Σ π ÷
+    0x00C4: 0xE1, 0x00D6: 0xEF, 0x00DC: 0xF5,   # no capitals: Ä Ö Ü as ä ö ü
+}
+
+# The A02 ROM's upper half is Latin-1; these are the exceptions used here
+_A02 = {
+    0x00B7: 0xB7, 0x2022: 0xB7,    # middle dot
+}
+
+# 5x8 glyphs for load_glyphs(), for characters neither ROM has
+GLYPHS = {
+    "é": bytearray([0x02, 0x04, 0x0E, 0x11, 0x1F, 0x10, 0x0E, 0x00]),
+    "è": bytearray([0x08, 0x04, 0x0E, 0x11, 0x1F, 0x10, 0x0E, 0x00]),
+    "à": bytearray([0x08, 0x04, 0x0E, 0x01, 0x0F, 0x11, 0x0F, 0x00]),
+    "ç": bytearray([0x00, 0x0E, 0x10, 0x10, 0x11, 0x0E, 0x04, 0x0C]),
+    "→": bytearray([0x00, 0x04, 0x02, 0x1F, 0x02, 0x04, 0x00, 0x00]),
+}
+
+
+class Charset:
+
+    def __init__(self, rom="A00"):
+        if rom not in ("A00", "A02"):
+            raise ValueError("unknown LCD ROM: " + rom)
+        self.rom = rom
+        low = bytearray(256)
+        for c in range(8):
+            low[c] = c                 # CGRAM
+        for c in range(8, 0x20):
+            low[c] = 0x20              # control characters, "\n" included
+        for c in range(0x20, 0x7F):
+            low[c] = c
+        low[0x7F] = UNKNOWN
+        for c in range(0x80, 0xA0):
+            low[c] = UNKNOWN           # C1 controls
+        for c in range(0xA0, 0xC0):
+            low[c] = c if rom == "A02" else UNKNOWN
+        for c in range(0xC0, 0x100):
+            low[c] = c if rom == "A02" else ord(_FOLD[c - 0xC0])
+        if rom == "A02":
+            low[0xD7] = 0x78           # × is a cross in Latin-1, not in A02
+        high = {}
+        for table in (_COMMON, _A00 if rom == "A00" else _A02):
+            for c, code in table.items():
+                if c < 256:
+                    low[c] = code
+                else:
+                    high[c] = code
+        self.low = low
+        self.high = high
+
+    def has(self, ch):
+        """True if ch has a code of its own (not the "?" fallback)."""
+        return self.code(ch) != UNKNOWN or ch == "?"
+
+    def code(self, ch):
+        """The LCD code for one character."""
+        c = ord(ch)
+        return self.low[c] if c < 256 else self.high.get(c, UNKNOWN)
+
+    def encode_into(self, text, buf, pos=0, n=-1):
+        """Writes the codes for text into buf from pos, at most n of them
+        (n < 0: all). Returns how many were written.
+        """
+        low = self.low
+        high = self.high
+        i = 0
+        for ch in text:           # iterating: indexing a MicroPython str is O(n)
+            if i == n:
+                break
+            c = ord(ch)
+            buf[pos + i] = low[c] if c < 256 else high.get(c, UNKNOWN)
+            i += 1
+        return i
+
+    def encode(self, text):
+        """str -> bytes of LCD codes."""
+        buf = bytearray(len(text))
+        self.encode_into(text, buf)
+        return bytes(buf)
+
+    def load_glyphs(self, lcd, chars, first_slot):
+        """Uploads the GLYPHS for chars to CGRAM from first_slot on (at most
+        slot 7) and maps those characters to them. Returns the next free slot.
+        """
+        slot = first_slot
+        for ch in chars:
+            if slot > 7:
+                break
+            pattern = GLYPHS.get(ch)
+            if pattern is None:
+                continue
+            lcd.custom_char(slot, pattern)
+            c = ord(ch)
+            if c < 256:
+                self.low[c] = slot
+            else:
+                self.high[c] = slot
+            slot += 1
+        return slot
@@ -0,0 +1,159 @@
+"""Shadow framebuffer for a character LCD.
+
+Screens draw into the framebuffer instead of talking to the LCD directly.
+flush() compares what was drawn with what is already on the glass and only
+sends the cells that changed, so a minute tick on the countdown costs a few
+I2C writes instead of a full clear + redraw.
+
+Nothing on the drawing side allocates once text is held as bytes: put()
+copies codes, put_num() writes digits straight into the frame and
+put_ring() scrolls a marquee, so a redraw of fixed templates plus numbers
+(see the widgets in the main script) leaves the heap alone and never
+triggers a collection. flush() hands the driver (buffer, start, end) for
+the same reason.
+
+str text goes through the frame's Charset (lcd_charset.py), which maps it
+to the LCD's character ROM in one table pass straight into the frame.
+"""
+
+from lcd_charset import Charset
+
+
+class LcdFrame:
+
+    def __init__(self, lcd, num_lines, num_columns, charset=None):
+        self.lcd = lcd
+        self.charset = charset or Charset()
+        self.num_lines = num_lines
+        self.num_columns = num_columns
+        size = num_lines * num_columns
+        self.want = bytearray(b" " * size)   # what the screen should show
+        self.shown = bytearray(b" " * size)  # what the LCD is showing
+        self.stale = True                   # shown[] can't be trusted
+        self.next = 0                       # where a limited flush() resumes
+
+    def clear(self):
+        """Blanks the whole frame (sent on the next flush)."""
+        for i in range(len(self.want)):
+            self.want[i] = 0x20
+
+    def invalidate(self):
+        """Forces the next flush to rewrite every cell, e.g. after something
+        else wrote to the LCD behind our back.
+        """
+        self.stale = True
+
+    def put(self, col, row, text, width=None):
+        """Draws text at (col, row). If width is given the text is padded
+        with spaces (or truncated) to exactly that many cells. str is
+        mapped to LCD codes by the charset (chr(0)..chr(7) select CGRAM);
+        bytes (e.g. the labels in stop_meta.py) are copied as raw codes.
+        """
+        if row < 0 or row >= self.num_lines:
+            return
+        if width is None:
+            width = len(text)
+        end = min(col + width, self.num_columns)
+        if end <= col:
+            return
+        base = row * self.num_columns
+        want = self.want
+        if isinstance(text, str):
+            c = col + self.charset.encode_into(text, want, base + col, end - col)
+        else:
+            n = min(len(text), end - col)
+            for i in range(n):
+                want[base + col + i] = text[i]
+            c = col + n
+        for c in range(c, end):
+            want[base + c] = 0x20
+
+    def put_num(self, col, row, value, width=0, pad=0x20):
+        """Draws a non-negative int in decimal without building a string.
+        With width, it is right-aligned in that many cells and filled with
+        pad (0x30 for leading zeros); without, it takes as many cells as it
+        has digits. Returns the number of cells drawn.
+        """
+        n = 1
+        v = value
+        while v >= 10:
+            v //= 10
+            n += 1
+        if width < n:
+            width = n
+        c = col + width - 1
+        v = value
+        for i in range(width):
+            if i < n:
+                self.put_byte(c - i, row, 0x30 + v % 10)
+                v //= 10
+            else:
+                self.put_byte(c - i, row, pad)
+        return width
+
+    def put_ring(self, col, row, data, offset, width):
+        """Draws width cells of data taken as a loop starting at offset,
+        e.g. a scrolling marquee with its gap built in.
+        """
+        n = len(data)
+        if n == 0:
+            self.put(col, row, b"", width)
+            return
+        i = offset % n
+        for c in range(col, col + width):
+            self.put_byte(c, row, data[i])
+            i += 1
+            if i == n:
+                i = 0
+
+    def put_byte(self, col, row, code):
+        """Draws a single raw character code at (col, row)."""
+        if 0 <= row < self.num_lines and 0 <= col < self.num_columns:
+            self.want[row * self.num_columns + col] = code
+
+    def is_dirty(self):
+        return self.stale or self.want != self.shown
+
+    def flush(self, limit=-1):
+        """Sends the changed cells to the LCD. Consecutive changed cells on
+        a row are written as one run with lcd.write_cells(), so the cursor
+        is moved once and the run goes out as one block, straight from the
+        framebuffer. Returns the number of cells written.
+
+        With limit >= 0 at most that many cells go out, and the next
+        limited flush carries on from where this one stopped, so a budget
+        (see lcd_bus.py) works through the whole screen instead of always
+        redrawing its top. A stale frame is still rewritten in one go.
+        """
+        lcd = self.lcd
+        cols = self.num_columns
+        want = self.want
+        shown = self.shown
+        stale = self.stale
+        size = len(want)
+        if stale:
+            limit = -1
+        i = self.next if limit >= 0 else 0
+        written = 0
+        scanned = 0
+        while scanned < size:
+            if i == size:
+                i = 0
+            if not stale and want[i] == shown[i]:
+                i += 1
+                scanned += 1
+                continue
+            if written == limit:
+                break
+            row = i // cols
+            row_end = (row + 1) * cols
+            start = i
+            while i < row_end and written != limit and (stale or want[i] != shown[i]):
+                shown[i] = want[i]
+                i += 1
+                written += 1
+            scanned += i - start
+            lcd.write_cells(start - row * cols, row, want, start, i)
+        self.next = i % size
+        self.stale = False
+        return written
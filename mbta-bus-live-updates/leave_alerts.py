@@ -0,0 +1,131 @@
+"""Next-bus / "leave now" alert rules.
+
+Each rule watches one route/stop/direction: it fires when the next
+departure you can still make (at least walk_min away) means leaving within
+threshold_min. One-shot rules are armed by hand and disarm after firing;
+repeat rules stay on and fire once per departure. During a rule's quiet
+hours the caller shows the event without the buzzer.
+
+New predictions come in as absolute UTC times and are turned into
+ticks_ms() deadlines once, so tick() (every 100 ms) only compares small
+ints: no parsing and no allocation, and only armed rules are looked at.
+"""
+
+import time
+from array import array
+
+SLOTS = 4        # departures kept per rule
+HOLD_MS = 60_000  # a fired departure stays quiet until this long after it leaves
+
+
+class AlertRule:
+
+    def __init__(self, route, stop, direction, threshold_min, walk_min=0,
+                 repeat=False, quiet_hours=None):
+        self.route = route
+        self.stop = stop
+        self.direction = direction
+        self.threshold_min = threshold_min
+        self.walk_min = walk_min
+        self.repeat = repeat
+        self.quiet_hours = quiet_hours        # (start_h, end_h) local, or None
+        self.walk_ms = walk_min * 60_000
+        # Fire while the time left to leave shows as <= threshold whole minutes
+        self.lead_ms = (threshold_min + 1) * 60_000
+        self.armed = repeat
+        self.due = array("i", [0] * SLOTS)   # departure deadlines, ticks_ms
+        self.n = 0
+        self.next = 0                        # first departure not yet gone
+        self.held = False
+        self.hold = 0                        # departures up to here already fired
+        self.left_ms = 0                     # time to departure when last fired
+
+    def quiet(self, hour):
+        if self.quiet_hours is None:
+            return False
+        start, end = self.quiet_hours
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end   # wraps midnight
+
+    def label(self):
+        """Status-line text for the last time this rule fired."""
+        mins = self.left_ms // 60_000
+        if self.walk_min:
+            return "Leave now! %s %dm" % (self.route, mins)
+        return "%s in %d min" % (self.route, mins)
+
+
+class AlertEngine:
+
+    def __init__(self, rules):
+        self.rules = [AlertRule(*r) for r in rules]
+        self.active = [r for r in self.rules if r.armed]
+
+    def set_times(self, route, stop, direction, times, now):
+        """New predictions (UTC seconds, ascending) for one route/stop/
+        direction; now is the current UTC time they are relative to.
+        """
+        t0 = time.ticks_ms()
+        for rule in self.rules:
+            if rule.route != route or rule.stop != stop or rule.direction != direction:
+                continue
+            n = 0
+            for t in times:
+                if n == SLOTS:
+                    break
+                if t >= now:
+                    rule.due[n] = time.ticks_add(t0, int((t - now) * 1000))
+                    n += 1
+            rule.n = n
+            rule.next = 0
+
+    def arm(self, on):
+        """Arms (or disarms) the one-shot rules; repeat rules stay as they are."""
+        for rule in self.rules:
+            if not rule.repeat:
+                rule.armed = on
+                rule.held = False
+        self.active = [r for r in self.rules if r.armed]
+
+    def armed(self):
+        """True if any one-shot rule is waiting to fire."""
+        for rule in self.active:
+            if not rule.repeat:
+                return True
+        return False
+
+    def tick(self):
+        """Checks the armed rules; returns a rule that fires now, or None.
+        Call again on the next tick for any others firing at the same time.
+        """
+        now = time.ticks_ms()
+        for rule in self.active:
+            if rule.held and time.ticks_diff(now, rule.hold) > 0:
+                rule.held = False    # before ticks_ms() wraps round to it
+            i = rule.next
+            left = 0
+            while i < rule.n:
+                left = time.ticks_diff(rule.due[i], now)
+                if left >= rule.walk_ms:
+                    break        # first departure we can still make
+                i += 1
+            rule.next = i
+            if i == rule.n or left - rule.walk_ms >= rule.lead_ms:
+                continue
+            if rule.held and time.ticks_diff(rule.due[i], rule.hold) <= 0:
+                continue         # this departure has already fired
+            rule.held = True
+            rule.hold = time.ticks_add(rule.due[i], HOLD_MS)
+            rule.left_ms = left
+            if not rule.repeat:
+                rule.armed = False
+                self.active.remove(rule)
+            return rule
+        return None
+
+    def summary(self):
+        return [{"route": r.route, "stop": r.stop, "direction": r.direction,
+                 "threshold_min": r.threshold_min, "walk_min": r.walk_min,
+                 "repeat": r.repeat, "quiet_hours": r.quiet_hours, "armed": r.armed}
+                for r in self.rules]
@@ -0,0 +1,38 @@
+"""Single-producer / single-consumer mailbox between the two cores.
+
+A small ring of slots. Only the producer moves `tail` and only the consumer
+moves `head`, and each side writes the slot before moving its index, so
+neither needs a lock: the consumer never sees a slot that isn't filled yet
+and the producer never reuses one that hasn't been read. Use one mailbox
+per direction.
+"""
+
+
+class Mailbox:
+
+    def __init__(self, size=4):
+        self.slots = [None] * size
+        self.size = size
+        self.head = 0     # next slot to read (consumer)
+        self.tail = 0     # next slot to write (producer)
+
+    def put(self, item):
+        """Producer side. Returns False (and drops item) if full."""
+        nxt = (self.tail + 1) % self.size
+        if nxt == self.head:
+            return False
+        self.slots[self.tail] = item
+        self.tail = nxt
+        return True
+
+    def get(self):
+        """Consumer side. Oldest item, or None if empty."""
+        if self.head == self.tail:
+            return None
+        item = self.slots[self.head]
+        self.slots[self.head] = None
+        self.head = (self.head + 1) % self.size
+        return item
+
+    def empty(self):
+        return self.head == self.tail
@@ -1,27 +1,59 @@
 # DOESNT ACCOUNT FOR DST; ASSUMES BOSTON IS UTC-5 ALWAYS
 
-import network, time, json
+import network, time, json, gc
 from machine import I2C, Pin
 from machine_i2c_lcd import I2cLcd   # IMPORTANT: Using your driver!
-import ntptime
+from lcd_frame import LcdFrame
+from lcd_charset import Charset
+from layout import Layout
+from compositor import Compositor, Widget
+import bigdigits
+from power import PowerManager
+from wifi_manager import WifiManager
+from clock_sync import ClockSync
+from telemetry import Telemetry, BootTimeline, FIELDS
+from status_server import StatusServer
+from alerts_feed import AlertsFeed
+from leave_alerts import AlertEngine
+from vehicle_eta import VehicleEta
+from mbta_client import MbtaClient, is_timeout
+from watchdog import Supervisor
+from pred_store import PredStore
+from mailbox import Mailbox
+from stream_json import find_strings
+
+try:
+    import stop_meta     # generated by build-stop-meta.py; optional
+except ImportError:
+    stop_meta = None
 
 try:
     import urequests as requests
 except:
     import requests
 
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
 
-def sync_time():
-    try:
-        ntptime.settime()   # sets board time to UTC
-    except Exception as e:
-        # If it fails, we just skip; RTC will look bogus
-        pass
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+try:
+    import deflate       # MicroPython >= 1.21
+except ImportError:
+    deflate = None
+
+boot = BootTimeline()   # start-up phases; boot.report() from the REPL
 
 
 # ------------ WIFI ------------
 WIFI_SSID = ""
 WIFI_PW   = ""
+WIFI_CONNECT_TIMEOUT_MS = 15_000   # give up on one attempt after this long
 
 # ------------ MBTA CONFIG ------------
 BUS_ROUTE_ID    = "116"
@@ -33,12 +65,125 @@ BLUE_STOP_ID    = "place-aport"
 BLUE_DIR_ID     = "0"     # inbound for blue line
 BUS_MINS_THRESHOLD = 3
 
+# Alert rules: (route, stop, direction, threshold_min, walk_min, repeat, quiet_hours)
+# A rule fires when the next bus you can still catch (leaving at least walk_min
+# from now) means setting off within threshold_min. One-shot rules are armed
+# with the button or POST /arm and disarm after firing; repeat rules are always
+# on and fire once per departure. quiet_hours=(start_h, end_h): no buzzer then.
+# Rules only see the two route/stop/directions above.
+ALERT_RULES = (
+    (BUS_ROUTE_ID, BUS_STOP_ID, BUS_DIR_ID, BUS_MINS_THRESHOLD, 0, False, None),
+    # (BLUE_ROUTE_ID, BLUE_STOP_ID, BLUE_DIR_ID, 2, 7, True, (9, 16)),   # 7 min walk
+)
+ALERT_SHOW_S = 30   # how long a fired alert stays on the status line
+
+# No 116 predictions (late evening)? Estimate from vehicle positions using
+# route_index.json, built on a PC with build-route-index.py
+VEHICLE_FALLBACK = True
+ROUTE_INDEX_FILE = "route_index.json"
+
+# Show the next arrivals as big 2-row digits (following arrival in small text)
+BIG_DIGITS = True
+
+# At most one LCD flush per frame interval, however many things change
+FRAME_MS = 100
+
+# Wait on the LCD's busy flag instead of fixed delays; falls back to the
+# delays by itself if the backpack's RW pin isn't wired
+LCD_BUSY_FLAG = True
+
+# LCD size: 16x2, 20x4 or 40x4 (LCD_LINES = 4, LCD_COLUMNS = 40). The screen
+# layout follows it (layout.py). A 40x4 has two controllers; LCD_E2 is the
+# backpack pin wired to the second one's E (0x02: RW, tied to GND at the LCD)
+LCD_LINES   = 4
+LCD_COLUMNS = 20
+LCD_E2      = 0x02
+
+# Character ROM of the LCD: "A00" (Japanese, most modules) or "A02" (European).
+# Text is mapped to it through a lookup table; characters in LCD_GLYPHS that
+# the ROM lacks are drawn from CGRAM slots 5-7 (see GLYPHS in lcd_charset.py)
+LCD_ROM = "A00"
+LCD_GLYPHS = ""     # e.g. "é"
+
+# Night mode: radio off + lightsleep, waking on this timer or the button
+NIGHT_WAKE_MS = 60_000
+NIGHT_PEEK_S  = 30      # a press at night shows predictions for this long
+
 API_KEY = ""
+# Requests per minute for the shared rate budget; 0 = the API's own limit
+# (20 without API_KEY, 1000 with). Corrected from x-ratelimit-* replies.
+API_RATE_PER_MIN = 0
+
+# Ask for gzip and inflate predictions as they stream in (needs `deflate`)
+GZIP = True
+
+# The last predictions are kept on flash so a reset shows a countdown at once
+PERSIST_EVERY_S = 300   # at most one flash write per this many seconds; 0 = off
+
+# Service alerts scroll across the status line; polled separately from predictions
+ALERTS_INTERVAL_S = 120
+TICKER_STEP_MS    = 300   # one character per step
+
+# Run Wi-Fi, fetch and parse on the second core so a slow TLS fetch never
+# freezes the display or the button (needs _thread)
+DUAL_CORE = False
+
+# Every MBTA request gives up after REQUEST_TIMEOUT_MS (connect, and each
+# read); a whole round of fetches after FETCH_BUDGET_MS, and the cached
+# countdown stays up ("Offline, as of ...")
+REQUEST_TIMEOUT_MS = 4000
+FETCH_BUDGET_MS    = 6000
+
+# Hardware watchdog: resets the board if the main loop stops making progress
+# for this long (RP2040: at most 8388 ms; keep it above FETCH_BUDGET_MS). 0 = off
+WATCHDOG_MS = 8000
+
+# ------------ TELEMETRY ------------
+TELEMETRY_ENABLED = True
+TELEMETRY_CYCLES  = 64     # ring buffer size (one record per update cycle)
+TELEMETRY_URL     = ""     # optional: POST a JSON summary here ...
+TELEMETRY_EVERY   = 60     # ... every this many cycles
+
+tel = Telemetry(TELEMETRY_CYCLES, (BUS_ROUTE_ID, BLUE_ROUTE_ID), TELEMETRY_ENABLED)
+
+def push_telemetry(summary):
+    # Best effort: one socket timeout per step. Blocks the core it runs on,
+    # so with DUAL_CORE core 1 posts it between fetches
+    try:
+        requests.post(TELEMETRY_URL, json=summary, timeout=REQUEST_TIMEOUT_MS / 1000).close()
+    except Exception:
+        pass
+
+supervisor = Supervisor(WATCHDOG_MS)   # armed just before the main loop
+if supervisor.watchdog_reset:
+    print("reset by watchdog")
+
+# ------------ STATUS ENDPOINT ------------
+STATUS_PORT = 80   # GET /status, GET /metrics, POST /arm, POST /refresh; 0 = off
+
+# ------------ WIFI CONNECT ------------
+# Association runs on the radio chip, so start it first and let it overlap
+# with LCD init, the CGRAM uploads and the rest of start-up
+wlan = network.WLAN(network.STA_IF)
+wifi = WifiManager(wlan, WIFI_SSID, WIFI_PW, WIFI_CONNECT_TIMEOUT_MS)
+wifi.start()
+boot.mark("wifi start")
 
 # ------------ LCD SETUP (I2C1 GP26/GP27) ------------
 i2c = I2C(1, sda=Pin(26), scl=Pin(27), freq=100_000)
 addr = (i2c.scan() or [0x27])[0]
-lcd = I2cLcd(i2c, addr, 4, 20)
+lcd = I2cLcd(i2c, addr, LCD_LINES, LCD_COLUMNS, busy_flag=LCD_BUSY_FLAG, e2_mask=LCD_E2)
+layout = Layout(LCD_LINES, LCD_COLUMNS, BIG_DIGITS)
+charset = Charset(LCD_ROM)
+lcd.charset = charset          # putstr() maps text the same way
+frame = LcdFrame(lcd, LCD_LINES, LCD_COLUMNS, charset)   # all screens draw here; flush() sends only changes
+frame.stale = False            # the driver just cleared the LCD: shown[] is right
+boot.mark("lcd init")
+
+# First screen before anything else; the message widget redraws the same text
+frame.put(0, 0, "Connecting WiFi", LCD_COLUMNS)
+frame.flush()
+boot.mark("first screen")
 
 # ------------ BUTTON + BUZZER PINS ------------
 BUTTON_PIN = 15  # button: one leg to GP15, other leg to GND, use PULL_UP
@@ -76,58 +221,79 @@ speaker_icon = bytearray([
 
 lcd.custom_char(0, speaker_icon)
 lcd.custom_char(1, bell_icon)
+bigdigits.load_glyphs(lcd)       # slots 2-4
+charset.load_glyphs(lcd, LCD_GLYPHS, 5)
+boot.mark("glyphs")
 
 # ------------ HELPERS ------------
-def mv(c, r):
-    lcd.move_to(c, r)
-
-def put(s):
-    lcd.putstr(s)
 
 TZ_OFFSET_SECONDS = -5 * 3600   # Boston ≈ UTC-5 (ignoring DST)
 
+# NTP with retry/backoff + periodic resync; falls back to the API's Date header
+timesync = ClockSync(resync_s=6 * 3600)
+
 def has_valid_time():
-    return time.localtime()[0] >= 2024
+    return timesync.valid()
 
 def local_hour():
-    now_utc = time.time()
-    now_local = now_utc + TZ_OFFSET_SECONDS
+    now_utc = timesync.now()
+    now_local = int(now_utc + TZ_OFFSET_SECONDS)   # now() is a float once drift is known
     return time.localtime(now_local)[3]
 
 def in_night_mode():
-    if not has_valid_time():
+    # Not on a clock guessed from flash: night mode stops the fetches
+    # (and with them the Date header) that would correct it
+    if not timesync.trusted():
         return False
     h = local_hour()
     return (h >= 23) or (h < 6)
 
-def minutes_until(iso_str):
-    try:
-        # Example: '2025-11-13T22:10:00-05:00'
-        date, clock = iso_str.split("T")
-        y, m, d = map(int, date.split("-"))
+def iso_utc(iso_str):
+    # Example: '2025-11-13T22:10:00-05:00'
+    date, clock = iso_str.split("T")
+    y, m, d = map(int, date.split("-"))
 
-        # Strip timezone offset part (-05:00 or +00:00)
-        clock = clock.split("-")[0].split("+")[0]
-        hh, mm, ss = map(int, clock.split(":"))
+    # Strip timezone offset part (-05:00 or +00:00)
+    clock = clock.split("-")[0].split("+")[0]
+    hh, mm, ss = map(int, clock.split(":"))
 
-        # Target is in LOCAL time
-        target_local = time.mktime((y, m, d, hh, mm, ss, 0, 0))
+    # Target is in LOCAL time
+    target_local = time.mktime((y, m, d, hh, mm, ss, 0, 0))
+    return target_local - TZ_OFFSET_SECONDS
 
-        now_tuple = time.localtime()
-        if now_tuple[0] < 2024:
-            return None  # RTC not valid yet → show "--"
+def minutes_until(iso_str):
+    try:
+        target_utc = iso_utc(iso_str)
 
-        now_utc = time.time()
-        now_local = now_utc + TZ_OFFSET_SECONDS
+        if not has_valid_time() or timesync.assumed():
+            return None  # RTC not valid yet (or only guessed from flash) → show "--"
 
-        return int((target_local - now_local) / 60)
+        return int((target_utc - timesync.now()) / 60)
 
     except:
         return None
 
+def iso_local(t_utc):
+    # Same format the API uses, so estimates flow through minutes_until()
+    lt = time.localtime(int(t_utc + TZ_OFFSET_SECONDS))
+    return "%04d-%02d-%02dT%02d:%02d:%02d-05:00" % lt[:6]
+
+def resp_header(headers, name):
+    for k in headers:
+        if k.lower() == name:
+            return headers[k]
+    return None
+
+# Every MBTA request (predictions, alerts, vehicles) shares one rate budget
+api = MbtaClient(API_KEY, API_RATE_PER_MIN or None, now=timesync.now,
+                 timeout_ms=REQUEST_TIMEOUT_MS)
+
 def fetch_predictions(route, stop, direction=None):
-    url = (
-        "https://api-v3.mbta.com/predictions"
+    # Departure times, or None if the rate budget deferred the request
+    # (keep showing the old ones; it goes on the next round)
+    global GZIP
+    path = (
+        "/predictions"
         f"?filter[route]={route}"
         f"&filter[stop]={stop}"
         "&sort=departure_time"
@@ -135,26 +301,55 @@ def fetch_predictions(route, stop, direction=None):
         "&fields[prediction]=departure_time"
     )
     if direction is not None:
-        url += f"&filter[direction_id]={direction}"
+        path += f"&filter[direction_id]={direction}"
 
-    headers = {"accept": "application/json"}
-    if API_KEY:
-        headers["x-api-key"] = API_KEY
+    gzip = GZIP and deflate is not None
+    headers = {"accept-encoding": "gzip"} if gzip else None
 
-    r = requests.get(url, headers=headers)
+    t0 = time.ticks_ms()
+    try:
+        r = api.get(path, headers)
+    except ValueError:
+        if not gzip:
+            raise
+        # urequests can't read a chunked reply, which a compressing server
+        # may send; plain JSON from here on
+        GZIP = False
+        return fetch_predictions(route, stop, direction)
+    if r is None:
+        return None
     try:
-        data = r.json()
+        timesync.from_headers(r.headers)   # no-op once NTP has worked
+        if gzip and resp_header(r.headers, "content-encoding") == "gzip":
+            # Inflate straight off the socket into the field scan; the
+            # payload is never held whole, compressed or not
+            t1 = time.ticks_ms()
+            times = find_strings(deflate.DeflateIO(r.raw, deflate.GZIP), "departure_time")
+            nbytes = int(resp_header(r.headers, "content-length") or 0)
+            tel.fetch(route, time.ticks_diff(t1, t0), nbytes, time.ticks_diff(time.ticks_ms(), t1))
+            return times
+        body = r.content
     finally:
         r.close()
+    t1 = time.ticks_ms()
 
+    data = json.loads(body)
     times = []
     for item in data.get("data", []):
         attr = item.get("attributes", {})
         t = attr.get("departure_time") or attr.get("arrival_time")
         if t:
             times.append(t)
+    tel.fetch(route, time.ticks_diff(t1, t0), len(body),
+              time.ticks_diff(time.ticks_ms(), t1))
+
+    return times  # up to 4, so cached data still has 2 upcoming later on
 
-    return times[:2]  # next 2
+def next_two(preds):
+    # Minutes to the next two departures that haven't left yet
+    mins = [m for m in (minutes_until(p) for p in preds) if m is None or m >= 0]
+    return (mins[0] if len(mins) >= 1 else None,
+            mins[1] if len(mins) >= 2 else None)
 
 # ------------ BUZZER HELPER ------------
 def beep(times=3, on_ms=200, off_ms=150):
@@ -164,129 +359,655 @@ def beep(times=3, on_ms=200, off_ms=150):
         buzzer.value(0)
         time.sleep_ms(off_ms)
 
-# ------------ STATUS LINE (ROW 4) ------------
-def update_status_line(alert_armed):
-    mv(0, 3)
-    if alert_armed:
-        put("Next bus alert ON")
+# ------------ WIDGETS ------------
+# Widgets draw from fixed byte labels and put_num() digits, so a steady-state
+# redraw allocates nothing (render_alloc in tel.report() should stay 0)
+NO_TIME = b"--"
+ARRIVING = b"Arriving"
+MIN_LABEL = b" min"
+BIG_MIN = b"min"
+BIG_EST = b"est"
+ALERT_ON = b"Next bus alert ON"
+UPDATED = b"Updated: 00:00:00"    # digits patched at 9, 12, 15
+OFFLINE = b"Offline, as of 00:00"  # digits patched at 15, 18
+
+def draw_mins(frame, col, row, m, estimated, width):
+    # "~12 min" / "Arriving" / "--" in width cells
+    end = col + width
+    frame.put(col, row, b"", width)
+    if estimated and m is not None:
+        # Estimate mark: 0x7E is "→" on the A00 ROM (it has no "~"), "~" on A02
+        frame.put_byte(col, row, 0x7E)
+        col += 1
+    if m is None:
+        frame.put(col, row, NO_TIME, end - col)
+    elif m <= 0:
+        frame.put(col, row, ARRIVING, end - col)
     else:
-        now_utc = time.time()
-        now_local = now_utc + TZ_OFFSET_SECONDS
-        lt = time.localtime(now_local)
-        put(f"Updated: {lt[3]:02d}:{lt[4]:02d}:{lt[5]:02d}  ")
+        col += frame.put_num(col, row, m)
+        frame.put(col, row, MIN_LABEL, end - col)
+
+def draw_clock(frame, col, row, secs, with_secs=True):
+    # hh:mm[:ss] digits of a time of day into a template already drawn
+    frame.put_num(col, row, secs // 3600, 2, 0x30)
+    frame.put_num(col + 3, row, secs // 60 % 60, 2, 0x30)
+    if with_secs:
+        frame.put_num(col + 6, row, secs % 60, 2, 0x30)
+
+def route_header(route, direction, icon):
+    # "116 <icon> Mave", one cell short of half the screen so the two halves
+    # don't run together (layout.header). Without stop_meta.py it's the
+    # route id and icon.
+    meta = stop_meta.ROUTES.get(route) if stop_meta else None
+    if meta is None:
+        return route + " " + chr(icon)
+    short, _, _, _, dests = meta
+    return (short + bytes((0x20, icon, 0x20)) + dests[int(direction)])[:layout.header]
+
+def route_color(route):
+    meta = stop_meta.ROUTES.get(route) if stop_meta else None
+    return None if meta is None else "#%06X" % meta[2]
+
+def stop_name(stop):
+    if stop_meta and stop in stop_meta.STOPS:
+        return stop_meta.STOPS[stop]
+    return "Stop " + stop
+
+class HeaderWidget(Widget):
+    # Top row: route names + icons (+ destination with stop_meta.py)
+    def __init__(self):
+        super().__init__()
+        self.bus = route_header(BUS_ROUTE_ID, BUS_DIR_ID, 0)      # speaker icon
+        self.blue = route_header(BLUE_ROUTE_ID, BLUE_DIR_ID, 1)   # bell icon
+
+    def draw(self, frame):
+        row = layout.header_row
+        frame.put(layout.halves[0], row, self.bus, layout.half)
+        frame.put(layout.halves[1], row, self.blue, layout.half)
+
+class ArrivalWidget(Widget):
+    # One half of the screen below the header: next / then arrival
+    def __init__(self, col):
+        super().__init__()
+        self.col = col
+        self.next_mins = None
+        self.then_mins = None
+        self.estimated = False
+
+    def set(self, next_mins, then_mins, estimated=False):
+        if (next_mins != self.next_mins or then_mins != self.then_mins
+                or estimated != self.estimated):
+            self.next_mins = next_mins
+            self.then_mins = then_mins
+            self.estimated = estimated
+            self.mark_dirty()
+
+    def draw(self, frame):
+        col = self.col
+        row = layout.next_row
+        if row is None:
+            return
+        if layout.big_digits:
+            # Big countdown in 7 cells, "min" (or "est") + following arrival beside it
+            bigdigits.draw_number(frame, col, row, self.next_mins)
+            frame.put(col + 7, row, BIG_EST if self.estimated else BIG_MIN, 3)
+            then = self.then_mins
+            if then is None:
+                frame.put(col + 7, row + 1, NO_TIME, 3)
+            else:
+                frame.put(col + 7, row + 1, b"", 3)   # "7" mustn't leave "7-" behind
+                frame.put_num(col + 7, row + 1, max(0, min(99, then)))
+        else:
+            draw_mins(frame, col, row, self.next_mins, self.estimated, layout.half)
+            if layout.then_row is not None:
+                draw_mins(frame, col, layout.then_row, self.then_mins, self.estimated, layout.half)
+
+class StatusWidget(Widget):
+    # Bottom row (none on 2-line panels): fired alert, alert state, service alert ticker or time of the last update
+    def __init__(self):
+        super().__init__()
+        self.alert_armed = False
+        self.event = None
+        self.event_at = 0
+        self.updated = None      # local seconds since midnight of the last update
+        self.offline = False
+        self.ticker = b""
+        self.offset = 0
+        self.last_step = time.ticks_ms()
+
+    def set_ticker(self, text):
+        text = charset.encode(text + "   ") if text else b""   # gap before it comes round again
+        if text != self.ticker:
+            self.ticker = text
+            self.offset = 0
+            self.mark_dirty()
+
+    def scroll(self):
+        # Expire a fired alert; advance the marquee one cell every TICKER_STEP_MS
+        if self.event and time.ticks_diff(time.ticks_ms(), self.event_at) >= ALERT_SHOW_S * 1000:
+            self.event = None
+            self.mark_dirty()
+        if not self.ticker or self.alert_armed or self.offline or self.event:
+            return
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self.last_step) >= TICKER_STEP_MS:
+            self.last_step = now
+            self.offset = (self.offset + 1) % len(self.ticker)
+            self.mark_dirty()
+
+    def set_alert(self, armed):
+        if armed != self.alert_armed:
+            self.alert_armed = armed
+            self.mark_dirty()
+
+    def show_event(self, text):
+        self.event = charset.encode(text)
+        self.event_at = time.ticks_ms()
+        self.mark_dirty()
+
+    def stamp(self, at=None):
+        now_local = (timesync.now() if at is None else at) + TZ_OFFSET_SECONDS
+        self.updated = int(now_local) % 86400
+        self.offline = False
+        self.mark_dirty()
+
+    def set_offline(self, offline):
+        if offline != self.offline:
+            self.offline = offline
+            self.mark_dirty()
+
+    def draw(self, frame):
+        row = layout.status_row
+        width = layout.num_columns
+        if row is None:
+            return
+        if self.event:
+            frame.put(0, row, self.event, width)
+        elif self.alert_armed:
+            frame.put(0, row, ALERT_ON, width)
+        elif self.updated is None:
+            frame.put(0, row, b"", width)
+        elif self.offline:
+            frame.put(0, row, OFFLINE, width)
+            draw_clock(frame, 15, row, self.updated, False)
+        elif self.ticker:
+            frame.put_ring(0, row, self.ticker, self.offset, width)
+        else:
+            frame.put(0, row, UPDATED, width)
+            draw_clock(frame, 9, row, self.updated)
+
+class MessageWidget(Widget):
+    # Full-screen text (WiFi connected, API error ...), shown as a modal
+    def __init__(self):
+        super().__init__()
+        self.lines = ()
+
+    def set(self, *lines):
+        self.lines = lines
+        self.mark_dirty()
+
+    def draw(self, frame):
+        for r, line in enumerate(self.lines):
+            frame.put(0, r, line, layout.num_columns)
+
+ui = Compositor(frame, FRAME_MS)
+header = ui.add(HeaderWidget())
+bus_cell = ui.add(ArrivalWidget(layout.halves[0]))
+blue_cell = ui.add(ArrivalWidget(layout.halves[1]))
+status = ui.add(StatusWidget())
+banner = MessageWidget()
 
 # ------------ DISPLAY SCREEN ------------
-def show(bus1, bus2, blue1, blue2, alert_armed):
-    lcd.clear()
-
-    # Row 1 header
-    mv(0, 0)
-    lcd.putstr("116 ")
-    lcd.putchar(chr(0))      # speaker icon
-
-    mv(10, 0)
-    lcd.putstr("Blue ")
-    lcd.putchar(chr(1))      # bell icon
-
-    # Row 2 (next)
-    mv(0, 1)
-    put("--" if bus1  is None else ("Arriving" if bus1  <= 0 else f"{bus1} min"))
-
-    mv(10, 1)
-    put("--" if blue1 is None else ("Arriving" if blue1 <= 0 else f"{blue1} min"))
-
-    # Row 3 (then)
-    mv(0, 2)
-    put("--" if bus2  is None else ("Arriving" if bus2  <= 0 else f"{bus2} min"))
+def show(bus1, bus2, blue1, blue2, fresh=True, bus_estimated=False):
+    bus_cell.set(bus1, bus2, bus_estimated)
+    blue_cell.set(blue1, blue2)
+    if fresh:
+        status.stamp()
+    else:
+        status.set_offline(True)   # keep counting down from cached times
+    ui.hide_modal()
+
+def show_message(*lines):
+    banner.set(*lines)
+    ui.show_modal(banner)
+
+def render(force=False):
+    # ui.tick() (or an immediate flush), timed for telemetry
+    t0 = time.ticks_ms()
+    n0 = lcd.transactions
+    a0 = gc.mem_alloc()
+    if ui.flush() if force else ui.tick():
+        tel.render(time.ticks_diff(time.ticks_ms(), t0), lcd.transactions - n0,
+                   gc.mem_alloc() - a0)
+
+# ------------ POWER ------------
+power = PowerManager(wlan, button)
+
+# ------------ STATUS ENDPOINT ------------
+boot_ms = boot.t0
+live = {"bus": [], "bus_estimated": False, "blue": [], "error": None, "fetched": None}
+remote = {"arm": False, "refresh": False}   # set by HTTP, handled by the loop
+
+def status_json():
+    out = {
+        "predictions": {
+            BUS_ROUTE_ID: {"stop": BUS_STOP_ID, "times": live["bus"], "mins": next_two(live["bus"]),
+                           "estimated": live["bus_estimated"], "color": route_color(BUS_ROUTE_ID)},
+            BLUE_ROUTE_ID: {"stop": BLUE_STOP_ID, "times": live["blue"], "mins": next_two(live["blue"]),
+                            "color": route_color(BLUE_ROUTE_ID)},
+        },
+        "fetch": {
+            "ok": live["error"] is None,
+            "error": live["error"],
+            "age_s": None if live["fetched"] is None else int(timesync.now() - live["fetched"]),
+        },
+        "alert_armed": engine.armed(),
+        "alert_rules": engine.summary(),
+        "uptime_s": time.ticks_diff(time.ticks_ms(), boot_ms) // 1000,
+        "heap": {"free": gc.mem_free(), "alloc": gc.mem_alloc()},
+        "watchdog": supervisor.summary(),
+    }
+    # With DUAL_CORE, the copy core 1 posted after its last round
+    out.update(net_status() if net["status"] is None else net["status"])
+    return out
+
+def net_status():
+    # The part of /status owned by the network side. With DUAL_CORE only
+    # core 1 may call this: rp2 has no GIL, and core 1 changes wlan, wifi,
+    # api and alerts while it fetches
+    return {
+        "wifi": {
+            "rssi": wlan.status("rssi") if wlan.isconnected() else None,
+            "reconnects": wifi.reconnects,
+            "last_recovery_ms": wifi.last_recovery_ms,
+        },
+        "clock": {"source": timesync.source, "drift_ppm": int(timesync.drift * 1e6)},
+        "alerts": [h for _, h in alerts.alerts.values()],
+        "api": api.summary(),
+    }
+
+def metrics_json():
+    out = tel.summary()
+    out["fields"] = FIELDS
+    out["recent"] = [list(r) for r in tel.records()][-10:]
+    out["boot_ms"] = dict(boot.marks)
+    return out
+
+def arm_alert():
+    remote["arm"] = True
+    return {"ok": True}
+
+def force_refresh():
+    remote["refresh"] = True
+    return {"ok": True}
+
+# ------------ ALERT RULES ------------
+engine = AlertEngine(ALERT_RULES)
+
+def update_alerts():
+    # New predictions: hand the engine absolute times once, so the 100 ms
+    # tick only compares deadlines
+    if not has_valid_time() or timesync.assumed():
+        return
+    now = timesync.now()
+    engine.set_times(BUS_ROUTE_ID, BUS_STOP_ID, BUS_DIR_ID, [iso_utc(p) for p in live["bus"]], now)
+    engine.set_times(BLUE_ROUTE_ID, BLUE_STOP_ID, BLUE_DIR_ID, [iso_utc(p) for p in live["blue"]], now)
+
+def check_alerts():
+    rule = engine.tick()
+    if rule is None:
+        return
+    print("alert:", rule.label())
+    status.show_event(rule.label())
+    status.set_alert(engine.armed())
+    render(force=True)
+    if not (timesync.trusted() and rule.quiet(local_hour())):
+        beep(times=5)
+
+def set_armed(on):
+    engine.arm(on)
+    status.set_alert(engine.armed())
+    if engine.armed():
+        # tiny confirmation beep when arming
+        render(force=True)
+        beep(1, on_ms=80, off_ms=0)
+
+# ------------ LAST-KNOWN PREDICTIONS ------------
+store = PredStore(PERSIST_EVERY_S)
+
+def save_predictions(bus_preds, blue_preds, bus_estimated):
+    if PERSIST_EVERY_S and store.due(live["fetched"]):
+        store.save(live["fetched"], [iso_utc(p) for p in bus_preds],
+                   [iso_utc(p) for p in blue_preds], bus_estimated)
+
+# ------------ SERVICE ALERTS ------------
+alerts = AlertsFeed(api, (BUS_ROUTE_ID, BLUE_ROUTE_ID), (BUS_STOP_ID, BLUE_STOP_ID),
+                    ALERTS_INTERVAL_S)
+
+def poll_alerts():
+    # A round of its own, so a slow alerts reply is cut off like a slow fetch
+    api.begin(FETCH_BUDGET_MS)
+    try:
+        return alerts.poll()
+    finally:
+        api.end()
 
-    mv(10, 2)
-    put("--" if blue2 is None else ("Arriving" if blue2 <= 0 else f"{blue2} min"))
+# ------------ VEHICLE ETA FALLBACK ------------
+bus_eta = VehicleEta(api, BUS_ROUTE_ID, BUS_DIR_ID, ROUTE_INDEX_FILE)
 
-    # Row 4: status line
-    update_status_line(alert_armed)
+def estimate_bus():
+    # ISO times from vehicle positions, [] if that doesn't work either
+    try:
+        return [iso_local(t) for t in bus_eta.estimate(timesync.now())]
+    except Exception:
+        return []
+
+server = StatusServer(STATUS_PORT)
+server.route("GET", "/status", status_json)
+server.route("GET", "/metrics", metrics_json)
+server.route("POST", "/arm", arm_alert)
+server.route("POST", "/refresh", force_refresh)
+
+# ------------ FETCH ------------
+def fetch_all():
+    # One round of network work: (bus, bus_estimated, blue, error). bus or
+    # blue is None if it couldn't be fetched or the rate budget deferred it
+    # (keep showing the old times).
+    # Runs on core 1 with DUAL_CORE, so it doesn't touch the display
+    if not wifi.isconnected():
+        return None, False, None, "No WiFi"
+    bus = blue = None
+    bus_estimated = False
+    api.begin(FETCH_BUDGET_MS)   # all requests below share it
+    try:
+        # BUS inbound (116)
+        bus = fetch_predictions(BUS_ROUTE_ID, BUS_STOP_ID, BUS_DIR_ID)
+        if bus == [] and VEHICLE_FALLBACK and has_valid_time():
+            bus = estimate_bus()
+            bus_estimated = bool(bus)
+        # BLUE inbound
+        blue = fetch_predictions(BLUE_ROUTE_ID, BLUE_STOP_ID, BLUE_DIR_ID)
+    except Exception as e:
+        wifi.link_lost()   # only counts if the link is really down
+        return bus, bus_estimated, blue, "Timeout" if is_timeout(e) else str(e)
+    finally:
+        api.end()
+    if bus is None and blue is None:
+        return None, False, None, None   # all deferred: nothing new
+    wifi.fetch_ok()
+    live["fetched"] = timesync.now()
+    if bus is None:
+        bus_estimated = live["bus_estimated"]
+    save_predictions(live["bus"] if bus is None else bus,
+                     live["blue"] if blue is None else blue, bus_estimated)
+    return bus, bus_estimated, blue, None
+
+def publish(result):
+    # Puts a fetch_all() result on screen and in front of the alert rules
+    bus, bus_estimated, blue, error = result
+    if bus is None and blue is None and error is None:
+        return   # deferred by the rate budget: the screen stays as it is
+    if bus is not None:
+        live["bus"] = bus
+        live["bus_estimated"] = bus_estimated
+    if blue is not None:
+        live["blue"] = blue
+    live["error"] = error
+    if has_valid_time() and not timesync.assumed():
+        # Times kept from flash (or from before an outage) that have left
+        live["bus"] = [p for p in live["bus"] if (minutes_until(p) or 0) >= 0]
+        live["blue"] = [p for p in live["blue"] if (minutes_until(p) or 0) >= 0]
+
+    bus1, bus2 = next_two(live["bus"])
+    blue1, blue2 = next_two(live["blue"])
+    if error is None or live["bus"] or live["blue"]:
+        show(bus1, bus2, blue1, blue2, fresh=error is None, bus_estimated=live["bus_estimated"])
+    else:
+        show_message("API Error", error[:18])
+    update_alerts()
+
+    if not boot.reached("first predictions") and (live["bus"] or live["blue"]):
+        render(force=True)
+        boot.mark("first predictions")
+
+# ------------ NETWORK CORE (DUAL_CORE) ------------
+to_ui = Mailbox()    # core 1 -> core 0: ("preds", bus, est, blue, error), ("ticker", text),
+                     # ("status", net_status()), ("paused",), ("beat",)
+to_net = Mailbox()   # core 0 -> core 1: "refresh", "pause", "resume", ("telemetry", summary)
+
+# Core 1 beats about once a second between fetches, so a longer silence than
+# a fetch round means it is stuck (a DNS lookup or a read with no timeout)
+NET_STALL_MS = FETCH_BUDGET_MS + 2000
+net = {"beat": 0,       # ticks_ms of the last message from core 1
+       "status": None}  # its last net_status() (None: single core, ask directly)
+
+def send_ui(msg):
+    while not to_ui.put(msg):
+        time.sleep_ms(20)   # UI drains every 100 ms
+
+def net_worker():
+    # Core 1: Wi-Fi, NTP, predictions and alerts, one fetch every ~5 s
+    paused = False
+    while True:
+        cmd = to_net.get()
+        if cmd == "pause":
+            paused = True
+            send_ui(("paused",))
+        elif cmd == "resume":
+            paused = False
+            wifi.connect()
+        elif type(cmd) is tuple and not paused:
+            to_ui.put(("beat",))   # the post may take a socket timeout or two
+            push_telemetry(cmd[1])
+        if paused:
+            time.sleep_ms(100)
+            continue
 
-# ------------ WIFI CONNECT ------------
-def connect_wifi():
-    wlan = network.WLAN(network.STA_IF)
-    wlan.active(True)
-    if not wlan.isconnected():
-        wlan.connect(WIFI_SSID, WIFI_PW)
-        while not wlan.isconnected():
-            time.sleep(0.2)
-    return wlan.ifconfig()[0]
+        send_ui(("preds",) + fetch_all())
+        wifi.learn()   # once after an association; the scan blocks ~1 s
+        to_ui.put(("status", net_status()))   # dropped if full: next round's will do
+
+        for i in range(50):  # 50 * 0.1s = ~5 seconds
+            if wifi.poll() or not to_net.empty():
+                break   # link is back / a command: act on it now
+            if timesync.poll(wifi.isconnected()) and not boot.reached("ntp"):
+                boot.mark("ntp")
+            if i == 25 and wifi.isconnected() and poll_alerts():
+                send_ui(("ticker", alerts.headline()))
+            if i % 10 == 0:
+                to_ui.put(("beat",))   # dropped if full: the UI has mail anyway
+            time.sleep_ms(100)
+
+def from_net():
+    # Next message from core 1 (or None); any message shows it is alive
+    msg = to_ui.get()
+    if msg is not None:
+        net["beat"] = time.ticks_ms()
+        if msg[0] == "status":
+            net["status"] = msg[1]
+    return msg
+
+def net_stalled():
+    return time.ticks_diff(time.ticks_ms(), net["beat"]) > NET_STALL_MS
+
+async def from_worker(kind, timeout_ms):
+    # Waits (without blocking the event loop) for the next message of this
+    # kind from core 1; tickers are applied on the way, anything else dropped
+    deadline = time.ticks_add(time.ticks_ms(), timeout_ms)
+    while time.ticks_diff(deadline, time.ticks_ms()) > 0:
+        msg = from_net()
+        if msg is None:
+            supervisor.pet()
+            await asyncio.sleep(0.05)
+        elif msg[0] == kind:
+            return msg
+        elif msg[0] == "ticker":
+            status.set_ticker(msg[1])
+    return None
 
 # ------------ MAIN LOOP ------------
-def main():
-    ip = connect_wifi()
-    lcd.clear()
-    mv(0,0); put("WiFi Connected")
-    mv(0,1); put(ip)
-    time.sleep(1)
-    sync_time()
+async def main():
+    # Countdown from the copy on flash while Wi-Fi comes up. After a power
+    # cut the RTC is lost too: the time of that fetch stands in for the
+    # clock, but can't say which departures have gone, so they show as
+    # "--" until NTP or a Date header sets it
+    saved = store.load(timesync.now() if has_valid_time() else None) if PERSIST_EVERY_S else None
+    if saved and (saved[2] or saved[3]):
+        fetched_at, bus_estimated, bus, blue = saved
+        timesync.assume(fetched_at)
+        live["bus"] = [iso_local(t) for t in bus]
+        live["bus_estimated"] = bus_estimated
+        live["blue"] = [iso_local(t) for t in blue]
+        live["fetched"] = fetched_at
+        status.stamp(fetched_at)
+        bus1, bus2 = next_two(live["bus"])
+        blue1, blue2 = next_two(live["blue"])
+        show(bus1, bus2, blue1, blue2, fresh=False, bus_estimated=bus_estimated)
+        update_alerts()
+        boot.mark("saved predictions")
+    else:
+        show_message("Connecting WiFi", "", stop_name(BUS_STOP_ID), stop_name(BLUE_STOP_ID))
+    render(force=True)
+    if STATUS_PORT:
+        await server.start()
+    # Finish the association started at import time without blocking the loop
+    while wifi.check() is None:
+        await asyncio.sleep(0.05)
+    if wifi.isconnected():
+        boot.mark("wifi up")
+        print("wifi: connected", wifi.ip())
+    elif not (live["bus"] or live["blue"]):
+        show_message("No WiFi", "Retrying...")   # poll() keeps trying
+        render(force=True)
+    # No NTP here: the first fetch sets the clock from the HTTP Date header
+    # and the poll loop syncs NTP straight after, so predictions come first
+    boot_reported = False
+
+    dual = DUAL_CORE and _thread is not None
+    if dual:
+        net["beat"] = time.ticks_ms()
+        net["status"] = net_status()   # core 1 isn't running yet
+        _thread.start_new_thread(net_worker, ())
 
     night_cleared = False
+    peek_until = 0
 
-    alert_armed = False
     prev_button = button.value()   # start from actual state (1 = released)
 
+    supervisor.start()
     while True:
         # --- NIGHT MODE HANDLING ---
-        if in_night_mode():
+        if in_night_mode() and time.time() >= peek_until:
             if not night_cleared:
-                lcd.clear()
-                lcd.hal_backlight_off()
+                show_message()
+                render(force=True)
+                lcd.backlight_off()
+                if dual:
+                    # Park core 1 before the radio goes and the chip sleeps
+                    to_net.put("pause")
+                    await from_worker("paused", 30_000)
+                power.radio_off()
                 night_cleared = True
-            time.sleep(60)
+            woken = power.sleep(NIGHT_WAKE_MS, supervisor.pet)
+            supervisor.idle()   # asleep on purpose, not a stall
+            if woken:
+                # Button: show predictions for a bit, then back to sleep
+                peek_until = time.time() + NIGHT_PEEK_S
+            prev_button = button.value()   # the waking press doesn't arm
             continue
-        else:
-            if night_cleared:
-                lcd.hal_backlight_on()
-                night_cleared = False
-
-        # --- 1) FETCH + DISPLAY PREDICTIONS ONCE ---
-        try:
-            # BUS inbound (116)
-            bus_preds = fetch_predictions(BUS_ROUTE_ID, BUS_STOP_ID, BUS_DIR_ID)
-            bus1 = minutes_until(bus_preds[0]) if len(bus_preds) >= 1 else None
-            bus2 = minutes_until(bus_preds[1]) if len(bus_preds) >= 2 else None
 
-            # BLUE inbound
-            blue_preds = fetch_predictions(BLUE_ROUTE_ID, BLUE_STOP_ID, BLUE_DIR_ID)
-            blue1 = minutes_until(blue_preds[0]) if len(blue_preds) >= 1 else None
-            blue2 = minutes_until(blue_preds[1]) if len(blue_preds) >= 2 else None
+        if night_cleared:
+            # Radio back up; backlight waits until there is fresh data
+            power.radio_on()
+            if dual:
+                net["beat"] = time.ticks_ms()   # parked overnight, not stuck
+                to_net.put("resume")
+            else:
+                wifi.start()
+                while wifi.check() is None:
+                    supervisor.pet()
+                    await asyncio.sleep(0.05)
 
-            show(bus1, bus2, blue1, blue2, alert_armed)
+        tel.begin()
 
-        except Exception as e:
-            lcd.clear()
-            mv(0,0); put("API Error")
-            mv(0,1); put(str(e)[:18])
-            bus1 = None  # avoid using stale value below
+        # --- 1) FETCH + DISPLAY PREDICTIONS ONCE ---
+        # (with DUAL_CORE core 1 fetches; results are shown as they arrive)
+        if not dual:
+            publish(fetch_all())
+            supervisor.pet()
+            wifi.learn()   # once after an association; the scan blocks ~1 s
+        elif night_cleared:
+            msg = await from_worker("preds", WIFI_CONNECT_TIMEOUT_MS + 10_000)
+            publish(msg[1:] if msg else (None, False, None, "No WiFi"))
+
+        if night_cleared:
+            render(force=True)
+            lcd.backlight_on()
+            night_cleared = False
 
         # --- 2) FOR ABOUT 5 SECONDS, POLL BUTTON FREQUENTLY ---
-        for _ in range(50):  # 50 * 0.1s = ~5 seconds
+        for i in range(50):  # 50 * 0.1s = ~5 seconds
+            if dual:
+                msg = from_net() or ("",)
+                if msg[0] == "preds":
+                    publish(msg[1:])
+                elif msg[0] == "ticker":
+                    status.set_ticker(msg[1])
+            else:
+                if wifi.poll():
+                    break   # link is back: fetch right away
+                if timesync.poll(wifi.isconnected()) and not boot.reached("ntp"):
+                    boot.mark("ntp")
+
+                # Service alerts: mid-window, so they never hold up predictions
+                if i == 25 and wifi.isconnected() and poll_alerts():
+                    status.set_ticker(alerts.headline())
+            status.scroll()
+
             curr_button = button.value()
 
             # FALLING EDGE (1 -> 0) = button pressed (because of PULL_UP + GND)
             if (prev_button == 1) and (curr_button == 0):
                 print("button")
-                alert_armed = not alert_armed
-                if alert_armed:
-                    # tiny confirmation beep when arming
-                    beep(1, on_ms=80, off_ms=0)
-                update_status_line(alert_armed)
+                set_armed(not engine.armed())
 
             prev_button = curr_button
 
-            # --- 3-MINUTE ALERT LOGIC (for 116 next bus) ---
-            if alert_armed and (bus1 is not None):
-                if 0 <= bus1 <= BUS_MINS_THRESHOLD:
-                    beep(times=5)
-                    alert_armed = False
-                    update_status_line(alert_armed)
-
-            time.sleep(0.1)
+            # --- REMOTE CONTROL (status endpoint) ---
+            if remote["refresh"]:
+                remote["refresh"] = False
+                if not dual:
+                    break
+                to_net.put("refresh")
+            if remote["arm"]:
+                remote["arm"] = False
+                if not engine.armed():
+                    set_armed(True)
+
+            # --- ALERT RULES (against absolute times, every tick) ---
+            check_alerts()
+
+            render()
+            tel.tick()
+            if dual and net_stalled():
+                # Core 1 is stuck: say the countdown is stale, and let the
+                # watchdog reset the board
+                status.set_offline(True)
+                supervisor.withhold()
+            else:
+                tel.stall(supervisor.feed())
+            await asyncio.sleep(0.1)   # the status server runs in here
+
+        tel.end()
+        if not boot_reported and boot.reached("first predictions"):
+            boot_reported = True
+            boot.report()
+        if TELEMETRY_URL and tel.count % TELEMETRY_EVERY == 0:
+            if dual:
+                to_net.put(("telemetry", tel.summary()))
+            else:
+                push_telemetry(tel.summary())
+                supervisor.pet()   # the next fetch round gets the whole timeout
 
 # run
-main()
-
+asyncio.run(main())
@@ -0,0 +1,217 @@
+"""One MBTA API client shared by every caller on the device.
+
+The API allows 20 requests a minute without a key (1000 with one) and
+answers 429 past that. Predictions, service alerts and the vehicle
+fallback all go through MbtaClient.get(), which spends from one token
+bucket:
+
+- FOREGROUND requests (what's on screen) may use the whole budget;
+  BACKGROUND ones leave `reserve` tokens for them, unless they have been
+  held back for a minute already, so they are never starved for good.
+- With no token to spend, get() returns None straight away: nothing is
+  sent, and the caller keeps what it has and tries again next round.
+- The bucket starts from configuration and follows the x-ratelimit-*
+  headers of every reply (limit, what's left of the window, when it
+  resets), so a key shared with other devices is honoured too.
+
+Every request also has a socket timeout (connect and each read), so a
+half-open connection can't hang the caller. begin(budget_ms) / end()
+bracket a round of requests with one deadline: each request's timeout is
+cut to what is left of it, and once too little is left get() raises
+OSError(ETIMEDOUT) without sending, like a socket timeout would. A socket
+timeout only bounds each read, though, and a server trickling a few bytes
+at a time never trips it; so within a round the reply body is read through
+_Deadline, which checks the clock between reads (and cuts the socket
+timeout to what is left) and raises OSError(ETIMEDOUT) at the deadline.
+"""
+
+import errno
+import io
+import time
+
+try:
+    import urequests as requests
+except:
+    import requests
+
+API_BASE = "https://api-v3.mbta.com"
+
+FOREGROUND = 0   # predictions, the vehicle ETA fallback
+BACKGROUND = 1   # service alerts, anything else
+
+BACKGROUND_MAX_WAIT_MS = 60_000
+WINDOW_MS = 60_000   # the API's rate limit window
+MIN_REQUEST_MS = 500  # less of the round's budget left than this: don't start one
+
+
+def is_timeout(e):
+    return isinstance(e, OSError) and bool(e.args) and e.args[0] == errno.ETIMEDOUT
+
+
+def _header(headers, name):
+    for k in headers:
+        if k.lower() == name:
+            return headers[k]
+    return None
+
+
+class _Deadline(io.IOBase):
+    # A reply body that gives up at the round's deadline. An IOBase, so
+    # deflate.DeflateIO can read it like the socket itself
+
+    def __init__(self, raw, deadline):
+        self.raw = raw
+        self.deadline = deadline
+
+    def _check(self):
+        left = time.ticks_diff(self.deadline, time.ticks_ms())
+        if left <= 0:
+            raise OSError(errno.ETIMEDOUT)
+        if hasattr(self.raw, "settimeout"):
+            self.raw.settimeout(left / 1000)
+
+    def readinto(self, buf):
+        self._check()
+        return self.raw.readinto(buf)
+
+    def read(self, n=-1):
+        if n is not None and n >= 0:
+            self._check()
+            return self.raw.read(n)
+        chunks = []   # to EOF, a chunk at a time so the clock is checked
+        while True:
+            data = self.read(512)
+            if not data:
+                return b"".join(chunks)
+            chunks.append(data)
+
+    def close(self):
+        self.raw.close()
+
+
+class MbtaClient:
+
+    def __init__(self, api_key="", per_min=None, reserve=2, now=time.time, timeout_ms=5000):
+        self.api_key = api_key
+        self.reserve = reserve
+        self.timeout_ms = timeout_ms   # per request: connect, and each read
+        self.deadline = None           # ticks_ms the current round must end by
+        self.now = now               # UTC seconds, for x-ratelimit-reset
+        self.set_limit(per_min or (1000 if api_key else 20))
+        self.tokens = self.capacity
+        self.last = time.ticks_ms()
+        self.remaining = None        # left in the server's window, if known
+        self.reset_at = 0            # ticks_ms when that window ends
+        self.bg_waiting = None       # ticks_ms since background has been held back
+        self.requests = 0
+        self.deferred = 0
+        self.throttled = 0           # 429s (shouldn't happen unless the key is shared)
+        self.timeouts = 0            # requests that timed out before the reply headers
+        self.over_budget = 0         # requests not started: the round's budget was spent
+
+    def set_limit(self, per_min):
+        self.per_min = per_min
+        self.rate = per_min / WINDOW_MS          # tokens per ms
+        self.capacity = max(2, per_min // 4)     # bursts of up to 15 s worth
+
+    def _available(self):
+        now = time.ticks_ms()
+        self.tokens = min(self.capacity, self.tokens + time.ticks_diff(now, self.last) * self.rate)
+        self.last = now
+        if self.remaining is not None and time.ticks_diff(now, self.reset_at) >= 0:
+            self.remaining = None                # new window
+        if self.remaining is None:
+            return self.tokens
+        return min(self.tokens, self.remaining)
+
+    def ready(self, priority=FOREGROUND):
+        """True if a request of this priority may go now."""
+        avail = self._available()
+        if priority == FOREGROUND:
+            return avail >= 1
+        if avail >= 1 + self.reserve:
+            self.bg_waiting = None
+            return True
+        if self.bg_waiting is None:
+            self.bg_waiting = time.ticks_ms()
+        return avail >= 1 and time.ticks_diff(time.ticks_ms(), self.bg_waiting) >= BACKGROUND_MAX_WAIT_MS
+
+    def begin(self, budget_ms):
+        """Starts a round of requests that must all be done within budget_ms."""
+        self.deadline = time.ticks_add(time.ticks_ms(), budget_ms)
+
+    def end(self):
+        self.deadline = None
+
+    def _timeout_ms(self):
+        if self.deadline is None:
+            return self.timeout_ms
+        left = time.ticks_diff(self.deadline, time.ticks_ms())
+        return min(self.timeout_ms, left) if left >= MIN_REQUEST_MS else 0
+
+    def get(self, path, headers=None, priority=FOREGROUND):
+        """GET API_BASE + path. Returns the response, or None if the rate
+        budget doesn't allow it yet (or the server said 429); nothing else
+        changes and the caller simply tries again later. Network errors
+        raise as from requests.get(), timeouts (and a spent round budget)
+        as OSError(ETIMEDOUT).
+        """
+        timeout_ms = self._timeout_ms()
+        if not timeout_ms:
+            self.over_budget += 1
+            raise OSError(errno.ETIMEDOUT)
+        if not self.ready(priority):
+            self.deferred += 1
+            return None
+        self.tokens -= 1
+        if self.remaining is not None:
+            self.remaining -= 1
+        if priority != FOREGROUND:
+            self.bg_waiting = None
+        self.requests += 1
+        h = {"accept": "application/json"}
+        if self.api_key:
+            h["x-api-key"] = self.api_key
+        if headers:
+            h.update(headers)
+        try:
+            r = requests.get(API_BASE + path, headers=h, timeout=timeout_ms / 1000)
+        except OSError as e:
+            if is_timeout(e):
+                self.timeouts += 1
+            raise
+        self._learn(r)
+        if r.status_code == 429:
+            self.throttled += 1
+            r.close()
+            return None
+        if self.deadline is not None:
+            r.raw = _Deadline(r.raw, self.deadline)
+        return r
+
+    def _learn(self, r):
+        # Follow the server's own count of this window
+        try:
+            limit = _header(r.headers, "x-ratelimit-limit")
+            remaining = _header(r.headers, "x-ratelimit-remaining")
+            reset = _header(r.headers, "x-ratelimit-reset")
+            if limit is not None and int(limit) != self.per_min:
+                self.set_limit(int(limit))
+                self.tokens = min(self.tokens, self.capacity)
+            if r.status_code == 429:
+                remaining = 0
+            if remaining is None:
+                return
+            wait_ms = WINDOW_MS
+            if reset is not None:
+                wait_ms = int((int(reset) - self.now()) * 1000)
+                wait_ms = max(0, min(WINDOW_MS, wait_ms))
+        except ValueError:
+            return
+        self.remaining = int(remaining)
+        self.reset_at = time.ticks_add(time.ticks_ms(), wait_ms)
+
+    def summary(self):
+        return {"per_min": self.per_min, "requests": self.requests, "deferred": self.deferred,
+                "throttled": self.throttled, "remaining": self.remaining,
+                "timeouts": self.timeouts, "over_budget": self.over_budget}
@@ -0,0 +1,53 @@
+"""Low-power helpers for night mode.
+
+During the quiet window the Wi-Fi radio is switched off and the MCU spends
+its time in machine.lightsleep() instead of time.sleep(), waking up on a
+timer or when the button is pressed.
+"""
+
+import machine
+from machine import Pin
+
+
+class PowerManager:
+
+    def __init__(self, wlan, wake_pin):
+        self.wlan = wlan
+        self.wake_pin = wake_pin
+        self.woken = False
+        self.sleeping = False
+        # Falling edge on the (pulled-up) button wakes us from lightsleep
+        wake_pin.irq(trigger=Pin.IRQ_FALLING, handler=self._on_wake)
+
+    def _on_wake(self, pin):
+        if self.sleeping:
+            self.woken = True
+
+    def radio_off(self):
+        """Drops the association and powers the WLAN chip down."""
+        try:
+            self.wlan.disconnect()
+        except OSError:
+            pass
+        self.wlan.active(False)
+
+    def radio_on(self):
+        self.wlan.active(True)
+
+    def sleep(self, ms, feed=None, chunk_ms=4000):
+        """Light-sleeps for up to ms milliseconds. Returns True if the button
+        woke us up early. With a watchdog running, pass its feed: the sleep
+        is then split into chunk_ms pieces with a feed after each.
+        """
+        self.woken = False
+        self.sleeping = True
+        try:
+            while ms > 0 and not self.woken:
+                step = ms if feed is None else min(ms, chunk_ms)
+                machine.lightsleep(step)
+                ms -= step
+                if feed is not None:
+                    feed()
+        finally:
+            self.sleeping = False
+        return self.woken
@@ -0,0 +1,111 @@
+"""Last-known predictions on flash.
+
+After a brownout or watchdog reset the screen would stay blank until Wi-Fi
+and two fetches complete. Instead the last prediction set is kept in a
+small fixed-size record (absolute UTC times + when they were fetched) and
+shown, flagged as stale, as soon as the LCD is up.
+
+Flash wear is kept down two ways: a record is written at most every
+min_interval_s (and only if the times changed), and writes alternate
+between two files. Each record carries a sequence number and checksum, so
+a write torn by a power cut just leaves the other copy to load.
+"""
+
+import struct
+
+FILES = ("preds_a.bin", "preds_b.bin")
+MAGIC = 0x5052            # "PR"
+SLOTS = 4                 # times kept per route
+
+# magic, seq, fetched_at, flags, 4 bus times, 4 blue times, checksum
+_FMT = "<HIIB4I4IH"
+SIZE = struct.calcsize(_FMT)
+_TIMES = 11               # offset of the first time (after the flags byte)
+
+FLAG_ESTIMATED = 0x01     # bus times came from the vehicle-position fallback
+
+
+def _checksum(buf):
+    s = 0
+    for i in range(SIZE - 2):
+        s = (s + buf[i]) & 0xFFFF
+    return s
+
+
+class PredStore:
+
+    def __init__(self, min_interval_s=300, files=FILES):
+        self.min_interval_s = min_interval_s
+        self.files = files
+        self.buf = bytearray(SIZE)       # the newest record on flash
+        self.scratch = bytearray(SIZE)   # records being read or written
+        self.seq = 0
+        self.next_file = 0
+        self.saved_at = None      # fetched_at of the newest record on flash
+        self.writes = 0
+
+    def _read(self, name):
+        try:
+            with open(name, "rb") as f:
+                n = f.readinto(self.scratch)
+        except OSError:
+            return None
+        if n != SIZE:
+            return None
+        rec = struct.unpack(_FMT, self.scratch)
+        if rec[0] != MAGIC or rec[-1] != _checksum(self.scratch):
+            return None
+        return rec
+
+    def load(self, now=None):
+        """Newest good record as (fetched_at, estimated, bus, blue), with
+        times before now (default: fetched_at) dropped, or None. Also picks
+        up the sequence number so the next save() overwrites the older copy.
+        """
+        best = None
+        for i, name in enumerate(self.files):
+            rec = self._read(name)
+            if rec is not None and (best is None or rec[1] > best[1]):
+                best = rec
+                self.buf[:] = self.scratch   # what save() compares against
+                self.next_file = 1 - i
+        if best is None:
+            return None
+        _, self.seq, fetched_at, flags = best[:4]
+        self.saved_at = fetched_at
+        if now is None:
+            now = fetched_at
+        bus = [t for t in best[4:4 + SLOTS] if t and t >= now]
+        blue = [t for t in best[4 + SLOTS:4 + 2 * SLOTS] if t and t >= now]
+        return fetched_at, bool(flags & FLAG_ESTIMATED), bus, blue
+
+    def due(self, now):
+        return self.saved_at is None or now - self.saved_at >= self.min_interval_s
+
+    def save(self, fetched_at, bus, blue, estimated=False):
+        """Writes a record (UTC times) if due and the times changed. Returns
+        True if something was written.
+        """
+        if not self.due(fetched_at):
+            return False
+        buf = self.scratch
+        struct.pack_into("<HIIB", buf, 0, MAGIC, self.seq + 1, int(fetched_at),
+                         FLAG_ESTIMATED if estimated else 0)
+        for i in range(2 * SLOTS):
+            times = bus if i < SLOTS else blue
+            k = i % SLOTS
+            struct.pack_into("<I", buf, _TIMES + 4 * i, int(times[k]) if k < len(times) else 0)
+        if self.saved_at is not None and buf[_TIMES - 1:SIZE - 2] == self.buf[_TIMES - 1:SIZE - 2]:
+            return False
+        struct.pack_into("<H", buf, SIZE - 2, _checksum(buf))
+        try:
+            with open(self.files[self.next_file], "wb") as f:
+                f.write(buf)
+        except OSError:
+            return False
+        self.buf[:] = buf
+        self.seq += 1
+        self.next_file = 1 - self.next_file
+        self.saved_at = int(fetched_at)
+        self.writes += 1
+        return True
@@ -0,0 +1,79 @@
+"""Tiny HTTP status/metrics endpoint on uasyncio.
+
+The server is a uasyncio stream server, so it only runs while the main loop
+is awaiting (its 100 ms poll sleeps). When nobody is connected it costs
+nothing: the scheduler just waits on the listening socket.
+
+Routes are registered as (method, path) -> handler(); a handler returns
+something json.dumps() can encode.
+"""
+
+import json
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+MAX_HEADER_LINES = 32
+
+_REASONS = {200: "OK", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class StatusServer:
+
+    def __init__(self, port=80):
+        self.port = port
+        self.routes = {}
+        self.server = None
+        self.requests = 0
+
+    def route(self, method, path, handler):
+        self.routes[(method, path)] = handler
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "0.0.0.0", self.port)
+
+    def stop(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            line = await reader.readline()
+            parts = line.decode().split()
+            # Skip the headers; none of the routes need them
+            for _ in range(MAX_HEADER_LINES):
+                h = await reader.readline()
+                if not h or h == b"\r\n":
+                    break
+            if len(parts) < 2:
+                return
+            method, path = parts[0], parts[1].split("?")[0]
+            self.requests += 1
+            handler = self.routes.get((method, path))
+            if handler is None:
+                known = any(p == path for (_, p) in self.routes)
+                await self._send(writer, 405 if known else 404, {"error": path})
+                return
+            try:
+                body = handler()
+                status = 200
+            except Exception as e:
+                body = {"error": str(e)}
+                status = 500
+            await self._send(writer, status, body)
+        except OSError:
+            pass
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    async def _send(self, writer, status, obj):
+        body = json.dumps(obj).encode()
+        writer.write(("HTTP/1.0 %d %s\r\nContent-Type: application/json\r\n"
+                      "Content-Length: %d\r\nConnection: close\r\n\r\n"
+                      % (status, _REASONS.get(status, ""), len(body))).encode())
+        writer.write(body)
+        await writer.drain()
@@ -0,0 +1,43 @@
+"""Pull string fields out of a JSON stream without loading the document.
+
+Used for gzip responses: the body is inflated a chunk at a time and only
+the fields we need are kept, so neither the compressed nor the inflated
+payload is ever held in RAM as a whole.
+"""
+
+
+def find_strings(stream, key, limit=4, chunk=256):
+    """String values of "key": "..." in document order, at most limit of
+    them. Non-string values (null) are skipped. Stops reading as soon as
+    limit values were found.
+    """
+    pat = b'"' + key.encode() + b'":'
+    keep = len(pat) + 40          # enough to finish a value cut by a chunk
+    buf = b""
+    out = []
+    while len(out) < limit:
+        data = stream.read(chunk)
+        if not data:
+            break
+        buf += data
+        while len(out) < limit:
+            i = buf.find(pat)
+            if i < 0:
+                buf = buf[-keep:]
+                break
+            j = i + len(pat)
+            while j < len(buf) and buf[j] == 0x20:
+                j += 1
+            if j >= len(buf):
+                buf = buf[i:]     # value starts in the next chunk
+                break
+            if buf[j] != 0x22:    # null / number: not ours
+                buf = buf[j:]
+                continue
+            k = buf.find(b'"', j + 1)
+            if k < 0:
+                buf = buf[i:]
+                break
+            out.append(buf[j + 1:k].decode())
+            buf = buf[k + 1:]
+    return out
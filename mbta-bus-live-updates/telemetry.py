@@ -0,0 +1,181 @@
+"""Per-cycle performance telemetry.
+
+Each update cycle fills one record in a fixed-size ring buffer that is
+allocated once at start-up, so recording costs a few integer stores and no
+heap churn. With enabled=False every call returns straight away.
+
+From the serial REPL (after Ctrl-C):
+
+    >>> tel.dump()        # CSV, oldest record first
+    >>> tel.report()      # p50 / p95 / max per field
+    >>> boot.report()     # start-up timeline
+"""
+
+import gc
+import time
+from array import array
+
+FIELDS = (
+    "t",             # ticks_ms at the start of the cycle
+    "fetch0_ms",     # fetch latency, one column per route
+    "fetch1_ms",
+    "bytes",         # HTTP body bytes received
+    "parse_ms",      # JSON decode + field extraction
+    "render_ms",     # widget draw + LCD flush
+    "i2c",           # I2C transactions
+    "render_alloc",  # heap bytes allocated while rendering (0 in steady state)
+    "free_before",   # gc.mem_free() at cycle start
+    "free_after",    # gc.mem_free() at cycle end
+    "jitter_ms",     # worst lateness of the 100 ms poll loop
+    "stall_ms",      # longest the poll loop didn't run, fetch included
+)
+NFIELDS = len(FIELDS)
+MAX_ROUTES = 2
+
+(_T, _FETCH0, _FETCH1, _BYTES, _PARSE, _RENDER, _I2C, _ALLOC, _FREE0, _FREE1, _JITTER,
+ _STALL) = range(NFIELDS)
+
+
+class Telemetry:
+
+    def __init__(self, capacity=64, routes=(), enabled=True):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.routes = tuple(routes[:MAX_ROUTES])
+        self.buf = array("l", [0] * (capacity * NFIELDS))
+        self.cur = array("l", [0] * NFIELDS)   # record being filled
+        self.count = 0        # records ever written
+        self.last_tick = None
+        self.tick_ms = 100
+
+    # ------------ RECORDING ------------
+    def begin(self):
+        if not self.enabled:
+            return
+        cur = self.cur
+        for i in range(NFIELDS):
+            cur[i] = 0
+        cur[_T] = time.ticks_ms()
+        cur[_FREE0] = gc.mem_free()
+        self.last_tick = None   # the fetch itself isn't loop jitter
+
+    def fetch(self, route, ms, nbytes, parse_ms):
+        if not self.enabled:
+            return
+        cur = self.cur
+        if route == self.routes[0]:
+            cur[_FETCH0] += ms
+        elif len(self.routes) > 1 and route == self.routes[1]:
+            cur[_FETCH1] += ms
+        cur[_BYTES] += nbytes
+        cur[_PARSE] += parse_ms
+
+    def render(self, ms, i2c=0, alloc=0):
+        if not self.enabled:
+            return
+        self.cur[_RENDER] += ms
+        self.cur[_I2C] += i2c
+        if alloc > 0:     # negative: a collection ran in between
+            self.cur[_ALLOC] += alloc
+
+    def tick(self):
+        """Call once per poll-loop iteration to track loop jitter."""
+        if not self.enabled:
+            return
+        now = time.ticks_ms()
+        if self.last_tick is not None:
+            late = time.ticks_diff(now, self.last_tick) - self.tick_ms
+            if late > self.cur[_JITTER]:
+                self.cur[_JITTER] = late
+        self.last_tick = now
+
+    def stall(self, ms):
+        """Time since the poll loop last made progress (watchdog.Supervisor.feed())."""
+        if not self.enabled:
+            return
+        if ms > self.cur[_STALL]:
+            self.cur[_STALL] = ms
+
+    def end(self):
+        if not self.enabled:
+            return
+        cur = self.cur
+        cur[_FREE1] = gc.mem_free()
+        base = (self.count % self.capacity) * NFIELDS
+        buf = self.buf
+        for i in range(NFIELDS):
+            buf[base + i] = cur[i]
+        self.count += 1
+
+    # ------------ READING ------------
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def records(self):
+        """Yields records (as array slices) oldest first."""
+        n = len(self)
+        first = self.count - n
+        for k in range(first, self.count):
+            base = (k % self.capacity) * NFIELDS
+            yield self.buf[base:base + NFIELDS]
+
+    def column(self, name):
+        i = FIELDS.index(name)
+        return [r[i] for r in self.records()]
+
+    def stats(self, name):
+        """(p50, p95, max) of a field over the buffer, or None if empty."""
+        vals = sorted(self.column(name))
+        if not vals:
+            return None
+        n = len(vals)
+        return (vals[n // 2], vals[min(n - 1, (n * 95) // 100)], vals[-1])
+
+    def summary(self):
+        """Dict of per-field stats, e.g. for JSON export."""
+        names = list(FIELDS[1:])
+        for i, route in enumerate(self.routes):
+            names[i] = "fetch_" + route + "_ms"
+        out = {"cycles": self.count, "kept": len(self), "enabled": self.enabled}
+        for label, name in zip(names, FIELDS[1:]):
+            s = self.stats(name)
+            if s is not None:
+                out[label] = {"p50": s[0], "p95": s[1], "max": s[2]}
+        return out
+
+    def dump(self):
+        print(",".join(FIELDS))
+        for r in self.records():
+            print(",".join(str(v) for v in r))
+
+    def report(self):
+        for name in FIELDS[1:]:
+            s = self.stats(name)
+            if s is not None:
+                print("%-12s p50 %7d  p95 %7d  max %7d" % (name, s[0], s[1], s[2]))
+
+
+class BootTimeline:
+    """Start-up phases as (name, ms since boot) marks, in the order reached.
+    Phases that overlap (Wi-Fi associating while the LCD initialises) just
+    show up as marks close together.
+    """
+
+    def __init__(self):
+        self.t0 = time.ticks_ms()
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, time.ticks_diff(time.ticks_ms(), self.t0)))
+
+    def reached(self, name):
+        for n, _ in self.marks:
+            if n == name:
+                return True
+        return False
+
+    def report(self):
+        prev = 0
+        for name, ms in self.marks:
+            print("%-18s %6d ms  (+%d)" % (name, ms, ms - prev))
+            prev = ms
@@ -0,0 +1,67 @@
+"""ETA fallback from live vehicle positions.
+
+When /predictions has nothing for a route, /vehicles still says where the
+buses are. Together with route_index.json (built on a PC by
+build-route-index.py) that gives a rough arrival time at our stop.
+
+The index is only read from flash the first time the fallback is needed,
+so it costs nothing at start-up or while predictions are flowing.
+"""
+
+import json
+
+
+class VehicleEta:
+
+    def __init__(self, client, route, direction, index_file="route_index.json"):
+        self.client = client     # shared MbtaClient
+        self.route = route
+        self.direction = direction
+        self.index_file = index_file
+        self.index = None         # stop id -> [secs to our stop, secs of segment into it]
+        self.missing = False      # no index on flash; don't keep trying
+
+    def _load(self):
+        if self.index is None and not self.missing:
+            try:
+                with open(self.index_file) as f:
+                    self.index = json.load(f)["stops"]
+            except (OSError, ValueError, KeyError):
+                self.missing = True
+        return self.index
+
+    def estimate(self, now_utc):
+        """UTC arrival times (soonest first) of the vehicles still heading
+        for our stop, or [] if there is no index or no usable vehicle.
+        """
+        index = self._load()
+        if not index:
+            return []
+        r = self.client.get(
+            "/vehicles"
+            f"?filter[route]={self.route}"
+            f"&filter[direction_id]={self.direction}"
+            "&fields[vehicle]=current_status"
+        )
+        if r is None:
+            return []             # over the rate budget; next round
+        try:
+            data = json.loads(r.content)
+        finally:
+            r.close()
+
+        etas = []
+        for v in data.get("data", []):
+            try:
+                stop = v["relationships"]["stop"]["data"]["id"]
+            except (KeyError, TypeError):
+                continue
+            entry = index.get(stop)
+            if entry is None:
+                continue          # already past our stop, or off-pattern
+            secs, segment = entry
+            if v.get("attributes", {}).get("current_status") == "IN_TRANSIT_TO":
+                secs += segment // 2   # somewhere along the way to that stop
+            etas.append(now_utc + secs)
+        etas.sort()
+        return etas
@@ -0,0 +1,76 @@
+"""Hardware watchdog fed by the main loop's progress.
+
+The main loop calls feed() once per 100 ms tick. Waits that have their own
+deadline (waiting on Wi-Fi or core 1) call pet() instead, which keeps the
+watchdog quiet but still counts the wait as a stall; night-mode light
+sleep calls pet() between chunks and idle() when it wakes, as nothing is
+on show then. Anything that blocks the loop for longer than the timeout -
+a socket with no timeout, a stuck driver - stops the feeding and the
+RP2040 resets. feed() measures the gap since the previous call, so the
+worst UI stall is known even when it stays under the timeout.
+
+With DUAL_CORE the loop on core 0 keeps ticking while core 1 fetches, so a
+hang there wouldn't stop the feeding: the loop calls withhold() instead of
+feed() once core 1's heartbeat is older than a fetch round.
+
+On the RP2040 the timeout is at most 8388 ms, and once started the
+watchdog can't be stopped, so long light sleeps are split up and fed
+between chunks (PowerManager.sleep()).
+"""
+
+import time
+
+try:
+    import machine
+except ImportError:
+    machine = None
+
+
+class Supervisor:
+
+    def __init__(self, timeout_ms):
+        self.timeout_ms = timeout_ms     # 0 = no hardware watchdog, just the stall stats
+        self.wdt = None
+        self.last = time.ticks_ms()
+        self.worst_ms = 0
+        self.watchdog_reset = (machine is not None and hasattr(machine, "WDT_RESET")
+                               and machine.reset_cause() == machine.WDT_RESET)
+
+    def start(self):
+        """Arms the watchdog. Call just before the main loop."""
+        if self.timeout_ms and self.wdt is None and machine is not None:
+            self.wdt = machine.WDT(timeout=self.timeout_ms)
+        self.last = time.ticks_ms()
+
+    def feed(self):
+        """The loop made progress. Returns ms since the previous call."""
+        now = time.ticks_ms()
+        gap = time.ticks_diff(now, self.last)
+        self.last = now
+        if gap > self.worst_ms:
+            self.worst_ms = gap
+        if self.wdt is not None:
+            self.wdt.feed()
+        return gap
+
+    def pet(self):
+        """Feeds the watchdog during a bounded wait; the wait still counts
+        towards the gap the next feed() measures.
+        """
+        if self.wdt is not None:
+            self.wdt.feed()
+
+    def withhold(self):
+        """The loop is fine but what it shows isn't (core 1 is stuck):
+        restarts the gap without feeding, so the watchdog runs out.
+        """
+        self.last = time.ticks_ms()
+
+    def idle(self):
+        """Feeds and restarts the gap, for time deliberately spent idle."""
+        self.last = time.ticks_ms()
+        self.pet()
+
+    def summary(self):
+        return {"timeout_ms": self.timeout_ms, "armed": self.wdt is not None,
+                "worst_stall_ms": self.worst_ms, "reset_by_watchdog": self.watchdog_reset}
@@ -0,0 +1,206 @@
+"""Wi-Fi connection manager.
+
+connect() associates with a deadline instead of spinning forever. After a
+good connection the AP's BSSID/channel are cached (in RAM and on flash) so
+the next association can skip the scan. When the link drops, poll() keeps
+reconnecting in the background with exponential backoff, so the main loop
+never blocks on Wi-Fi and can keep showing cached data.
+
+Finding the BSSID takes a scan, which blocks for a second or more, so
+poll() only notes that one is wanted and learn() runs it when the caller
+can afford the wait. Only the BSSID is used to reassociate: the rp2
+WLAN.connect() takes no channel, so the cached channel is just a record.
+"""
+
+import json
+import time
+import network
+
+CACHE_FILE = "wifi_cache.json"
+
+
+class WifiManager:
+
+    def __init__(self, wlan, ssid, password, connect_timeout_ms=15_000,
+                 backoff_min_ms=1_000, backoff_max_ms=30_000):
+        self.wlan = wlan
+        self.ssid = ssid
+        self.password = password
+        self.connect_timeout_ms = connect_timeout_ms
+        self.backoff_min_ms = backoff_min_ms
+        self.backoff_max_ms = backoff_max_ms
+        self.backoff_ms = backoff_min_ms
+        self.cache = self._load_cache()   # {"bssid": hex, "channel": n (not used to connect)}
+        self.connecting = False
+        self.with_bssid = False           # current attempt used the cache
+        self.bssid_failed = False         # a cached-BSSID attempt failed
+        self.attempt_started = 0
+        self.next_attempt = time.ticks_ms()
+        self.was_up = False
+        self.down_since = None            # ticks_ms when the link was lost
+        self.last_connect_ms = None       # how long the last association took
+        self.last_recovery_ms = None      # link lost -> first good fetch
+        self.reconnects = 0
+        self.learn_ap = False             # learn() should scan for the BSSID
+        self.learn_after = time.ticks_ms()  # ... not before this (after a failed scan)
+
+    # ------------ CACHE ------------
+    def _load_cache(self):
+        try:
+            with open(CACHE_FILE) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self):
+        try:
+            with open(CACHE_FILE, "w") as f:
+                json.dump(self.cache, f)
+        except OSError:
+            pass
+
+    def _remember_ap(self):
+        # Pick our AP out of a scan once; later connects go straight to it
+        for ap in self.wlan.scan():
+            if ap[0] == self.ssid.encode():
+                cache = {"bssid": ap[1].hex(), "channel": ap[2]}
+                if cache != self.cache:
+                    self.cache = cache
+                    self._save_cache()
+                return
+
+    # ------------ CONNECTING ------------
+    def _start(self):
+        self.wlan.active(True)
+        bssid = self.cache.get("bssid")
+        # After a failed cached attempt, alternate with a plain connect in
+        # case the AP was replaced
+        self.with_bssid = bool(bssid) and not self.bssid_failed
+        if self.with_bssid:
+            self.wlan.connect(self.ssid, self.password, bssid=bytes.fromhex(bssid))
+        else:
+            self.wlan.connect(self.ssid, self.password)
+        self.connecting = True
+        self.attempt_started = time.ticks_ms()
+
+    def _finish(self, ok):
+        self.connecting = False
+        now = time.ticks_ms()
+        if ok:
+            self.last_connect_ms = time.ticks_diff(now, self.attempt_started)
+            self.backoff_ms = self.backoff_min_ms
+            if not self.cache or (self.bssid_failed and not self.with_bssid):
+                # The scan takes over a second; learn() does it later so it
+                # doesn't hold up the first fetch
+                self.learn_ap = True
+            self.bssid_failed = False
+        else:
+            if self.with_bssid:
+                self.bssid_failed = True
+            elif self.cache:
+                self.bssid_failed = False
+            self.wlan.disconnect()
+            self.next_attempt = time.ticks_add(now, self.backoff_ms)
+            self.backoff_ms = min(self.backoff_ms * 2, self.backoff_max_ms)
+
+    def _failed_status(self):
+        s = self.wlan.status()
+        return s in (network.STAT_WRONG_PASSWORD, network.STAT_NO_AP_FOUND,
+                     network.STAT_CONNECT_FAIL)
+
+    def start(self):
+        """Starts associating and returns at once; follow up with check()
+        (or connect(), which waits for the same attempt).
+        """
+        if not self.connecting and not (self.wlan.active() and self.wlan.isconnected()):
+            self._start()
+
+    def check(self, timeout_ms=None):
+        """Non-blocking step of connect(): True once connected, False if the
+        attempt failed or timed out, None while still associating.
+        """
+        if self.wlan.active() and self.wlan.isconnected():
+            if self.connecting:
+                self._finish(True)
+            self.was_up = True
+            return True
+        if not self.connecting:
+            return False
+        if timeout_ms is None:
+            timeout_ms = self.connect_timeout_ms
+        if (time.ticks_diff(time.ticks_ms(), self.attempt_started) > timeout_ms
+                or self._failed_status()):
+            self._finish(False)
+            self.link_lost()
+            return False
+        return None
+
+    def connect(self, timeout_ms=None):
+        """Blocking connect with a deadline. Returns True when connected."""
+        self.start()
+        while True:
+            ok = self.check(timeout_ms)
+            if ok is not None:
+                return ok
+            time.sleep_ms(50)
+
+    def isconnected(self):
+        return self.wlan.isconnected()
+
+    def ip(self):
+        return self.wlan.ifconfig()[0]
+
+    # ------------ BACKGROUND RECONNECT ------------
+    def link_lost(self):
+        """Call when a request failed; notes the outage if the link is down."""
+        if not self.wlan.isconnected() and self.down_since is None:
+            self.down_since = time.ticks_ms()
+            self.was_up = False
+
+    def poll(self):
+        """Advances the reconnect state machine without blocking. Returns
+        True on the poll where the link comes back up.
+        """
+        if self.wlan.isconnected():
+            if self.connecting:
+                self._finish(True)
+            if not self.was_up:
+                self.was_up = True
+                self.reconnects += 1
+                return True
+            return False
+
+        self.link_lost()
+        now = time.ticks_ms()
+        if self.connecting:
+            if (time.ticks_diff(now, self.attempt_started) > self.connect_timeout_ms
+                    or self._failed_status()):
+                self._finish(False)
+        elif time.ticks_diff(now, self.next_attempt) >= 0:
+            self._start()
+        return False
+
+    def learn(self):
+        """Scans for our AP's BSSID if an association asked for it. Blocks
+        for a second or more; a failed scan is retried after
+        backoff_max_ms. Returns True if it scanned.
+        """
+        if not (self.learn_ap and self.wlan.isconnected()):
+            return False
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self.learn_after) < 0:
+            return False
+        self.learn_ap = False
+        try:
+            self._remember_ap()
+        except OSError:
+            self.learn_ap = True
+            self.learn_after = time.ticks_add(now, self.backoff_max_ms)
+        return True
+
+    def fetch_ok(self):
+        """Call after a successful fetch; closes out the outage timer."""
+        if self.down_since is not None:
+            self.last_recovery_ms = time.ticks_diff(time.ticks_ms(), self.down_since)
+            self.down_since = None
+            print("wifi: first prediction", self.last_recovery_ms, "ms after outage")